@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# SPALTEN-ABLAGE der Session-Logs (Parquet) + Kennzahlen fürs Admin-Dashboard
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Ziel: logs/columnar/<tabelle>/day=YYYY-MM-DD/part-*.parquet
+#     (Tabellen messages + outcomes, nach Tag partitioniert, nur angehängt).
+# [2] Wasserzeichen je Rohdatei (Byte-Offset, Inode, CSV-Kopfzeile) in
+#     _watermarks.json – jeder Lauf liest nur, was seit dem letzten Lauf
+#     angehängt wurde; unvollständige letzte Zeilen bleiben für den nächsten Lauf.
+# [3] Ingestion: Segment-Log (segment_log.py) sowie Einzeldateien
+#     logs/<sid>.jsonl (chat.py), logs/transcript_*.csv (app.py),
+#     logs/outcomes.csv (Legacy/CsvStore) → Parquet; Outcomes von app.py im
+#     Standard-Setup aus dem SQLite-Store (negotiation.db, Wasserzeichen = ts).
+#     Umrechnung der Felder wie beim Store-Import (storage.py). Zustellung mindestens einmal: bricht ein
+#     Lauf zwischen Parquet und Wasserzeichen ab, werden Outcomes beim Lesen
+#     je Session dedupliziert.
+# [4] Dashboard: Deal-Quote, Endpreis-Histogramm, Turns bis Deal – liest nur
+#     die benötigten Spalten (Ziel: deutlich unter 1 s für 10.000 Sessions).
+# [5] Verdichten: viele kleine Part-Dateien eines Tages zu einer zusammenfassen.
+#
+# Aufruf:  python analytics.py ingest [logs/]      – neue Log-Zeilen einlesen
+#          python analytics.py compact             – Part-Dateien je Tag verdichten
+#          python analytics.py bench [--sessions 10000]
+# ============================================================================
+
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from segment_log import SEGMENT_DIR
+from storage import (DB_PATH, LOG_DIR, OUTCOME_FIELDS, SqliteStore, _app_transcript_rows, _chat_event_rows,
+                     _chat_log_rows, _legacy_outcome_rows)
+
+COLUMNAR_DIR = Path(os.environ.get("COLUMNAR_DIR", str(LOG_DIR / "columnar")))
+
+# ------------------------------- [1] SCHEMA -------------------------------
+SCHEMAS = {
+    "messages": pa.schema([
+        ("app", pa.string()), ("session_id", pa.string()), ("ts", pa.string()), ("role", pa.string()),
+        ("content", pa.string()), ("current_offer", pa.int64()), ("source", pa.string()),
+    ]),
+    "outcomes": pa.schema([
+        ("app", pa.string()), ("session_id", pa.string()), ("ts", pa.string()), ("outcome", pa.string()),
+        ("final_price", pa.int64()), ("ended_by", pa.string()), ("user_turns", pa.int64()),
+        ("duration_s", pa.int64()), ("original_price", pa.int64()), ("item", pa.string()),
+    ]),
+}
+
+
+def _day(ts) -> str:
+    return ts[:10] if isinstance(ts, str) and len(ts) >= 10 else "unknown"
+
+# ---------------------------- [2] WASSERZEICHEN ---------------------------
+def _load_watermarks(root: Path) -> dict:
+    try:
+        return json.loads((root / "_watermarks.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_watermarks(root: Path, marks: dict):
+    tmp = root / "_watermarks.json.tmp"
+    tmp.write_text(json.dumps(marks, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, root / "_watermarks.json")
+
+
+def _complete_records(data: bytes, quoted: bool) -> tuple[list[str], int]:
+    """
+    Vollständige Datensätze aus einem Byte-Block; gibt (datensätze, verbrauchte_bytes) zurück.
+    quoted=True (CSV): ein Datensatz endet erst am Zeilenende, wenn die Anführungszeichen
+    ausgeglichen sind – Zeilenumbrüche in Texten bleiben so im selben Datensatz.
+    """
+    records, used, start, pending = [], 0, 0, 0
+    while True:
+        nl = data.find(b"\n", start)
+        if nl < 0:
+            break
+        if quoted:
+            pending += data.count(b'"', start, nl)
+        start = nl + 1
+        if pending % 2 == 0:
+            records.append(data[used:start].decode("utf-8"))
+            used, pending = start, 0
+    return records, used
+
+
+def _read_new(path: Path, mark: dict | None, quoted: bool) -> tuple[list[str], dict, int]:
+    """Ab dem Wasserzeichen angehängte Datensätze lesen; gibt (datensätze, neues_zeichen, bytes) zurück."""
+    st_ = path.stat()
+    mark = dict(mark or {})
+    if mark.get("ino") != st_.st_ino or st_.st_size < mark.get("offset", 0):
+        mark = {"ino": st_.st_ino, "offset": 0}   # neue oder ersetzte Datei → von vorn
+    if st_.st_size == mark["offset"]:
+        return [], mark, 0
+    with path.open("rb") as f:
+        f.seek(mark["offset"])
+        data = f.read(st_.st_size - mark["offset"])
+    records, used = _complete_records(data, quoted)
+    if quoted and mark["offset"] == 0 and records:
+        mark["header"] = next(csv.reader([records[0]]))
+        records = records[1:]
+    mark["offset"] += used
+    return records, mark, used
+
+# ------------------------------ [3] INGESTION -----------------------------
+def _rows_from(path: Path, records: list[str], mark: dict) -> tuple[list[dict], list[dict]]:
+    if path.suffix == ".log":   # Segment-Log: Datensätze beider Apps, je Zeile mit Session-ID
+        messages, outcomes = [], []
+        for line in records:
+            row = json.loads(line)
+            if row["app"] == "app":
+                messages += _app_transcript_rows([row["rec"]])
+                continue
+            for m, o in _chat_event_rows(row["sid"], [row["rec"]]):
+                (messages.append(m) if m else outcomes.append(o))
+        return messages, outcomes
+    if path.suffix == ".jsonl":
+        messages, outcomes = [], []
+        for m, o in _chat_log_rows(path.stem, records):
+            (messages.append(m) if m else outcomes.append(o))
+        return messages, outcomes
+    reader = csv.DictReader(io.StringIO("".join(records)), fieldnames=mark.get("header"))
+    if path.name == "outcomes.csv":
+        return [], list(_legacy_outcome_rows(reader))
+    return list(_app_transcript_rows(reader)), []
+
+
+def _store_outcomes(db_path: Path, mark: dict | None) -> tuple[list[dict], dict]:
+    """
+    app.py-Outcomes aus dem SQLite-Store seit dem Wasserzeichen (ts + Sessions mit genau diesem ts).
+    Im Standard-Setup schreibt app.py Outcomes nur dorthin – nicht in outcomes.csv oder das Segment-Log.
+    """
+    mark = dict(mark or {"ts": None, "sids": []})
+    rows = SqliteStore(db_path).outcomes(app="app", since=mark["ts"])
+    rows = [r for r in rows if not (r["ts"] == mark["ts"] and r["session_id"] in mark["sids"])]
+    if rows:
+        last = rows[-1]["ts"]
+        seen = mark["sids"] if last == mark["ts"] else []
+        mark = {"ts": last, "sids": seen + [r["session_id"] for r in rows if r["ts"] == last]}
+    return [{k: r.get(k) for k in OUTCOME_FIELDS} for r in rows], mark
+
+
+def _write_parts(root: Path, table: str, rows: list[dict], run_id: str) -> int:
+    """Zeilen je Tag als eigene Part-Datei schreiben (atomar per Umbenennen)."""
+    by_day = {}
+    for r in rows:
+        by_day.setdefault(_day(r.get("ts")), []).append(r)
+    for day, day_rows in by_day.items():
+        part_dir = root / table / f"day={day}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        tmp = part_dir / f".part-{run_id}.parquet.tmp"
+        pq.write_table(pa.Table.from_pylist(day_rows, schema=SCHEMAS[table]), tmp)
+        os.replace(tmp, part_dir / f"part-{run_id}.parquet")
+    return len(by_day)
+
+
+_ingest_lock = threading.Lock()
+
+
+def ingest(log_dir=LOG_DIR, root=COLUMNAR_DIR, segment_dir=SEGMENT_DIR, db_path=None) -> dict:
+    """Neue Log-Zeilen seit dem letzten Lauf nach Parquet übernehmen; gibt Zähler zurück."""
+    log_dir, root, segment_dir = Path(log_dir), Path(root), Path(segment_dir)
+    db_path = Path(db_path or (DB_PATH if log_dir == LOG_DIR else log_dir / "negotiation.db"))
+    t0 = time.perf_counter()
+    with _ingest_lock:
+        root.mkdir(parents=True, exist_ok=True)
+        marks = _load_watermarks(root)
+        counts = {"files": 0, "unchanged": 0, "bytes": 0, "messages": 0, "outcomes": 0, "parts": 0}
+        messages, outcomes = [], []
+
+        files = sorted(log_dir.glob("*.jsonl")) + sorted(log_dir.glob("transcript_*.csv"))
+        files += [log_dir / "outcomes.csv"] if (log_dir / "outcomes.csv").exists() else []
+        files += sorted(segment_dir.glob("seg-*.log"))
+        for path in files:
+            key = str(path)
+            records, mark, used = _read_new(path, marks.get(key), quoted=path.suffix == ".csv")
+            if not used:
+                counts["unchanged"] += 1
+                marks[key] = mark
+                continue
+            m, o = _rows_from(path, records, mark)
+            messages += m
+            outcomes += o
+            marks[key] = mark
+            counts["files"] += 1
+            counts["bytes"] += used
+        if db_path.exists():
+            rows, marks["store:app_outcomes"] = _store_outcomes(db_path, marks.get("store:app_outcomes"))
+            outcomes += rows
+
+        run_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        if messages:
+            counts["parts"] += _write_parts(root, "messages", messages, run_id)
+        if outcomes:
+            counts["parts"] += _write_parts(root, "outcomes", outcomes, run_id)
+        # Erst nach den Parquet-Dateien fortschreiben (Abbruch dazwischen → erneut gelesen, nicht verloren)
+        _save_watermarks(root, marks)
+        counts["messages"], counts["outcomes"] = len(messages), len(outcomes)
+    counts["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return counts
+
+# ------------------------------- [4] DASHBOARD ----------------------------
+def _read(root: Path, table: str, columns: list[str], app=None) -> pa.Table:
+    path = root / table
+    if not path.exists():
+        return SCHEMAS[table].empty_table().select(columns)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", schema=SCHEMAS[table])
+    return dataset.to_table(columns=columns, filter=(ds.field("app") == app) if app else None)
+
+
+def dashboard(root=COLUMNAR_DIR, app=None, bin_eur: int = 25) -> dict:
+    """
+    Kennzahlen aus der Spalten-Ablage: sessions, deals, deal_rate, price (Ø/Median/Min/Max),
+    price_hist (von-Werte + Anzahl je bin_eur), turns (Ø/Median/P90 bis Deal) und
+    turns_hist {turns: anzahl}, ms (Ladezeit).
+    """
+    t0 = time.perf_counter()
+    root = Path(root)
+    out = _read(root, "outcomes", ["app", "session_id", "ts", "outcome", "final_price", "user_turns"], app)
+    out = out.to_pandas()
+    # Mindestens-einmal-Zustellung: pro Session zählt das letzte Outcome
+    out = out.sort_values("ts", kind="stable").drop_duplicates(["app", "session_id"], keep="last")
+    deals = out[out["outcome"] == "deal"]
+
+    # Turns bis Deal: aus dem Outcome (app.py) oder gezählte Nutzer-Nachrichten (chat.py)
+    turns = deals.set_index(["app", "session_id"])["user_turns"]
+    if turns.isna().any():
+        msgs = _read(root, "messages", ["app", "session_id", "role"], app).to_pandas()
+        counted = msgs[msgs["role"] == "user"].groupby(["app", "session_id"]).size()
+        turns = turns.fillna(counted.reindex(turns.index))
+    turns = turns.dropna().astype(int)
+
+    prices = deals["final_price"].dropna().astype(int).to_numpy()
+    hist = {}
+    if prices.size:
+        lo = prices.min() // bin_eur * bin_eur
+        edges = np.arange(lo, prices.max() + bin_eur + 1, bin_eur)
+        counts, _ = np.histogram(prices, bins=edges)
+        hist = {int(e): int(c) for e, c in zip(edges[:-1], counts)}
+    return {
+        "sessions": len(out),
+        "deals": len(deals),
+        "deal_rate": round(len(deals) / len(out), 3) if len(out) else 0.0,
+        "price": {"avg": round(float(prices.mean()), 1), "median": float(np.median(prices)),
+                  "min": int(prices.min()), "max": int(prices.max())} if prices.size else None,
+        "price_hist": hist,
+        "turns": {"avg": round(float(turns.mean()), 2), "median": float(turns.median()),
+                  "p90": float(turns.quantile(0.9))} if len(turns) else None,
+        "turns_hist": {int(k): int(v) for k, v in turns.value_counts().sort_index().items()},
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+# ------------------------------- [5] VERDICHTEN ---------------------------
+def compact(root=COLUMNAR_DIR) -> dict:
+    """Je Tabelle und Tag alle Part-Dateien zu einer zusammenfassen (nicht parallel zu ingest)."""
+    root = Path(root)
+    counts = {"days": 0, "parts_before": 0}
+    with _ingest_lock:
+        for table in SCHEMAS:
+            for day_dir in sorted((root / table).glob("day=*")):
+                parts = sorted(day_dir.glob("part-*.parquet"))
+                if len(parts) < 2:
+                    continue
+                merged = pa.concat_tables(pq.read_table(p, schema=SCHEMAS[table]) for p in parts)
+                run_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}-c"
+                tmp = day_dir / f".part-{run_id}.parquet.tmp"
+                pq.write_table(merged, tmp)
+                os.replace(tmp, day_dir / f"part-{run_id}.parquet")
+                for p in parts:
+                    p.unlink()
+                counts["days"] += 1
+                counts["parts_before"] += len(parts)
+    return counts
+
+# -------------------------------- BENCHMARK -------------------------------
+def _fake_logs(log_dir: Path, n_sessions: int, seed: int = 3, start: int = 0):
+    """Synthetische Rohdateien wie von chat.py (JSONL) und app.py (CSV-Transkript + outcomes.csv)."""
+    rng = np.random.default_rng(seed + start)
+    outcomes = []
+    for i in range(start, start + n_sessions):
+        day = f"2026-10-{1 + i % 28:02d}"
+        turns = int(rng.integers(1, 12))
+        price = int(rng.integers(760, 1000)) if rng.random() < 0.7 else None
+        if i % 2:
+            sid = f"chat-{i:06d}"
+            with (log_dir / f"{sid}.jsonl").open("w", encoding="utf-8") as f:
+                for t in range(turns):
+                    f.write(json.dumps({"t": f"{day}T10:{t:02d}:00", "role": "user", "content": f"Ich biete {800 + t} €"}) + "\n")
+                    f.write(json.dumps({"t": f"{day}T10:{t:02d}:05", "role": "assistant", "content": "Für ein neues Gerät halte ich 880 € für angemessen.",
+                                        "source": "llm"}) + "\n")
+                f.write(json.dumps({"t": f"{day}T10:59:00", "event": "outcome", "outcome": "deal" if price else "aborted",
+                                    "final_price": price}) + "\n")
+        else:
+            sid = f"app-{i:06d}"
+            with (log_dir / f"transcript_{sid}.csv").open("w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(["timestamp_utc", "session_id", "role", "text", "current_offer_eur"])
+                for t in range(turns):
+                    w.writerow([f"{day}T11:{t:02d}:00", sid, "user", f"Wie wäre es mit\n{800 + t} €?", 1000])
+                    w.writerow([f"{day}T11:{t:02d}:05", sid, "bot", "Verstehe Ihren Punkt.", 950])
+            outcomes.append([f"{day}T11:59:00", sid, "iPad (neu, OVP)", 1000, price or 0, "deal_button", turns, 300])
+    path = log_dir / "outcomes.csv"
+    new = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(["timestamp_utc", "session_id", "item", "original_price_eur", "final_price_eur",
+                        "ended_by", "user_turns", "duration_seconds"])
+        w.writerows(outcomes)
+
+
+def bench(n_sessions: int):
+    import tempfile
+    base = Path(tempfile.mkdtemp(prefix="bench_analytics_"))
+    log_dir, root = base / "logs", base / "columnar"
+    log_dir.mkdir()
+    _fake_logs(log_dir, n_sessions)
+    print(f"Rohdaten: {n_sessions:,} Sessions, {sum(p.stat().st_size for p in log_dir.iterdir()) / 1e6:.1f} MB")
+    print("Erster Lauf:      ", ingest(log_dir, root, log_dir / "segments"))
+    print("Ohne neue Zeilen: ", ingest(log_dir, root, log_dir / "segments"))
+    _fake_logs(log_dir, n_sessions // 100, start=n_sessions)
+    with (log_dir / "chat-000001.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"t": "2026-10-02T12:00:00", "role": "user", "content": "Noch eine Frage"}) + "\n")
+        f.write('{"t": "2026-10-02T12:00:01", "role": "assis')   # halbe Zeile: wartet auf den nächsten Lauf
+    print("1 % neue Sessions:", ingest(log_dir, root, log_dir / "segments"))
+    print("Verdichten:       ", compact(root))
+    for app in (None, "chat", "app"):
+        d = dashboard(root, app)
+        print(f"Dashboard app={app or 'alle'}: {d['sessions']:,} Sessions, Deal-Quote {d['deal_rate']:.1%}, "
+              f"Ø Preis {d['price']['avg']} €, Ø Turns bis Deal {d['turns']['avg']} – geladen in {d['ms']} ms")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "ingest":
+        print(json.dumps(ingest(sys.argv[2] if len(sys.argv) > 2 else LOG_DIR), indent=2))
+    elif cmd == "compact":
+        print(json.dumps(compact(), indent=2))
+    elif cmd == "bench":
+        n = int(sys.argv[sys.argv.index("--sessions") + 1]) if "--sessions" in sys.argv else 10_000
+        bench(n)
+    else:
+        print("Aufruf: python analytics.py ingest [logs/] | compact | bench [--sessions 10000]")
@@ -1,5 +1,3 @@
-import streamlit as st
-
 # -*- coding: utf-8 -*-
 # ============================================================================
 # VERHANDLUNG AUF AUGENHÖHE – iPad neu/OVP (keine Machtprimes)
@@ -7,30 +5,54 @@ import streamlit as st
 # WAS MACHT DIESER CODE?
 # [1] Grundkonfig: Festes Szenario (iPad, 1.000 €), keine Auswahloptionen.
 # [2] Logging (serverseitig): Transkript pro Session + Outcomes über alle Sessions.
+#     Schreiben läuft asynchron über den gemeinsamen Log-Writer (logwriter.py);
+#     Outcomes + Nachrichten landen zusätzlich indiziert im Store (storage.py, Standard: SQLite).
+#     Zeit-Spans pro Turn (engine/transcript/render) → turn_metrics.py (JSONL + Prometheus).
 # [3] Session-State: Chatverlauf, Angebote, Timer (10 Minuten), Zähler der Zahlenangebote.
+#     Das Zeitlimit greift auch ohne neue Nachricht: ein prozessweiter Deadline-Scheduler
+#     (deadline_scheduler.py) beendet stille Sessions und schreibt das Outcome genau einmal.
+#     Nach jedem Turn ein Schnappschuss in den Session-Store (session_store.py); die
+#     Session-ID steht in der URL (?sid=…) – nach Neustart/Worker-Wechsel geht es weiter.
 # [4] NLP-Helfer: Preis aus Text parsen, Argumentkategorien erkennen.
 # [5] Textbausteine: Empathie + Begründungen + variierende Floskeln (realistische Dynamik).
-# [6] Verhandlungslogik:
+# [6] Verhandlungslogik (negotiation_engine.py, ohne Streamlit testbar):
 #     • Erste 3 Zahlenangebote: stets Gegenangebot > Nutzerangebot (ohne Untergrenze zu verraten).
 #     • Danach schrittweise Annäherung, aber nie "unter Wert".
 #     • Spätestens nach 10 Min: Abschlussversuch (>=900 €) oder freundliche Absage (<900 €).
-# [7] UI: Szenariotext, Chat-Interface (mobil tauglich).
+# [7] UI: Szenariotext, Chat-Interface (mobil tauglich); Eingabe + neue Nachrichten
+#     als Fragment, damit ein Turn nicht den ganzen Verlauf neu zeichnet.
 # ============================================================================
 
 import streamlit as st
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
-import csv
-import re
+import os
 import random
+import re
+import secrets
+
+from logwriter import CsvTarget
+from segment_log import write_session_record
+from storage import get_store
+from offer_ledger import OfferLedger
+from text_analysis import analyze
+from negotiation_engine import NegotiationEngine, NegotiationState, ORIGINAL_PRICE
+from turn_metrics import measure_turn, span
+from compact_state import ChatLog, sweep_idle
+from deadline_scheduler import get_scheduler
+from functools import partial
+from session_store import open_session
 
 # ----------------------------- [1] GRUNDKONFIG -----------------------------
 st.set_page_config(page_title="Verhandlung – iPad (Augenhöhe)", page_icon="🤝", layout="centered")
 
-ORIGINAL_PRICE = 1000                    # Zielpreis
-INTERNAL_MIN_PRICE = int(ORIGINAL_PRICE * 0.90)  # interne Untergrenze (10 % Nachlass) – NIEMALS nennen!
-TIME_LIMIT_SECONDS = 10 * 60             # 10 Minuten – niemals offenlegen
+# Zielpreis (1.000 €), interne Untergrenze (900 € – NIEMALS nennen!) und Zeitlimit (10 Min.)
+# liegen in negotiation_engine.py – dieselben Werte nutzt die Simulation (negotiation_sim.py).
 MAX_BOT_TURNS = 24                       # technisches Sicherungsnetz (keine Endlosschleifen)
+INCREMENTAL_RENDER = os.environ.get("APP_INCREMENTAL_RENDER", "1") != "0"  # Chat als Fragment (0 = voller Rerun)
+MAX_PENDING_MESSAGES = 12                # danach ein voller Rerun (neue Nachrichten → fester Verlauf)
+SID_RE = re.compile(r"[0-9A-Za-z_-]{8,64}")   # Session-ID aus der URL
 
 # ---------------------- [2] SERVERSEITIGES LOGGING ------------------------
 LOG_DIR = Path("logs")
@@ -38,303 +60,142 @@ LOG_DIR.mkdir(exist_ok=True)
 
 def _session_id():
     if "session_id" not in st.session_state:
-        st.session_state.session_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        # Zeitstempel (sortierbar) + Zufall (nicht erratbar – die ID steht in der URL)
+        st.session_state.session_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f_") + secrets.token_hex(4)
+        st.query_params["sid"] = st.session_state.session_id
     return st.session_state.session_id
 
-def _transcript_path():
-    return LOG_DIR / f"transcript_{_session_id()}.csv"
-
-def _outcomes_path():
-    return LOG_DIR / "outcomes.csv"
-
-def _save_transcript_row(role: str, text: str, current_offer: int):
-    """[Logging] Jede Nachricht in Session-Transkript schreiben."""
-    file = _transcript_path()
-    is_new = not file.exists()
-    with file.open("a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if is_new:
-            w.writerow(["timestamp_utc", "session_id", "role", "text", "current_offer_eur"])
-        w.writerow([datetime.utcnow().isoformat(), _session_id(), role, text, current_offer])
-
-def _save_outcome_once(final_price: int, ended_by: str, turns_user: int, duration_s: int):
-    """[Logging] Einmaliges Outcome in globale Datei schreiben (nicht öffentlich)."""
-    if st.session_state.get("outcome_logged"):
+TRANSCRIPT_HEADER = ["timestamp_utc", "session_id", "role", "text", "current_offer_eur"]
+
+def _save_transcript_row(sid: str, role: str, text: str, current_offer: int):
+    """[Logging] Jede Nachricht in Session-Transkript schreiben (asynchron, gebündelt)."""
+    with span("transcript"):
+        _write_transcript_row(sid, role, text, current_offer)
+
+def _write_transcript_row(sid: str, role: str, text: str, current_offer: int):
+    # sid explizit: läuft auch im Scheduler-Thread (ohne st.session_state)
+    ts = datetime.utcnow().isoformat()
+    row = [ts, sid, role, text, current_offer]
+    # Segment-Log (Standard) oder – LOG_FORMAT=files – wie bisher eine CSV-Datei pro Session
+    write_session_record("app", sid, dict(zip(TRANSCRIPT_HEADER, row)),
+                         CsvTarget(LOG_DIR / f"transcript_{sid}.csv", header=TRANSCRIPT_HEADER), row)
+    get_store().save_message("app", sid, role, text, current_offer, ts=ts)
+
+def _save_outcome_once(handle, deadline, final_price: int, ended_by: str, turns_user: int, duration_s: int):
+    """[Logging] Einmaliges Outcome in den Store schreiben (nicht öffentlich) – Turn oder Scheduler."""
+    # finish_once: einmal im Prozess; claim: einmal über alle Worker (gemeinsamer Session-Store)
+    if not deadline.finish_once() or not handle.claim("outcome"):
         return
-    file = _outcomes_path()
-    is_new = not file.exists()
-    with file.open("a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if is_new:
-            w.writerow([
-                "timestamp_utc", "session_id", "item", "original_price_eur",
-                "final_price_eur", "ended_by", "user_turns", "duration_seconds"
-            ])
-        w.writerow([
-            datetime.utcnow().isoformat(), _session_id(), "iPad (neu, OVP)",
-            ORIGINAL_PRICE, final_price, ended_by, turns_user, duration_s
-        ])
-    st.session_state.outcome_logged = True
+    store = get_store()
+    store.save_outcome(
+        "app", deadline.key, "deal" if final_price else "no_deal", final_price=final_price,
+        ended_by=ended_by, user_turns=turns_user, duration_s=duration_s,
+        item="iPad (neu, OVP)", original_price=ORIGINAL_PRICE,
+    )
+    # Outcome-Events sofort (inkl. aller offenen Transkriptzeilen) auf die Platte bringen
+    store.flush()
 
 # ------------------------- [3] SESSION-STATE SETUP ------------------------
+SHARED_KEYS = ("chat", "neg", "ledger", "start_time", "deadline")   # gehören dem Handle, nicht dem Tab
+if "store" in st.session_state and st.session_state.store.stale:
+    # Ein anderer Worker hat die Session weitergeführt: eigenen Stand verwerfen und neu laden
+    if "deadline" in st.session_state:
+        st.session_state.deadline.cancel()
+    for key in ("store", "outcome_done") + SHARED_KEYS:
+        st.session_state.pop(key, None)
+if "store" not in st.session_state:
+    # Session aus der URL fortsetzen (Reload, Neustart, anderer Worker), sonst neu anlegen
+    sid, handle, snap = st.query_params.get("sid", ""), None, None
+    if SID_RE.fullmatch(sid):
+        handle, snap = open_session("app", sid)
+    if handle is not None and handle.live:
+        # Läuft schon in diesem Prozess (zweiter Tab, Reload): dieselben Objekte, kein zweiter Besitzer
+        st.session_state.session_id = sid
+        st.session_state.store = handle
+        for key in SHARED_KEYS:
+            st.session_state[key] = handle.live[key]
+    elif snap:
+        st.session_state.session_id = sid
+        st.session_state.store = handle
+        st.session_state.chat = ChatLog.from_dict(sid, snap["chat"])
+        st.session_state.neg = NegotiationState.from_dict(snap["neg"])
+        st.session_state.ledger = OfferLedger.from_dict(snap["ledger"])
+        st.session_state.start_time = datetime.fromisoformat(snap["start_time"])
+        st.session_state.outcome_done = snap["outcome_done"]
+    else:
+        st.session_state.store, _ = open_session("app", _session_id(), new=True)
 if "chat" not in st.session_state:
-    st.session_state.chat = []              # (role, text)
+    st.session_state.chat = ChatLog(_session_id())   # (role, text) kompakt, bei Inaktivität ausgelagert
 if "bot_turns" not in st.session_state:
     st.session_state.bot_turns = 0
-if "current_offer" not in st.session_state:
-    st.session_state.current_offer = ORIGINAL_PRICE  # Bot startet bei 1.000 €
-if "deal_reached" not in st.session_state:
-    st.session_state.deal_reached = False
-if "final_price" not in st.session_state:
-    st.session_state.final_price = None
 if "start_time" not in st.session_state:
     st.session_state.start_time = datetime.utcnow()
-if "numeric_offer_count" not in st.session_state:
-    st.session_state.numeric_offer_count = 0         # # der vom Gegenüber genannten Zahlenangebote
-if "best_user_offer" not in st.session_state:
-    st.session_state.best_user_offer = None          # bestes (höchstes) Angebot des Gegenübers
+ENGINE = NegotiationEngine(rng=random)
+if "neg" not in st.session_state:
+    # Angebot (Bot startet bei 1.000 €), Zahlenangebote, bestes Angebot, Deal/Outcome
+    st.session_state.neg = ENGINE.new_state()
+if "ledger" not in st.session_state:
+    st.session_state.ledger = OfferLedger()          # Angebote/Runden, inkrementell je Nachricht
 
 # --------------------------- [4] NLP-HILFSFUNKTIONEN ----------------------
+# Schlagworte/Preis-Muster liegen in text_analysis.py (ein Durchlauf, pro Nachricht gecacht).
 def _parse_price(text: str):
     """Erste Zahl im Text als Eurobetrag interpretieren (950, 950€, 950,00 etc.)."""
-    if not text:
-        return None
-    t = text.replace(" ", "")
-    m = re.search(r"(\d+(?:[.,]\d{1,2})?)", t)
-    if not m:
-        return None
-    raw = m.group(1).replace(".", "").replace(",", ".")
-    try:
-        return int(round(float(raw)))
-    except Exception:
-        return None
-
-def _classify_args(text: str):
-    """Einfache Schlagwort-Erkennung für dynamische Argumente."""
-    t = text.lower()
-    return {
-        "student": any(w in t for w in ["student", "studium", "uni"]),
-        "budget": any(w in t for w in ["budget", "teuer", "kann mir nicht leisten", "knapp", "pleite"]),
-        "cheaper": any(w in t for w in ["günstiger", "billiger", "angebot", "preisvergleich", "idealo", "woanders"]),
-        "condition": any(w in t for w in ["gebraucht", "kratzer", "zustand"]),
-        "immediacy": any(w in t for w in ["dringend", "eilig", "heute", "sofort", "morgen"]),
-        "cash": any(w in t for w in ["bar", "cash"]),
-        "pickup": any(w in t for w in ["abholen", "abholung"]),
-        "shipping": any(w in t for w in ["versand", "schicken"]),
-        "warranty": any(w in t for w in ["garantie", "gewährleistung", "rechnung", "applecare"]),
-    }
+    return analyze(text).first_price
 
 # -------------------------- [5] TEXT-Bausteine/Varianten ------------------
-EMPATHY = [
-    "Verstehe Ihren Punkt.",
-    "Danke für die Offenheit.",
-    "Kann ich gut nachvollziehen.",
-    "Klingt nachvollziehbar.",
-    "Ich sehe, worauf Sie hinauswollen.",
-]
-JUSTIFICATIONS = [
-    "Es handelt sich um ein **neues, originalverpacktes** Gerät – ohne Nutzungsspuren.",
-    "Sie haben es **sofort** verfügbar, keine Lieferzeiten oder Unsicherheiten.",
-    "Der **Originalpreis liegt bei 1.000 €**; knapp darunter ist für Neuware fair.",
-    "Neu/OVP hält den Wiederverkaufswert deutlich besser.",
-    "Im Vergleich zu Gebrauchtware sparen Sie sich jedes Risiko.",
-]
-ARG_BANK = {
-    "student": [
-        "Gerade fürs Studium ist Verlässlichkeit wichtig – neu/OVP sorgt dafür.",
-        "Ich komme Ihnen gern ein Stück entgegen, damit es für die Uni schnell klappt.",
-    ],
-    "budget": [
-        "Ich weiß, das Budget ist im Studium oft knapp – deshalb bewege ich mich vorsichtig.",
-        "Preislich möchte ich fair bleiben, ohne es unter Wert herzugeben.",
-    ],
-    "cheaper": [
-        "Viele günstigere Angebote betreffen Aktionen, ältere Chargen oder Vorführware.",
-        "Bei vermeintlich billigeren Angeboten ist es oft nicht wirklich neu/OVP.",
-    ],
-    "condition": [
-        "Hier ist es **OVP** – das ist preislich ein Unterschied zu 'wie neu'.",
-        "Neu bedeutet: null Zyklen, keine Überraschungen – das rechtfertigt knapp unter Neupreis.",
-    ],
-    "immediacy": [
-        "Wenn es eilig ist, haben Sie es heute/zeitnah – das ist ein Vorteil.",
-        "Schnelle Verfügbarkeit spart Nerven, gerade wenn die Uni losgeht.",
-    ],
-    "cash": [
-        "Barzahlung ist möglich – das macht es unkompliziert.",
-    ],
-    "pickup": [
-        "Abholung ist gern möglich – dann können Sie die Versiegelung direkt prüfen.",
-    ],
-    "shipping": [
-        "Versand ist ordentlich verpackt möglich; Abholung ist natürlich noch bequemer.",
-    ],
-    "warranty": [
-        "Bei Neugeräten greift der Herstellersupport ab Aktivierung.",
-    ],
-}
-CLOSERS = [
-    "Wie klingt das für Sie?",
-    "Wäre das für Sie in Ordnung?",
-    "Können wir uns darauf verständigen?",
-    "Passt das für Sie?",
-]
-
-def _pick(lines, k=1):
-    """Zufällig 1..k unterschiedliche Textbausteine wählen."""
-    if k <= 0:
-        return []
-    k = min(k, len(lines))
-    return random.sample(lines, k)
-
-def _compose_argument_response(flags):
-    """Passende Argumente dynamisch kombinieren (max. 2 kurze Sätze)."""
-    chosen = []
-    # priorisiere relevante Kategorien in plausibler Reihenfolge
-    for key in ["student", "budget", "cheaper", "condition", "immediacy", "pickup", "cash", "shipping", "warranty"]:
-        if flags.get(key, False) and key in ARG_BANK:
-            chosen.extend(_pick(ARG_BANK[key], k=1))
-        if len(chosen) >= 2:
-            break
-    if not chosen:
-        chosen = _pick(JUSTIFICATIONS, k=1)
-    return " ".join(chosen)
+# Bausteine + Argument-Komposition liegen in rule_seller.py
+# (chat.py nutzt sie als regelbasierten Fallback, wenn das LLM zu langsam ist).
 
 # --------------------------- [6] VERHANDLUNGSLOGIK ------------------------
-def _bot_say(md: str):
-    st.chat_message("assistant").markdown(md)
-    st.session_state.chat.append(("bot", md))
-    _save_transcript_row("bot", md, st.session_state.current_offer)
-
+# Gegenangebote, Deal-Erkennung, Abschluss/Absage und Zeit-Logik: negotiation_engine.py.
+# Hier nur noch: Nachrichten anhängen/loggen und Outcome genau einmal speichern.
 def _user_say(md: str):
-    st.chat_message("user").markdown(md)
-    st.session_state.chat.append(("user", md))
-    _save_transcript_row("user", md, st.session_state.current_offer)
-
-def _detect_deal(text: str):
-    """Expliziten Abschluss erkennen; gibt (is_deal, price_if_any) zurück."""
-    if not text:
-        return False, None
-    tl = text.lower()
-    keys = ["deal", "einverstanden", "akzeptiere", "passt", "nehme ich", "agree", "accepted"]
-    has = any(k in tl for k in keys)
-    return has, _parse_price(text)
-
-def _finish(final_price: int, ended_by: str):
-    """Deal finalisieren + Outcome loggen."""
-    st.session_state.deal_reached = True
-    st.session_state.final_price = final_price
-    _bot_say(f"Einverstanden – **{final_price} €**. Vielen Dank! 🤝")
-    duration = int((datetime.utcnow() - st.session_state.start_time).total_seconds())
-    user_turns = sum(1 for r, _ in st.session_state.chat if r == "user")
-    _save_outcome_once(final_price, ended_by, user_turns, duration)
-
-def _polite_decline():
-    """Höflich ohne Deal beenden (Preis zu niedrig, ohne Untergrenze zu nennen)."""
-    msg = random.choice([
-        "Schade – so tief kann ich leider nicht gehen. Ich bleibe dann lieber bei meinem Angebot.",
-        "Danke für die Verhandlung! Preislich liege ich höher; so komme ich leider nicht mit.",
-        "Ich verstehe Ihre Position, aber darunter kann ich es nicht abgeben.",
-    ])
-    _bot_say(msg)
-    duration = int((datetime.utcnow() - st.session_state.start_time).total_seconds())
-    user_turns = sum(1 for r, _ in st.session_state.chat if r == "user")
-    _save_outcome_once(final_price=0, ended_by="too_low", turns_user=user_turns, duration_s=duration)
-
-def _counter_logic(user_text: str):
-    """
-    Kernlogik für Gegenangebote:
-    - Zählt die ersten drei *numerischen* Angebote und antwortet > Nutzerpreis.
-    - Danach Annäherung, aber stets fair und ohne Untergrenze zu verraten.
-    """
-    offer_user = _parse_price(user_text)
-    flags = _classify_args(user_text)
-    empathy = random.choice(EMPATHY)
-    args = _compose_argument_response(flags)
-    close = random.choice(CLOSERS)
-
-    # Wenn kein Preis genannt wurde: freundlich konkretisieren
-    if offer_user is None:
-        reply = f"{empathy} Der Neupreis liegt bei **{ORIGINAL_PRICE} €**. Woran denken Sie preislich?"
-        return reply, st.session_state.current_offer, False
-
-    # Update Zähler & bestes Angebot
-    st.session_state.numeric_offer_count += 1
-    st.session_state.best_user_offer = max(st.session_state.best_user_offer or 0, offer_user)
-
-    # Falls Nutzer*in ≥ Originalpreis bietet -> fair bestätigen (sofern keine "Überzahlung")
-    if offer_user >= ORIGINAL_PRICE:
-        reply = f"{empathy} {args} Da der **Originalpreis 1.000 €** ist, bleiben wir bei **1.000 €**. {close}"
-        st.session_state.current_offer = ORIGINAL_PRICE
-        return reply, ORIGINAL_PRICE, False
-
-    # 1) Erste drei numerische Angebote: immer ein Gegenangebot ÜBER dem Nutzerpreis
-    if st.session_state.numeric_offer_count <= 3:
-        # Ziel: spürbar über Nutzerpreis bleiben, ohne unnatürlich zu wirken
-        deltas = {1: [40, 50, 35, 30], 2: [25, 30, 20, 15], 3: [10, 15, 20]}
-        delta = random.choice(deltas[st.session_state.numeric_offer_count])
-        # Obergrenze nicht über Originalpreis, nicht über aktuelles Angebot
-        upper_cap = min(ORIGINAL_PRICE, st.session_state.current_offer)
-        # Untere Schranke: mindestens Nutzerpreis + 5
-        tentative = max(offer_user + delta, offer_user + 5)
-        new_offer = min(upper_cap, tentative)
-        # Leichte Rundung auf 5er für Natürlichkeit
-        new_offer = int(round(new_offer / 5) * 5)
-        # Nicht unter aktuellem Angebot fallen
-        new_offer = min(new_offer, st.session_state.current_offer)
-        st.session_state.current_offer = new_offer
-
-        reply = (
-            f"{empathy} {args} Für ein **neues, originalverpacktes** Gerät halte ich "
-            f"**{new_offer} €** für angemessen. {close}"
-        )
-        return reply, new_offer, False
-
-    # 2) Ab dem 4. Zahlenangebot: moderat annähern, nie "unter Wert"
-    current = st.session_state.current_offer
-    # Wenn Nutzerangebot nahe am aktuellen Bot-Angebot liegt (≤10 € Abstand) -> Einigung anbieten
-    if current - offer_user <= 10 and offer_user >= INTERNAL_MIN_PRICE:
-        # leichte Variation: manchmal aufrunden/gleichziehen
-        final = current if current <= ORIGINAL_PRICE else ORIGINAL_PRICE
-        final = max(final, offer_user)
-        final = int(round(final / 5) * 5)
-        reply = f"{empathy} {args} Wenn wir uns auf **{final} €** verständigen, passt es für mich. {close}"
-        st.session_state.current_offer = final
-        return reply, final, False
-
-    # Nutzerangebot deutlich unter aktuellem Bot-Angebot
-    # -> vorsichtige Bewegung Richtung Mitte, aber nicht unter internen Mindestwert
-    midpoint = int(round((current + max(offer_user, INTERNAL_MIN_PRICE)) / 2.0))
-    step_down = random.choice([5, 10, 15])
-    new_offer = max(INTERNAL_MIN_PRICE, min(current - step_down, midpoint))
-    new_offer = int(round(new_offer / 5) * 5)
-    if new_offer > current:
-        new_offer = current
-    st.session_state.current_offer = new_offer
-
-    reply = (
-        f"{empathy} {args} Ich kann preislich entgegenkommen und **{new_offer} €** anbieten – "
-        f"darunter würde ich es ungern abgeben. {close}"
+    price = _parse_price(md)
+    st.session_state.chat.append("user", md, price)
+    st.session_state.ledger.record("user", price)
+    _save_transcript_row(_session_id(), "user", md, st.session_state.neg.current_offer)
+
+def _elapsed_s(start_time=None) -> float:
+    return (datetime.utcnow() - (start_time or st.session_state.start_time)).total_seconds()
+
+def _record_bot(handle, deadline, chat, neg, ledger, start_time, messages):
+    """Bot-Nachrichten übernehmen; steht ein Outcome fest, wird es (einmalig) geloggt. Danach Schnappschuss."""
+    for md in messages:
+        chat.append("bot", md, neg.current_offer)
+        ledger.record("bot", neg.current_offer)
+        _save_transcript_row(deadline.key, "bot", md, neg.current_offer)
+    if neg.outcome:
+        with span("outcome"):
+            _save_outcome_once(
+                handle, deadline, final_price=neg.final_price if neg.outcome == "deal" else 0,
+                ended_by=neg.ended_by, turns_user=ledger.rounds("user"), duration_s=int(_elapsed_s(start_time)),
+            )
+    with span("persist"):
+        handle.save({"chat": chat.to_dict(), "neg": neg.to_dict(), "ledger": ledger.to_dict(),
+                     "start_time": start_time.isoformat(), "outcome_done": deadline.done})
+
+def _bot_says(messages):
+    s = st.session_state
+    _record_bot(s.store, s.deadline, s.chat, s.neg, s.ledger, s.start_time, messages)
+
+def _expire(handle, chat, neg, ledger, start_time, deadline):
+    """[Scheduler-Thread] Zeitlimit ohne neue Nachricht: dieselbe Regel wie im Turn (Bestangebot/Absage)."""
+    if handle.is_stale():
+        return   # Session läuft auf einem anderen Worker weiter – dessen Scheduler ist zuständig
+    msg = ENGINE.time_guard(neg, max(_elapsed_s(start_time), ENGINE.time_limit_s), None)
+    _record_bot(handle, deadline, chat, neg, ledger, start_time, [msg] if msg else [])
+
+if "deadline" not in st.session_state:
+    # Zeitlimit serverseitig: feuert nach 10 Min. auch ohne weitere Nachricht (_expire)
+    st.session_state.deadline = get_scheduler().schedule(
+        _session_id(), ENGINE.time_limit_s - _elapsed_s(),   # wiederhergestellt: nur die Restzeit
+        partial(_expire, st.session_state.store, st.session_state.chat, st.session_state.neg,
+                st.session_state.ledger, st.session_state.start_time),
     )
-    return reply, new_offer, False
-
-def _time_guard_and_finish_if_needed(latest_user_price: int | None):
-    """Spätestens nach 10 Minuten unauffällig zum Abschluss führen (oder höflich absagen)."""
-    if st.session_state.deal_reached:
-        return
-    elapsed = (datetime.utcnow() - st.session_state.start_time).total_seconds()
-    if elapsed < TIME_LIMIT_SECONDS:
-        return
-    # Deadline erreicht – nicht kommunizieren, nur natürlich handeln
-    best_offer = st.session_state.best_user_offer or (latest_user_price or 0)
-    if best_offer >= INTERNAL_MIN_PRICE:
-        # Einigung zum besten genannten Preis (oder aktuellem Bot-Angebot, falls höher)
-        final = max(INTERNAL_MIN_PRICE, min(st.session_state.current_offer, ORIGINAL_PRICE, best_offer))
-        # leichte Varianz: manchmal auf hübsche Zahl runden
-        final = int(round(final / 5) * 5)
-        _finish(final_price=final, ended_by="time_finalization")
-    else:
-        _polite_decline()
+    if st.session_state.get("outcome_done"):
+        st.session_state.deadline.finish_once()   # Outcome steht schon im Store
+    st.session_state.store.live.update({key: st.session_state[key] for key in SHARED_KEYS})
 
 # --------------------------- [7] UI & CHATFLOW ----------------------------
 st.title("🤝 Verhandlung: iPad (neu & originalverpackt)")
@@ -352,6 +213,9 @@ ist aber bereit, in der Verhandlung **knapp darunter** zu gehen – jedoch nicht
         """
     )
 
+if st.session_state.pop("reloaded", False):
+    st.info("Die Verhandlung wurde in einem anderen Fenster weitergeführt – Stand neu geladen.")
+
 # Erste Bot-Nachricht (freundlich, ohne Zeitdruck)
 if len(st.session_state.chat) == 0:
     opening = (
@@ -359,55 +223,84 @@ if len(st.session_state.chat) == 0:
         f"Der Neupreis liegt bei **{ORIGINAL_PRICE} €**. "
         "Woran denken Sie preislich?"
     )
-    _bot_say(opening)
+    _bot_says([opening])
 
-# Bisherige Nachrichten anzeigen
-for role, text in st.session_state.chat:
+# Darstellung: Nachrichten werden NUR hier gezeichnet (_bot_says/_user_say hängen nur an).
+# Inkrementeller Modus: Verlauf wird bei vollen Reruns gezeichnet; Eingabe + neue Nachrichten
+# laufen als Fragment – ein Turn führt nur das Fragment erneut aus, nicht den ganzen Verlauf.
+def _render_message(role: str, text: str):
     st.chat_message("assistant" if role == "bot" else "user").markdown(text)
 
-# Eingabe & optionale Buttons
-col_in, col_deal, col_cancel = st.columns([4,1,1])
-with col_in:
-    user_input = st.chat_input("Ihre Nachricht / Ihr Angebot …")
-with col_deal:
-    deal_click = st.button("✅ Deal")
-with col_cancel:
-    cancel_click = st.button("✖️ Abbrechen")
-
-# Deal-Button: Abschluss zu aktuellem Bot-Angebot (wenn fair)
-if deal_click and not st.session_state.deal_reached:
-    # Abschluss nur, wenn aktuelles Angebot nicht "unter Wert" ist (immer erfüllt, da intern gesteuert)
-    _finish(st.session_state.current_offer, ended_by="deal_button")
-
-# Abbrechen: höfliche Absage + Outcome ohne Preis
-if cancel_click and not st.session_state.deal_reached:
-    _polite_decline()
-
-# Nutzer-Eingabe verarbeiten
-if user_input and not st.session_state.deal_reached:
-    _user_say(user_input)
-
-    # Expliziter Deal via Text?
-    is_deal, price_in_text = _detect_deal(user_input)
-    if is_deal:
-        # Deal nur, wenn fair (≥ interne Untergrenze), aber wir nennen sie nie
-        if price_in_text is not None and price_in_text >= INTERNAL_MIN_PRICE and price_in_text <= ORIGINAL_PRICE:
-            _finish(final_price=price_in_text, ended_by="user_says_deal_with_price")
-        elif price_in_text is None:
-            # Kein Preis genannt -> Abschluss zum aktuellen Bot-Angebot
-            _finish(final_price=st.session_state.current_offer, ended_by="user_says_deal_no_price")
-        else:
-            # Preis zu niedrig -> normaler Gegenangebot-Fluss (keine harte Zahl nennen)
-            reply, new_offer, _ = _counter_logic(user_input)
-            _bot_say(reply)
-    else:
-        # Normales Gegenangebot / Reaktion
-        reply, new_offer, _ = _counter_logic(user_input)
-        _bot_say(reply)
-
-    # Nach jeder Nutzeraktion: ggf. Deadline-Logik (10 Minuten) prüfen
-    _time_guard_and_finish_if_needed(latest_user_price=_parse_price(user_input))
+def _handle_turn(user_input, deal_click: bool, cancel_click: bool):
+    """Eingabe/Buttons verarbeiten (Deal, Abbruch, Nutzer-Turn inkl. Deadline, Sicherungsnetz)."""
+    with st.session_state.deadline.lock:     # nicht gleichzeitig mit _expire im Scheduler-Thread
+        _handle_turn_locked(user_input, deal_click, cancel_click)
+    if st.session_state.store.stale:
+        st.session_state.reloaded = True     # Schnappschuss abgelehnt → Stand des anderen Workers laden
+        st.rerun()
+
+def _handle_turn_locked(user_input, deal_click: bool, cancel_click: bool):
+    neg = st.session_state.neg
+    # Deal-Button: Abschluss zu aktuellem Bot-Angebot (wenn fair)
+    # Zeit-Spans (turn_metrics.py): engine = Gegenangebot/Deal-Logik, transcript = Log-Zeilen
+    if deal_click and not neg.deal_reached:
+        # Abschluss nur, wenn aktuelles Angebot nicht "unter Wert" ist (immer erfüllt, da intern gesteuert)
+        with span("engine"):
+            msg = ENGINE.finish(neg, neg.current_offer, ended_by="deal_button")
+        _bot_says([msg])
+
+    # Abbrechen: höfliche Absage + Outcome ohne Preis
+    if cancel_click and not neg.deal_reached:
+        with span("engine"):
+            msg = ENGINE.decline(neg)
+        _bot_says([msg])
+
+    # Nutzer-Eingabe: Deal via Text, Gegenangebot, danach ggf. Deadline-Logik (10 Minuten)
+    if user_input and not neg.deal_reached:
+        _user_say(user_input)
+        with span("engine"):
+            msgs = ENGINE.respond(neg, user_input, elapsed_s=_elapsed_s())
+        _bot_says(msgs)
+
+    # Absicherung gegen sehr lange Verläufe ohne Abschluss
+    if (not neg.deal_reached) and st.session_state.bot_turns >= MAX_BOT_TURNS:
+        with span("engine"):
+            msg = ENGINE.decline(neg)
+        _bot_says([msg])
+
+def _chat_area():
+    """Neue Nachrichten (seit dem letzten vollen Rerun) + Eingabe & Buttons."""
+    new_messages = st.container()   # steht über der Eingabe, wird nach der Verarbeitung gefüllt
+
+    # Eingabe & optionale Buttons
+    col_in, col_deal, col_cancel = st.columns([4,1,1])
+    with col_in:
+        user_input = st.chat_input("Ihre Nachricht / Ihr Angebot …")
+    with col_deal:
+        deal_click = st.button("✅ Deal")
+    with col_cancel:
+        cancel_click = st.button("✖️ Abbrechen")
+
+    acted = user_input or deal_click or cancel_click
+    sweep_idle()   # inaktive Sessions anderer Teilnehmer:innen auf die Platte (auch in Fragment-Reruns)
+    with measure_turn("app", _session_id()) if acted else nullcontext():
+        _handle_turn(user_input, deal_click, cancel_click)
+
+        pending = st.session_state.chat[st.session_state.rendered_upto:]
+        if INCREMENTAL_RENDER and len(pending) > MAX_PENDING_MESSAGES:
+            # Gelegentlich voller Rerun: verschiebt die neuen Nachrichten in den festen Verlauf,
+            # damit Fragment-Reruns nicht mit der Session-Länge wachsen.
+            st.rerun()
+        with new_messages, span("render"):
+            for role, text in pending:
+                _render_message(role, text)
+
+# Bisheriger Verlauf (nur bei vollen Reruns)
+for role, text in st.session_state.chat:
+    _render_message(role, text)
+st.session_state.rendered_upto = len(st.session_state.chat)
 
-# Absicherung gegen sehr lange Verläufe ohne Abschluss
-if (not st.session_state.deal_reached) and st.session_state.bot_turns >= MAX_BOT_TURNS:
-    _polite_decline()
+if INCREMENTAL_RENDER:
+    st.fragment(_chat_area)()
+else:
+    _chat_area()
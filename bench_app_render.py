@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# BENCHMARK: Rerun-Dauer von app.py in Abhängigkeit von der Verlaufslänge
+# ----------------------------------------------------------------------------
+# [1] Verlauf mit N Nachrichten im Session-State vorbereiten (headless, AppTest).
+# [2] Einen Turn (Nutzer-Nachricht → Bot-Antwort) messen:
+#     voll        – APP_INCREMENTAL_RENDER=0: ganzes Skript inkl. Verlauf
+#     fragment    – inkrementell: nur das Chat-Fragment (Eingabe + neue Nachrichten)
+# [3] Bericht je N: Median-Dauer und Anzahl gezeichneter Chat-Nachrichten pro Rerun.
+#
+# Aufruf:  python bench_app_render.py [--lengths 10,50,100,200] [--repeat 15]
+# ============================================================================
+
+import argparse
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+import streamlit.testing.v1.local_script_runner as _lsr
+
+APP = str(Path(__file__).resolve().with_name("app.py"))
+sys.path.insert(0, str(Path(APP).parent))
+
+# ------------------------------ [1] VORBEREITEN ---------------------------
+def prepared_app(n_messages: int) -> AppTest:
+    """app.py einmal voll ausführen und den Verlauf auf n_messages Nachrichten auffüllen."""
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    chat = at.session_state.chat
+    i = 0
+    while len(chat) < n_messages:
+        chat.append(("user", f"Wie wäre es mit {800 + i % 50} €? Ich bin Student und das Budget ist knapp."))
+        chat.append(("bot", "Verstehe Ihren Punkt. Neu/OVP hält den Wiederverkaufswert deutlich besser. "
+                            f"Für ein **neues, originalverpacktes** Gerät halte ich **{900 - i % 50} €** für angemessen."))
+        i += 1
+    at.run()   # voller Rerun: Verlauf steht, rendered_upto = N
+    return at
+
+
+def _fragment_id(at: AppTest) -> str:
+    ids = list(at._fragment_storage._fragments)
+    if len(ids) != 1:
+        raise RuntimeError(f"Erwarte genau ein Fragment in app.py, gefunden: {len(ids)}")
+    return ids[0]
+
+
+def run_fragment(at: AppTest):
+    """Fragment-Rerun wie im Browser nach einer Eingabe im Fragment (nur das Fragment läuft)."""
+    orig = _lsr.RerunData
+    _lsr.RerunData = functools.partial(orig, fragment_id_queue=[_fragment_id(at)])
+    try:
+        return at.run()
+    finally:
+        _lsr.RerunData = orig
+
+# ------------------------------- [2] MESSEN -------------------------------
+def measure(n_messages: int, incremental: bool, repeat: int):
+    os.environ["APP_INCREMENTAL_RENDER"] = "1" if incremental else "0"
+    times, drawn = [], []
+    for _ in range(repeat):
+        at = prepared_app(n_messages)
+        at.chat_input[0].set_value("Ich biete 850 €")
+        t0 = time.perf_counter()
+        tree = run_fragment(at) if incremental else at.run()
+        times.append(time.perf_counter() - t0)
+        drawn.append(len(tree.chat_message))
+        if tree.exception:
+            raise RuntimeError(tree.exception[0].value)
+    return statistics.median(times) * 1000, statistics.median(drawn)
+
+# ------------------------------- [3] BERICHT ------------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lengths", default="10,50,100,200", help="Verlaufslängen (Nachrichten), kommagetrennt")
+    ap.add_argument("--repeat", type=int, default=15)
+    a = ap.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="bench_render_"))   # Logs nicht ins Repo schreiben
+    print(f"{'Nachrichten':>11}  {'voll ms':>9} {'gezeichnet':>10}  {'fragment ms':>11} {'gezeichnet':>10}  Faktor")
+    for n in (int(x) for x in a.lengths.split(",")):
+        full_ms, full_n = measure(n, incremental=False, repeat=a.repeat)
+        frag_ms, frag_n = measure(n, incremental=True, repeat=a.repeat)
+        print(f"{n:>11}  {full_ms:>9.1f} {full_n:>10.0f}  {frag_ms:>11.1f} {frag_n:>10.0f}  {full_ms / frag_ms:5.1f}×")
+
+
+if __name__ == "__main__":
+    main()
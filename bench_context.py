@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# BENCHMARK: Kontext-Verdichtung in chat.py (voller Verlauf vs. letzte K Turns)
+# ----------------------------------------------------------------------------
+# [1] Lange Käufer-Skripte (viele kleine Schritte, Argumente) gegen chat.py
+#     (headless, AppTest) und den lokalen Mock-Server.
+# [2] Je Modus (CONTEXT_KEEP_TURNS = 0 / K …) dieselben Skripte; gemessen am
+#     Mock: Prompt-Tokens pro Turn und pro Session, davon aus dem (simulierten)
+#     Prompt-Cache des Anbieters, Rerun-Dauer (mit --prefill-ms-per-ktok inkl.
+#     Prefill-Zeit der nicht gecachten Tokens).
+# [3] Verhandlungsergebnis: Folge der Bot-Angebote (Ledger) und letztes
+#     Bot-Angebot je Session im Vergleich zum vollen Verlauf.
+#
+# Aufruf:  python bench_context.py [--keep 0,2,4] [--sessions 5] [--turns 20]
+# ============================================================================
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from loadtest import ARGUMENTS  # noqa: E402
+from mock_openai import start_server  # noqa: E402
+
+# ------------------------------ [1] SKRIPTE -------------------------------
+def long_script(seed: int, turns: int) -> list[str]:
+    """Startgebot 600–700 €, steigt in 5–15-€-Schritten; jede zweite Nachricht mit Argument."""
+    rng = random.Random(seed)
+    offer = rng.randrange(600, 700, 10)
+    msgs = []
+    for _ in range(turns):
+        arg = rng.choice(ARGUMENTS) + " " if rng.random() < 0.5 else ""
+        msgs.append(f"{arg}Ich biete {offer} €.")
+        offer += rng.randrange(5, 20, 5)
+    return msgs
+
+# ------------------------------- [2] SESSION ------------------------------
+def run_session(server, url, keep: int, script):
+    at = AppTest.from_file(str(ROOT / "chat.py"), default_timeout=60)
+    at.secrets["OPENAI_API_KEY"] = "mock"
+    at.secrets["OPENAI_BASE_URL"] = url
+    at.secrets["OPENAI_STREAM"] = False
+    at.secrets["CONTEXT_KEEP_TURNS"] = keep
+    at.run()
+    per_turn, ms, cached = [], [], 0
+    for msg in script:
+        tokens0, cached0 = server.stats["prompt_tokens"], server.stats["cached_tokens"]
+        t0 = time.perf_counter()
+        at.chat_input[0].set_value(msg).run()
+        ms.append((time.perf_counter() - t0) * 1000)
+        per_turn.append(server.stats["prompt_tokens"] - tokens0)
+        cached += server.stats["cached_tokens"] - cached0
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    bot_offers = [p for role, p in at.session_state.ledger.trajectory if role == "assistant"]
+    return per_turn, ms, bot_offers, cached
+
+# ------------------------------- [3] BERICHT ------------------------------
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keep", default="0,2,4", help="CONTEXT_KEEP_TURNS-Werte (0 = voller Verlauf)")
+    ap.add_argument("--sessions", type=int, default=5)
+    ap.add_argument("--turns", type=int, default=20)
+    ap.add_argument("--violation-rate", type=float, default=0.0, help="Mock: Anteil regelverletzender Antworten")
+    ap.add_argument("--prefill-ms-per-ktok", type=float, default=0.0, help="Mock: ms je 1000 nicht gecachter Tokens")
+    a = ap.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="bench_context_"))   # Logs nicht ins Repo schreiben
+
+    scripts = [long_script(seed, a.turns) for seed in range(a.sessions)]
+    marks = sorted({t for t in (1, 5, 10, 20, 40, a.turns) if t <= a.turns})
+    baseline = None
+    print(f"{a.sessions} Sessions × {a.turns} Turns, Mock ohne Latenz "
+          f"(Prefill {a.prefill_ms_per_ktok} ms/1k Tokens), Streaming aus\n")
+    print(f"{'K':>3}  {'Tokens/Session':>14}  {'Ersparnis':>9}  {'Cache':>6}  "
+          + "  ".join(f"{'T' + str(t):>6}" for t in marks) + f"  {'Rerun ms':>8}  Ergebnis")
+    # EIN Server für alle Modi: chat.py hält den LLM-Client per st.cache_resource prozessweit
+    server, url = start_server(violation_rate=a.violation_rate, seed=1, prefill_ms_per_ktok=a.prefill_ms_per_ktok)
+    for keep in (int(k) for k in a.keep.split(",")):
+        runs = [run_session(server, url, keep, s) for s in scripts]
+        totals = [sum(per_turn) for per_turn, _, _, _ in runs]
+        at_turn = [statistics.mean(per_turn[t - 1] for per_turn, _, _, _ in runs) for t in marks]
+        rerun_ms = statistics.median(m for _, ms, _, _ in runs for m in ms)
+        offers = [o for _, _, o, _ in runs]
+        cache_share = sum(c for *_, c in runs) / (sum(totals) or 1)
+        if baseline is None:
+            baseline = (statistics.mean(totals), offers)
+            saving, outcome = "–", "Referenz"
+        else:
+            saving = f"{1 - statistics.mean(totals) / baseline[0]:.0%}"
+            same = sum(o == b for o, b in zip(offers, baseline[1]))
+            finals = [o[-1] - b[-1] for o, b in zip(offers, baseline[1]) if o and b]
+            outcome = (f"{same}/{len(offers)} Angebotsfolgen identisch, "
+                       f"Ø Abweichung letztes Angebot {statistics.mean(finals) if finals else 0:+.1f} €")
+        print(f"{keep:>3}  {statistics.mean(totals):>14.0f}  {saving:>9}  {cache_share:>6.0%}  "
+              + "  ".join(f"{v:>6.0f}" for v in at_turn) + f"  {rerun_ms:>8.1f}  {outcome}")
+    server.shutdown()
+    print("\nT<n> = Ø Prompt-Tokens des n-ten Turns (am Mock gezählt, inkl. Korrektur-Runden)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# BENCHMARK: Deadline-Scheduler (deadline_scheduler.py) bei tausenden Sessions
+# ----------------------------------------------------------------------------
+# [1] Leerlauf: N Sessions mit Deadlines weit in der Zukunft – CPU-Zeit des
+#     Prozesses, während der Scheduler-Thread schläft.
+# [2] Ablauf: N Deadlines gleichverteilt über --spread Sekunden, ein Teil wird
+#     vorher abgesagt (finish_once wie ein regulärer Abschluss). Gemessen:
+#     Verspätung je Auslösung (p50/p99/max), CPU-Zeit, doppelte/fehlende
+#     Auslösungen (muss 0 sein).
+# [3] Vergleich: Polling-Schleife, die jede Sekunde alle Sessions prüft.
+#
+# Aufruf:  python bench_deadlines.py [--sessions 10000] [--spread 5]
+# ============================================================================
+
+import argparse
+import random
+import threading
+import time
+
+from deadline_scheduler import DeadlineScheduler
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+# ------------------------------- [1] LEERLAUF -----------------------------
+def idle(n: int, seconds: float) -> float:
+    sched = DeadlineScheduler()
+    for k in range(n):
+        sched.schedule(f"s{k}", 3600 + k, lambda d: None)
+    c0 = time.process_time()
+    time.sleep(seconds)
+    return time.process_time() - c0
+
+# -------------------------------- [2] ABLAUF ------------------------------
+def expiry(n: int, spread: float, cancel_rate: float, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    sched = DeadlineScheduler()
+    fired, lock = {}, threading.Lock()
+
+    def on_expire(d):
+        lag = time.monotonic() - d.at
+        if d.finish_once():
+            with lock:
+                fired[d.key] = fired.get(d.key, 0) + 1
+                lags.append(lag)
+
+    lags = []
+    c0 = time.process_time()
+    deadlines = [sched.schedule(f"s{k}", rng.uniform(0, spread), on_expire) for k in range(n)]
+    cancelled = {d.key for d in deadlines if rng.random() < cancel_rate and d.finish_once()}
+    time.sleep(spread + 0.5)
+    cpu = time.process_time() - c0
+    expected = n - len(cancelled)
+    return {"cpu_s": cpu, "fired": len(fired), "expected": expected,
+            "double": sum(1 for v in fired.values() if v > 1),
+            "fired_cancelled": len(cancelled & fired.keys()),
+            "lag_p50_ms": 1000 * _pct(lags, 50), "lag_p99_ms": 1000 * _pct(lags, 99),
+            "lag_max_ms": 1000 * max(lags, default=0.0), "stats": sched.stats()}
+
+# ------------------------------- [3] POLLING ------------------------------
+def polling(n: int, seconds: float, interval: float = 1.0) -> float:
+    """Bisherige Alternative: alle Sessions periodisch prüfen (CPU-Zeit über `seconds`)."""
+    now = time.monotonic()
+    sessions = [{"at": now + 3600 + k, "done": False} for k in range(n)]
+    c0, end = time.process_time(), now + seconds
+    while time.monotonic() < end:
+        t = time.monotonic()
+        for s in sessions:
+            if not s["done"] and s["at"] <= t:
+                s["done"] = True
+        time.sleep(interval)
+    return time.process_time() - c0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=10_000)
+    ap.add_argument("--spread", type=float, default=5.0, help="Deadlines verteilt über so viele Sekunden")
+    ap.add_argument("--cancel-rate", type=float, default=0.6, help="Anteil vorher regulär beendeter Sessions")
+    ap.add_argument("--idle", type=float, default=3.0, help="Dauer der Leerlauf-Messung (s)")
+    a = ap.parse_args()
+
+    cpu = idle(a.sessions, a.idle)
+    print(f"[1] Leerlauf, {a.sessions} offene Deadlines: {cpu * 1000:.1f} ms CPU in {a.idle:.0f} s "
+          f"({100 * cpu / a.idle:.3f} %)")
+    r = expiry(a.sessions, a.spread, a.cancel_rate)
+    print(f"[2] Ablauf über {a.spread:.0f} s: {r['fired']}/{r['expected']} ausgelöst, doppelt {r['double']}, "
+          f"trotz Absage {r['fired_cancelled']}")
+    print(f"    Verspätung p50 {r['lag_p50_ms']:.2f} ms, p99 {r['lag_p99_ms']:.2f} ms, max {r['lag_max_ms']:.2f} ms; "
+          f"CPU {r['cpu_s'] * 1000:.0f} ms ({r['cpu_s'] * 1e6 / a.sessions:.1f} µs/Session inkl. Einplanen)")
+    print(f"    {r['stats']}")
+    cpu = polling(a.sessions, a.idle)
+    print(f"[3] Polling jede Sekunde, {a.sessions} Sessions: {cpu * 1000:.1f} ms CPU in {a.idle:.0f} s "
+          f"({100 * cpu / a.idle:.3f} %)")
+    if r["double"] or r["fired_cancelled"] or r["fired"] != r["expected"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# KORPUS-PRÜFUNG: Preiserkennung bisher (jede 2–5-stellige Zahl) vs. einheiten-
+# bewusst (text_analysis.extract_amounts) – Fehlalarme der Floor-Regel
+# ----------------------------------------------------------------------------
+# [1] Korpus: Verkäufer-Antworten mit Label. Regelkonform, aber mit Mengen
+#     (256 GB, 11 Zoll, 12 Monate, 10 %, 2024, 14:30 Uhr, iPad 10, 1.000 €, …)
+#     bzw. echte Verstöße (Angebot unter dem Floor, auch ohne €-Zeichen).
+# [2] Pro Antwort: Floor-Verstoß laut alter und neuer Erkennung → Fehlalarme
+#     (regelkonform, aber markiert) und verpasste Verstöße je Variante.
+# [3] Wiederholungs-Simulation wie generate_reply in chat.py: bis zu 3 Versuche
+#     pro Turn, jeder Versuch eine Antwort aus dem Korpus; markiert → erneuter
+#     API-Aufruf, nach 3 markierten → regelbasierter Fallback. Ergebnis: API-
+#     Aufrufe pro Turn und Fallback-Quote, alt vs. neu.
+#
+# Exit-Code 1, wenn die neue Erkennung einen Fehlalarm oder einen verpassten
+# Verstoß im Korpus hat (als Regressionstest nutzbar).
+#
+# Aufruf:  python bench_price_extraction.py [--turns 100000] [--spec-rate 0.3]
+# ============================================================================
+
+import argparse
+import random
+import sys
+
+from bench_text_analysis import old_extract_prices
+from compliance import violates_rules
+
+PARAMS = {"min_price": 750}
+ATTEMPTS = 3   # wie generate_reply: erster Versuch + 2 Korrektur-Runden
+
+# ------------------------------ [1] KORPUS --------------------------------
+# {p} = Angebot ≥ Floor. Regelkonform, nennen aber Mengen/Modelle/Daten.
+SPEC_TEMPLATES = [
+    "Das iPad (256 GB, neueste Generation) ist originalverpackt – {p} € halte ich für fair.",
+    "Mit 256GB Speicher und 11 Zoll Display sind {p} € ein guter Preis.",
+    "Es gibt noch 12 Monate Garantie; {p} € wäre mein Angebot.",
+    "Das Gerät ist von 2024 und neu. Für {p} € gehört es Ihnen.",
+    "Das sind rund 10 % unter dem Ausgangspreis: {p} €.",
+    "Ausgangspreis war 1.000 €, ich komme Ihnen auf {p} € entgegen.",
+    "Abholung wäre heute bis 18:30 Uhr möglich, {p} € bar.",
+    "Das iPad 10 ist neu – {p},- € und wir sind uns einig.",
+    "Sie bekommen die 10. Generation für {p} €.",
+    "Der Akku hält gut 10 Stunden; preislich liege ich bei {p} €.",
+    "Ich habe es am 12.03.2024 gekauft, Rechnung liegt bei. {p} € passt für mich.",
+    "iPadOS 17.2 ist schon installiert; {p} Euro wären fair.",
+    "Es hat 5 Jahre Software-Updates vor sich – {p} € finde ich angemessen.",
+    "Wir sind schon in der 4. Runde, treffen wir uns bei {p} €?",
+    "Für 2 Stück hätte ich keinen Rabatt, für eins {p} €.",
+]
+PLAIN_TEMPLATES = [
+    "Danke für Ihr Angebot. Für ein neues, originalverpacktes Gerät kann ich Ihnen {p} € anbieten.",
+    "Ich komme Ihnen entgegen: {p} €. Wäre das in Ordnung?",
+    "Wie wäre es mit {p}?",
+]
+# {q} = Angebot UNTER dem Floor – echte Verstöße
+VIOLATION_TEMPLATES = [
+    "Okay, {q} € wären für mich in Ordnung.",
+    "Ich gehe auf {q} runter, wenn Sie heute abholen.",
+    "Für {q},- gehört das iPad (256 GB) Ihnen.",
+    "Mit 12 Monaten Garantie für {q} Euro – einverstanden?",
+]
+
+
+def make_reply(rng: random.Random, spec_rate: float, violation_rate: float) -> tuple[str, bool]:
+    """(antwort, verstößt_wirklich)."""
+    if rng.random() < violation_rate:
+        return rng.choice(VIOLATION_TEMPLATES).format(q=rng.randrange(500, 750, 5)), True
+    templates = SPEC_TEMPLATES if rng.random() < spec_rate else PLAIN_TEMPLATES
+    return rng.choice(templates).format(p=rng.randrange(750, 1000, 5)), False
+
+# ------------------------------ [2] PRÜFUNG -------------------------------
+def old_floor(text: str) -> bool:
+    return any(p < PARAMS["min_price"] for p in old_extract_prices(text))
+
+
+def new_floor(text: str) -> bool:
+    reason = violates_rules(text, PARAMS)
+    return bool(reason) and reason.startswith("Unterschreite")
+
+
+def corpus_check() -> dict:
+    """Jede Vorlage mit allen Angeboten in 5-€-Schritten: Fehlalarme / verpasste Verstöße je Variante."""
+    cases = [(t.format(p=p), False) for t in SPEC_TEMPLATES + PLAIN_TEMPLATES for p in range(750, 1000, 5)]
+    cases += [(t.format(q=q), True) for t in VIOLATION_TEMPLATES for q in range(500, 750, 5)]
+    out = {"cases": len(cases), "violations": sum(v for _, v in cases)}
+    for label, check in (("old", old_floor), ("new", new_floor)):
+        flagged = [(text, v) for text, v in cases if check(text)]
+        out[label] = {
+            "false_positive": sum(1 for _, v in flagged if not v),
+            "missed": out["violations"] - sum(1 for _, v in flagged if v),
+            "examples": [text for text, v in flagged if not v][:3],
+        }
+    return out
+
+# ---------------------------- [3] SIMULATION ------------------------------
+def simulate(check, turns: int, spec_rate: float, violation_rate: float, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    calls = fallbacks = wasted = 0
+    for _ in range(turns):
+        for attempt in range(ATTEMPTS):
+            calls += 1
+            text, real = make_reply(rng, spec_rate, violation_rate)
+            if not check(text):
+                break
+            wasted += not real
+        else:
+            fallbacks += 1
+    return {"calls_per_turn": calls / turns, "fallback_rate": fallbacks / turns,
+            "false_retries_per_1k": 1000 * wasted / turns}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=100_000)
+    ap.add_argument("--spec-rate", type=float, default=0.3, help="Anteil Antworten, die Mengen/Modelle nennen")
+    ap.add_argument("--violation-rate", type=float, default=0.05, help="Anteil echter Floor-Verstöße")
+    a = ap.parse_args()
+
+    c = corpus_check()
+    print(f"Korpus: {c['cases']} Antworten, davon {c['violations']} echte Floor-Verstöße\n")
+    print(f"{'':<10} {'Fehlalarme':>10}  {'verpasst':>8}")
+    for label in ("old", "new"):
+        print(f"{label:<10} {c[label]['false_positive']:>10}  {c[label]['missed']:>8}")
+        for ex in c[label]["examples"]:
+            print(f"             z. B. {ex}")
+
+    print(f"\nSimulation generate_reply: {a.turns} Turns, {a.spec_rate:.0%} mit Mengenangaben, "
+          f"{a.violation_rate:.0%} echte Verstöße")
+    print(f"{'':<10} {'API-Aufrufe/Turn':>16}  {'Fallback':>8}  {'Fehl-Wiederholungen/1000':>24}")
+    for label, check in (("old", old_floor), ("new", new_floor)):
+        s = simulate(check, a.turns, a.spec_rate, a.violation_rate)
+        print(f"{label:<10} {s['calls_per_turn']:>16.3f}  {s['fallback_rate']:>8.2%}  {s['false_retries_per_1k']:>24.1f}")
+    if c["new"]["false_positive"] or c["new"]["missed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# BENCHMARK: Speicher pro 1.000 gleichzeitigen Sessions (Session-Zustand)
+# ----------------------------------------------------------------------------
+# [1] Je App und Variante ein frischer Kindprozess, der N Sessions mit T Turns
+#     aufbaut – mit den echten Texten (app.py: NegotiationEngine, chat.py:
+#     Verkäufer-Sätze wie vom Mock) und denselben Objekten wie in session_state:
+#       list   – bisher: Liste von Tupeln (app) bzw. Dicts + Params-Kopie (chat)
+#       compact – ChatLog (compact_state.py), geteilte Params
+#       spilled – compact, danach alle Sessions ausgelagert (sweep_idle)
+#     Ledger und Verhandlungszustand sind in allen Varianten gleich enthalten.
+# [2] Gemessen: RSS-Zuwachs des Prozesses (Linux /proc) und – in einem zweiten
+#     Lauf – die tatsächlich belegten Python-Bytes (tracemalloc). Nach dem
+#     Auslagern gibt der Allokator freie Seiten nicht immer ans System zurück;
+#     der tracemalloc-Wert zeigt den echten Rückgang.
+#
+# Aufruf:  python bench_session_memory.py [--sessions 1000] [--turns 12]
+# ============================================================================
+
+import argparse
+import gc
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from compact_state import ChatLog, sweep_idle  # noqa: E402
+from compliance import offer_in  # noqa: E402
+from negotiation_engine import NegotiationEngine  # noqa: E402
+from offer_ledger import OfferLedger  # noqa: E402
+
+VARIANTS = ("list", "compact", "spilled")
+CHAT_PARAMS = {"scenario_text": "Sie verhandeln über ein neues iPad (256 GB, neuste Generation).",
+               "list_price": 1000, "min_price": 750, "tone": "freundlich, respektvoll, auf Augenhöhe, sachlich",
+               "max_sentences": 4}
+
+# ------------------------------ [1] SESSIONS ------------------------------
+def _rss_bytes() -> int:
+    # wie loadtest._rss_bytes – hier kopiert, damit der Import nicht Streamlit in den RSS zieht
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+
+def _buyer(rng, turns):
+    offer = rng.randrange(600, 800, 10)
+    for _ in range(turns):
+        yield f"Ich bin Studentin und das Budget ist knapp – ich biete {offer} €."
+        offer += rng.randrange(5, 30, 5)
+
+
+def app_session(k: int, variant: str, turns: int) -> dict:
+    rng = random.Random(k)
+    engine = NegotiationEngine(rng=rng)
+    neg, ledger = engine.new_state(), OfferLedger()
+    chat = [] if variant == "list" else ChatLog(f"app{k}")
+
+    def say(role, text, offer):
+        if variant == "list":
+            chat.append((role, text))
+        else:
+            chat.append(role, text, offer)
+        ledger.record(role, offer)
+
+    say("bot", "Hallo! Danke für Ihr Interesse 😊 Das iPad ist **neu & originalverpackt**. "
+               "Der Neupreis liegt bei **1000 €**.", neg.current_offer)
+    for text in _buyer(rng, turns):
+        say("user", text, offer_in(text))
+        for msg in engine.respond(neg, text):
+            say("bot", msg, neg.current_offer)
+    return {"chat": chat, "neg": neg, "ledger": ledger}
+
+
+def chat_session(k: int, variant: str, turns: int) -> dict:
+    rng = random.Random(k)
+    params = dict(CHAT_PARAMS) if variant == "list" else CHAT_PARAMS
+    chat = [] if variant == "list" else ChatLog(f"chat{k}")
+    ledger = OfferLedger()
+    bot = 1000
+
+    def add(role, content):
+        if variant == "list":
+            chat.append({"role": role, "content": content})
+        else:
+            chat.append(role, content, offer_in(content))
+        ledger.record(role, offer_in(content))
+
+    add("assistant", "Hallo! Danke für Ihre Nachricht. Das iPad ist neu und originalverpackt. "
+                     "Der angesetzte Preis liegt bei 1000 €. Wie ist Ihr Vorschlag?")
+    for text in _buyer(rng, turns):
+        add("user", text)
+        bot = max(750, bot - rng.randrange(10, 40, 5))
+        add("assistant", f"Danke für Ihr Angebot. Für ein neues, originalverpacktes Gerät kann ich Ihnen "
+                         f"{bot} € anbieten. Wäre das für Sie in Ordnung?")
+    return {"chat": chat, "params": params, "ledger": ledger}
+
+# ------------------------------- [2] MESSUNG ------------------------------
+def child(app: str, variant: str, sessions: int, turns: int, trace: bool) -> dict:
+    build = app_session if app == "app" else chat_session
+    build(-1, variant, turns)   # Imports/Caches aufwärmen
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0] if trace else _rss_bytes()
+    keep = [build(k, variant, turns) for k in range(sessions)]
+    if variant == "spilled":
+        sweep_idle(idle_s=1e-9, force=True)
+    gc.collect()
+    used = (tracemalloc.get_traced_memory()[0] if trace else _rss_bytes()) - base
+    del keep
+    return {"bytes": used}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=1000)
+    ap.add_argument("--turns", type=int, default=12, help="Nutzer-Nachrichten pro Session")
+    ap.add_argument("--child", nargs=3, metavar=("APP", "VARIANT", "TRACE"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        app, variant, trace = a.child
+        print(json.dumps(child(app, variant, a.sessions, a.turns, trace == "1")))
+        return
+
+    spill_dir = tempfile.mkdtemp(prefix="bench_spill_")
+    print(f"{a.sessions} Sessions × {a.turns} Nutzer-Nachrichten je App (Kindprozess je Messung)\n")
+    print(f"{'App':<5} {'Variante':<8} {'RSS MB/1000':>12} {'Python MB/1000':>15} {'KB/Session':>11}")
+    for app in ("app", "chat"):
+        for variant in VARIANTS:
+            res = {}
+            for trace in ("0", "1"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--sessions", str(a.sessions), "--turns", str(a.turns),
+                     "--child", app, variant, trace],
+                    capture_output=True, text=True, check=True, cwd=spill_dir,
+                    env={"SESSION_SPILL_DIR": spill_dir, "PATH": ""},
+                )
+                res[trace] = json.loads(out.stdout.strip().splitlines()[-1])
+            per_k = 1000 / a.sessions / 1024 / 1024
+            print(f"{app:<5} {variant:<8} {res['0']['bytes'] * per_k:>12.2f} {res['1']['bytes'] * per_k:>15.2f} "
+                  f"{res['1']['bytes'] / a.sessions / 1024:>11.2f}")
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    print("\nRSS = Zuwachs des Resident Set Size, Python = tracemalloc (belegte Bytes ohne Allokator-Reserve)")
+
+
+if __name__ == "__main__":
+    main()
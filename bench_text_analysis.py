@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# BENCHMARK: Einzelfunktionen (bisher) vs. text_analysis.analyze (ein Durchlauf)
+# ----------------------------------------------------------------------------
+# [1] Synthetischer Korpus: Käufer- und Verkäufer-Nachrichten mit Preisen,
+#     Argumenten, Deal-Formulierungen und (selten) Machtprimes.
+# [2] Referenz: die bisherigen Funktionen aus app.py/chat.py (unverändert kopiert).
+# [3] Prüfung auf identische Ergebnisse (Argumente, Deal, Primes – Preise sind
+#     seit der einheitenbewussten Erkennung absichtlich anders, siehe
+#     bench_price_extraction.py) + Laufzeiten pro Turn-Muster:
+#     app.py-Turn  = _detect_deal + _parse_price×2 + _classify_args
+#     chat.py-Turn = violates_rules (Primes + Offenlegung + Preise) + extract_prices
+#
+# Aufruf:  python bench_text_analysis.py [--n 200000]
+# ============================================================================
+
+import argparse
+import random
+import re
+import time
+
+from text_analysis import analyze, arg_flags
+
+# ------------------------------ [1] KORPUS --------------------------------
+FILLER = [
+    "Hallo", "ich", "hätte", "Interesse", "an", "dem", "iPad", "wie", "sieht", "es", "aus", "mit",
+    "dem", "Preis", "für", "das", "Gerät", "ist", "noch", "verfügbar", "danke", "schön", "gerne",
+    "vielleicht", "können", "wir", "uns", "treffen", "Kommunikation", "Bargeld", "Universität",
+]
+KEYWORDS = [
+    "Student", "Studium", "Budget", "zu teuer", "kann mir nicht leisten", "knapp", "pleite",
+    "günstiger", "billiger", "Angebot", "Preisvergleich", "idealo", "woanders", "gebraucht",
+    "Kratzer", "Zustand", "dringend", "eilig", "heute", "sofort", "morgen", "bar", "cash",
+    "abholen", "Abholung", "Versand", "schicken", "Garantie", "Gewährleistung", "Rechnung",
+    "AppleCare", "Deal", "einverstanden", "akzeptiere", "passt", "nehme ich",
+]
+PRIMES = [
+    "Es gibt Alternativen.", "Weitere Interessenten melden sich.", "Die Knappheit ist real.",
+    "Letzte Chance!", "Der Marktpreis ist höher.", "Der Neupreis liegt bei 1000 €.",
+    "Nicht unter 800.", "Mindestens 850 €.", "Darunter gehe ich nicht.",
+]
+PRICES = ["750", "800 €", "€ 820", "950,00", "1.000 €", "1 000", "899€", "256 GB", "2024", "12345678"]
+
+
+def make_corpus(n: int, seed=7) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(4, 30))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(KEYWORDS))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(PRICES))
+        if rng.random() < 0.05:
+            words.append(rng.choice(PRIMES))
+        out.append(" ".join(words))
+    return out
+
+# ------------------------------ [2] REFERENZ ------------------------------
+BAD_PATTERNS = [
+    r"\balternative(n)?\b", r"\bweitere(n)?\s+interessent(en|in)\b", r"\bknapp(e|heit)\b",
+    r"\bdeadline\b", r"\bletzte chance\b", r"\bbranchen(üblich|standard)\b",
+    r"\bmarktpreis\b", r"\bneupreis\b", r"\bschmerzgrenze\b", r"\buntergrenze\b", r"darunter\s+gehe\s+ich\s+nicht", r"nicht\s+unter\s*\d+", r"mindestens\s*\d+", r"\bsonst geht es\b"
+]
+PRICE_RE = re.compile(r"(?:€\s*)?(\d{2,5})")
+
+
+def old_contains_power_primes(text):
+    t = text.lower()
+    return any(re.search(p, t) for p in BAD_PATTERNS)
+
+
+def old_extract_prices(text):
+    return [int(m.group(1)) for m in PRICE_RE.finditer(text)]
+
+
+def old_violates_rules(text, params):
+    t = text.lower()
+    if old_contains_power_primes(text):
+        return "primes"
+    if re.search(r"\buntergrenze\b|\bschmerzgrenze\b|darunter\s+gehe\s+ich\s+nicht|nicht\s+unter\s*\d+", t):
+        return "disclosure"
+    if any(p < params["min_price"] for p in old_extract_prices(text)):
+        return "floor"
+    return None
+
+
+def old_parse_price(text):
+    if not text:
+        return None
+    t = text.replace(" ", "")
+    m = re.search(r"(\d+(?:[.,]\d{1,2})?)", t)
+    if not m:
+        return None
+    raw = m.group(1).replace(".", "").replace(",", ".")
+    try:
+        return int(round(float(raw)))
+    except Exception:
+        return None
+
+
+def old_classify_args(text):
+    t = text.lower()
+    return {
+        "student": any(w in t for w in ["student", "studium", "uni"]),
+        "budget": any(w in t for w in ["budget", "teuer", "kann mir nicht leisten", "knapp", "pleite"]),
+        "cheaper": any(w in t for w in ["günstiger", "billiger", "angebot", "preisvergleich", "idealo", "woanders"]),
+        "condition": any(w in t for w in ["gebraucht", "kratzer", "zustand"]),
+        "immediacy": any(w in t for w in ["dringend", "eilig", "heute", "sofort", "morgen"]),
+        "cash": any(w in t for w in ["bar", "cash"]),
+        "pickup": any(w in t for w in ["abholen", "abholung"]),
+        "shipping": any(w in t for w in ["versand", "schicken"]),
+        "warranty": any(w in t for w in ["garantie", "gewährleistung", "rechnung", "applecare"]),
+    }
+
+
+def old_detect_deal(text):
+    if not text:
+        return False, None
+    tl = text.lower()
+    keys = ["deal", "einverstanden", "akzeptiere", "passt", "nehme ich", "agree", "accepted"]
+    return any(k in tl for k in keys), old_parse_price(text)
+
+# ------------------------------- [3] ABLAUF -------------------------------
+def check_equivalence(corpus):
+    params = {"min_price": 750}
+    for text in corpus:
+        a = analyze(text)
+        # Preise bewusst NICHT mehr identisch (Einheiten, Jahreszahlen …): bench_price_extraction.py
+        assert arg_flags(text) == old_classify_args(text), text
+        assert a.deal == old_detect_deal(text)[0], text
+        assert bool(a.primes) == old_contains_power_primes(text), text
+        if a.primes:
+            assert old_violates_rules(text, params) == "primes", text
+
+
+def old_app_turn(text):
+    old_detect_deal(text)
+    old_parse_price(text)
+    old_classify_args(text)
+    old_parse_price(text)
+
+
+def old_chat_turn(text):
+    old_violates_rules(text, {"min_price": 750})
+    old_extract_prices(text)
+
+
+def new_app_turn(text):
+    a = analyze(text)
+    a.deal, a.first_price, arg_flags(text), a.first_price
+
+
+def new_chat_turn(text):
+    a = analyze(text)
+    a.primes, a.prices
+
+
+def timed(fn, corpus):
+    t0 = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000, help="Anzahl Nachrichten im Korpus")
+    a = ap.parse_args()
+    corpus = make_corpus(a.n)
+    check_equivalence(corpus[:20_000])
+    print(f"Korpus: {len(corpus)} Nachrichten, Ø {sum(map(len, corpus)) / len(corpus):.0f} Zeichen – Schlagworte/Primes identisch")
+
+    for label, old, new in (("app.py-Turn", old_app_turn, new_app_turn), ("chat.py-Turn", old_chat_turn, new_chat_turn)):
+        t_old = timed(old, corpus)
+        analyze.cache_clear()
+        t_cold = timed(new, corpus)     # erster Aufruf je Nachricht (Cache leer)
+        recent = corpus[-4096:]         # passt in den Cache: erneute Prüfung derselben Nachricht
+        t_warm = timed(new, recent) * len(corpus) / len(recent)
+        us = 1e6 / len(corpus)
+        print(f"{label:<13} bisher {t_old * us:7.2f} µs   analyze kalt {t_cold * us:7.2f} µs "
+              f"({t_old / t_cold:4.1f}×)   warm {t_warm * us:6.2f} µs ({t_old / t_warm:5.1f}×)")
+
+
+if __name__ == "__main__":
+    main()
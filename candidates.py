@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# PARALLELE KANDIDATEN statt sequenzieller Korrektur-Runden
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Mehrere Antwort-Kandidaten auf einmal anfordern:
+#     "n"        – EINE Anfrage mit n Choices (ein Roundtrip, Prompt nur einmal bezahlt),
+#     "parallel" – n gleichzeitige Anfragen über den Verbindungspool
+#                  (der schnellste regelkonforme Kandidat gewinnt, die übrigen
+#                  werden abgebrochen – CancelToken trennt ihre Verbindungen).
+# [2] Den ersten Kandidaten wählen, der violates_rules besteht
+#     (Machtprimes, Offenlegung der Untergrenze, Preisfloor).
+# [3] Kennzahlen für das Log: wie viele Kandidaten erzeugt/geprüft wurden,
+#     bis einer passte, Gründe der verworfenen, Dauer und Tokens.
+# ============================================================================
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from compliance import violates_rules
+from llm_client import CancelToken, LLMError, LLMTimeout, budget_left, usage_tokens
+from response_cache import CacheMiss, cache_key
+
+MODES = ("n", "parallel")
+
+# Gemeinsamer Pool für den Modus "parallel" (Threads warten nur auf I/O)
+_executor = None
+
+
+def _get_executor(workers=32) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="candidates")
+    return _executor
+
+# ------------------------------ [1] ANFORDERN -----------------------------
+def _choices(data: dict) -> list[str]:
+    """Alle Choice-Texte einer Antwort (Reihenfolge nach index)."""
+    choices = sorted(data.get("choices") or [], key=lambda c: c.get("index", 0))
+    texts = [c.get("message", {}).get("content") for c in choices]
+    texts = [t for t in texts if isinstance(t, str)]
+    if not texts:
+        raise LLMError("Antwortformat unerwartet", body=json.dumps(data, ensure_ascii=False)[:1000])
+    return texts
+
+
+def _completion_tokens(data: dict) -> int | None:
+    usage = data.get("usage") or {}
+    return usage.get("completion_tokens")
+
+# ----------------------------- [2] AUSWÄHLEN ------------------------------
+def first_compliant(client, payload: dict, params: dict, n: int, mode: str = "n", cache=None,
+                    timeout: float | None = None):
+    """
+    Gibt (antwort, info) zurück. antwort ist der erste regelkonforme Kandidat –
+    oder, falls keiner passt, der erste Kandidat (info["compliant"] = False).
+    info: mode, n, generated (erhaltene Kandidaten), checked, needed (Position des
+    gewählten), rejected (Gründe), tokens, ms, cached; im Modus "parallel" zusätzlich usage
+    (calls, prompt_tokens, cached_tokens – die Anfragen liefen in Pool-Threads).
+    Mit aktivem Record/Replay-Cache wird der GEWÄHLTE Kandidat unter dem Schlüssel
+    der Anfrage gespeichert – Replays liefern damit dieselbe Antwort ohne Auswahl.
+    timeout: Zeitbudget in Sekunden; ohne rechtzeitigen Kandidaten → LLMTimeout.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unbekannter Kandidaten-Modus: {mode!r} (erlaubt: {', '.join(MODES)})")
+    t0 = time.perf_counter()
+    info = {"mode": mode, "n": n, "generated": 0, "checked": 0, "needed": None, "rejected": [],
+            "tokens": None, "ms": None, "cached": False, "compliant": False}
+
+    key = None
+    if cache is not None and cache.enabled:
+        key = cache_key(payload)
+        hit = cache.get(key)
+        if hit is not None:
+            # Aufgezeichnet wird der gewählte Kandidat – auch wenn keiner regelkonform war
+            reason = violates_rules(hit, params)
+            info.update(cached=True, generated=1, checked=1, needed=None if reason else 1, compliant=not reason,
+                        rejected=[reason] if reason else [], ms=round((time.perf_counter() - t0) * 1000, 2))
+            return hit, info
+        if cache.mode == "replay":
+            raise CacheMiss(f"Replay-Modus: keine Aufzeichnung für Anfrage {key[:12]}…")
+
+    if mode == "n":
+        reply = _pick_n(client, payload, params, n, info, timeout)
+    else:
+        reply = _pick_parallel(client, payload, params, n, info, timeout)
+
+    info["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    if key is not None:
+        cache.put(key, reply, payload)
+    return reply, info
+
+
+def _check(text, params, info) -> bool:
+    info["checked"] += 1
+    reason = violates_rules(text, params)
+    if reason:
+        info["rejected"].append(reason)
+        return False
+    info.update(needed=info["checked"], compliant=True)
+    return True
+
+
+def _pick_n(client, payload, params, n, info, timeout=None) -> str:
+    data = client.chat(dict(payload, n=n), timeout=timeout)
+    info["tokens"] = _completion_tokens(data)
+    texts = _choices(data)
+    info["generated"] = len(texts)
+    for text in texts:
+        if _check(text, params, info):
+            return text
+    return texts[0]
+
+
+def _call(client, payload, deadline, cancel):
+    """[Pool-Thread] Eine Kandidaten-Anfrage – mit dem Restbudget beim tatsächlichen Start."""
+    return client.chat(payload, timeout=budget_left(deadline), cancel=cancel)
+
+
+def _pick_parallel(client, payload, params, n, info, timeout=None) -> str:
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    cancel = CancelToken()
+    futures = {_get_executor().submit(_call, client, payload, deadline, cancel) for _ in range(n)}
+    first_text, errors, tokens = None, [], 0
+    # Usage aus den Antworten selbst – die Zähler des Clients (pro Thread) sieht der Aufrufer nicht
+    usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    try:
+        while futures:
+            left = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, futures = wait(futures, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMTimeout("Zeitbudget: kein Kandidat rechtzeitig")
+            for f in done:
+                try:
+                    data = f.result()
+                    text = _choices(data)[0]
+                except LLMError as e:
+                    errors.append(e)
+                    continue
+                prompt_tokens, cached_tokens = usage_tokens(data.get("usage"))
+                usage["calls"] += 1
+                usage["prompt_tokens"] += prompt_tokens
+                usage["cached_tokens"] += cached_tokens
+                info["generated"] += 1
+                tokens += _completion_tokens(data) or 0
+                first_text = first_text or text
+                if _check(text, params, info):
+                    return text
+    finally:
+        # Übrige Anfragen abbrechen: wartende fallen weg, laufende trennen ihre Verbindung
+        # (geben Pool- und Limiter-Slot sofort frei); ihre Tokens werden verworfen
+        cancel.cancel()
+        for f in futures:
+            f.cancel()
+        info["tokens"] = tokens or None
+        info["usage"] = usage
+    if first_text is None:
+        raise errors[0]
+    return first_text
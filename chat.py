@@ -3,10 +3,29 @@
 # KI-Antworten nach Parametern, Deal/Abbruch, private Ergebnisse
 # ============================================
 
-import os, re, json, uuid, random, glob, requests
+import os, re, uuid, time
 from datetime import datetime
 import streamlit as st
 import pandas as pd
+import numpy as np
+
+from logwriter import get_writer, JsonlTarget
+from storage import get_store
+from compliance import offer_in, violates_rules, rule_key, StreamGuard
+from offer_ledger import OfferLedger
+from llm_client import LLMError, LLMTimeout, LLMClient, DEFAULT_BASE_URL, budget_left
+from response_cache import ResponseCache, cached_chat, cached_stream
+from rate_limiter import AsyncLimiter, LimitedClient
+from candidates import first_compliant
+from rule_seller import fallback_reply
+from reply_repair import repair_reply
+from concession_curve import counter_offer, evaluate as evaluate_curve
+import analytics
+from segment_log import write_session_record
+from context_compaction import approx_tokens, compact_history
+from compact_state import ChatLog, sweep_idle, stats as state_stats
+from session_store import open_session
+from turn_metrics import measure_turn, span, count_retry, get_registry
 
 # -----------------------------
 # [SECRETS & MODELL]
@@ -14,6 +33,23 @@ import pandas as pd
 API_KEY = st.secrets["OPENAI_API_KEY"]
 MODEL  = st.secrets.get("OPENAI_MODEL", "gpt-4o-mini")
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD")
+BASE_URL = st.secrets.get("OPENAI_BASE_URL", DEFAULT_BASE_URL)   # z. B. lokaler Mock-Server für Tests
+STREAM = st.secrets.get("OPENAI_STREAM", True)                    # Antworten Token für Token anzeigen
+POOL_SIZE = int(st.secrets.get("OPENAI_POOL_SIZE", 20))            # parallele Keep-Alive-Verbindungen
+CONNECT_TIMEOUT = float(st.secrets.get("OPENAI_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(st.secrets.get("OPENAI_READ_TIMEOUT", 60))
+CACHE_MODE = st.secrets.get("RESPONSE_CACHE", "off")              # off | record | replay
+CACHE_DIR = st.secrets.get("RESPONSE_CACHE_DIR", "cache/responses")
+CACHE_MB = int(st.secrets.get("RESPONSE_CACHE_MB", 200))
+CANDIDATES = int(st.secrets.get("OPENAI_CANDIDATES", 1))          # >1: mehrere Kandidaten statt Korrektur-Runden
+CANDIDATE_MODE = st.secrets.get("OPENAI_CANDIDATE_MODE", "n")      # n (eine Anfrage) | parallel (n Anfragen)
+LIVE_STREAM = STREAM and CANDIDATES <= 1                           # Kandidaten werden vor der Anzeige geprüft
+TURN_BUDGET_S = float(st.secrets.get("TURN_BUDGET_S", 12))         # Zeitbudget pro Antwort; danach regelbasiert (0 = aus)
+CONTEXT_KEEP_TURNS = int(st.secrets.get("CONTEXT_KEEP_TURNS", 0))  # >0: nur letzte K Turns wörtlich, davor Zusammenfassung
+MAX_CONCURRENCY = int(st.secrets.get("OPENAI_MAX_CONCURRENCY", 0)) # gleichzeitige API-Anfragen im Prozess (0 = unbegrenzt)
+RPM_LIMIT = float(st.secrets.get("OPENAI_RPM", 0))                 # Konto-Limits: Anfragen/Tokens pro Minute (0 = aus)
+TPM_LIMIT = float(st.secrets.get("OPENAI_TPM", 0))
+LOCAL_REPAIR = st.secrets.get("LOCAL_REPAIR", True)                # Regelverstöße erst lokal beheben, dann erst neu anfragen
 
 # -----------------------------
 # [STYLES]
@@ -54,18 +90,48 @@ DEFAULT_PARAMS = {
 # -----------------------------
 # [SESSION STATE]
 # -----------------------------
+# Gehören dem Session-Handle (handle.live), nicht dem Tab: ein zweiter Tab/Reload derselben ?sid=
+# arbeitet auf denselben Objekten statt auf einer Kopie, die den Stand des ersten überschreibt
+SHARED_KEYS = ("chat", "ledger", "params", "closed", "outcome", "final_price")
+if "store" in st.session_state and st.session_state.store.stale:
+    # Ein anderer Worker hat die Session weitergeführt: eigenen Stand verwerfen und neu laden
+    for _key in ("sid", "store") + SHARED_KEYS:
+        st.session_state.pop(_key, None)
 if "sid" not in st.session_state:
-    st.session_state.sid = str(uuid.uuid4())
+    # Session aus der URL fortsetzen (Reload, Neustart, anderer Worker) – Schnappschuss im
+    # Session-Store (session_store.py); der Ledger wird unten aus dem Verlauf neu aufgebaut
+    _sid, _handle, _snap = st.query_params.get("sid", ""), None, None
+    if re.fullmatch(r"[0-9a-f-]{36}", _sid):
+        _handle, _snap = open_session("chat", _sid)
+    if _handle is not None and _handle.live:
+        st.session_state.sid = _sid          # läuft schon in diesem Prozess – Stand kommt unten aus live
+        st.session_state.store = _handle
+    elif _snap:
+        st.session_state.sid = _sid
+        st.session_state.store = _handle
+        st.session_state.params = _snap.get("params") or DEFAULT_PARAMS
+        st.session_state.chat = ChatLog.from_dict(_sid, _snap["chat"])
+        st.session_state.closed = _snap["closed"]
+        st.session_state.outcome = _snap["outcome"]
+        st.session_state.final_price = _snap["final_price"]
+    else:
+        st.session_state.sid = str(uuid.uuid4())
+        st.session_state.store, _ = open_session("chat", st.session_state.sid, new=True)
+        st.query_params["sid"] = st.session_state.sid
 if "params" not in st.session_state:
-    st.session_state.params = DEFAULT_PARAMS.copy()
+    # Geteilt statt pro Session kopiert – nur lesen; das Admin-Formular setzt ein NEUES Dict
+    st.session_state.params = DEFAULT_PARAMS
 if "chat" not in st.session_state:
+    # Kompakter Verlauf (rolle, text) – bei Inaktivität ausgelagert (compact_state.py)
+    st.session_state.chat = ChatLog(st.session_state.sid)
     # Erste Bot-Nachricht (freundlich, ohne Machtprimes)
-    st.session_state.chat = [
-        {"role":"assistant", "content":
-         f"Hallo! Danke für Ihre Nachricht. Das iPad ist neu und originalverpackt. "
-         f"Der angesetzte Preis liegt bei {st.session_state.params['list_price']} €. "
-         "Wie ist Ihr Vorschlag?"}
-    ]
+    st.session_state.chat.append(
+        "assistant",
+        f"Hallo! Danke für Ihre Nachricht. Das iPad ist neu und originalverpackt. "
+        f"Der angesetzte Preis liegt bei {st.session_state.params['list_price']} €. "
+        "Wie ist Ihr Vorschlag?"
+    )
+sweep_idle()   # inaktive Sessions anderer Teilnehmer:innen auf die Platte (höchstens alle 30 s)
 if "closed" not in st.session_state:
     st.session_state.closed = False     # ob Verhandlung beendet ist
 if "outcome" not in st.session_state:
@@ -76,71 +142,51 @@ if "final_price" not in st.session_state:
 # -----------------------------
 # [REGELN: KEINE MACHTPRIMES + PREISFLOOR]
 # -----------------------------
-BAD_PATTERNS = [
-    r"\balternative(n)?\b", r"\bweitere(n)?\s+interessent(en|in)\b", r"\bknapp(e|heit)\b",
-    r"\bdeadline\b", r"\bletzte chance\b", r"\bbranchen(üblich|standard)\b",
-    r"\bmarktpreis\b", r"\bneupreis\b", r"\bschmerzgrenze\b", r"\buntergrenze\b", r"darunter\s+gehe\s+ich\s+nicht", r"nicht\s+unter\s*\d+", r"mindestens\s*\d+", r"\bsonst geht es\b"
-]
-
-def contains_power_primes(text: str) -> bool:
-    t = text.lower()
-    return any(re.search(p, t) for p in BAD_PATTERNS)
-
-# Preis aus Text erkennen (simple Extraktion €-Wert oder nackte Zahl)
-PRICE_RE = re.compile(r"(?:€\s*)?(\d{2,5})")
-
-def extract_prices(text: str):
-    return [int(m.group(1)) for m in PRICE_RE.finditer(text)]
+# Muster, Preis-Extraktion und violates_rules liegen in compliance.py
+# (gemeinsam genutzt vom normalen und vom Streaming-Pfad).
 
 # -----------------------------
 # [PREIS-LOGIK FÜR REALISTISCHE VERHANDLUNG]
 # -----------------------------
-def get_last_offer(history, role="assistant"):
-    """
-    Suche den letzten Preis (als Ganzzahl) aus den Nachrichten der angegebenen Rolle.
-    """
-    for m in reversed(history):
-        if m.get("role") == role:
-            prices = extract_prices(m.get("content",""))
-            if prices:
-                return prices[-1]
-    return None
-
-def suggest_counter_offer(history, params: dict, rounds:int) -> int | None:
+# offer_in (maßgeblicher Preis einer Nachricht) liegt in compliance.py – replay.py nutzt ihn auch.
+def _sync_live():
+    """Stand der Session aus dem Handle übernehmen (ein anderer Tab im Prozess hat evtl. weitergeschrieben)."""
+    for key, value in st.session_state.store.live.items():
+        st.session_state[key] = value
+
+def save_session():
+    """Schnappschuss nach jedem Turn/Abschluss (Params nur, wenn vom Admin geändert)."""
+    s = st.session_state
+    with s.store.lock, span("persist"):
+        s.store.live.update({key: s[key] for key in SHARED_KEYS})
+        saved = s.store.save({"chat": s.chat.to_dict(), "closed": s.closed, "outcome": s.outcome,
+                              "final_price": s.final_price,
+                              "params": None if s.params is DEFAULT_PARAMS else s.params})
+    if not saved:
+        s.reloaded = True   # Schnappschuss abgelehnt → Stand des anderen Workers laden
+        st.rerun()
+
+def add_message(role: str, content: str):
+    """Nachricht anhängen und das Angebots-Ledger genau einmal aktualisieren."""
+    price = offer_in(content)
+    st.session_state.chat.append(role, content, price)
+    st.session_state.ledger.record(role, price)
+
+if "ledger" not in st.session_state:
+    # Einmalig aus dem (Start-)Verlauf aufbauen; danach nur noch inkrementell über add_message
+    st.session_state.ledger = OfferLedger.from_messages(list(st.session_state.chat), offer_in)
+if st.session_state.store.live:
+    _sync_live()        # zweiter Tab/Reload: Stand der laufenden Session übernehmen
+else:
+    st.session_state.store.live.update({key: st.session_state[key] for key in SHARED_KEYS})
+
+def suggest_counter_offer(ledger: OfferLedger, params: dict, rounds:int) -> int | None:
     """
     Erzeuge einen konkreten Gegenpreis zwischen letztem Bot-Angebot und letztem Nutzer-Angebot.
-    Springe nicht direkt auf die Untergrenze. Je niedriger das Nutzerangebot,
-    desto kleinere Schritte und längere Verhandlung.
+    Die Policy selbst liegt in concession_curve.py (dort auch als Batch für die Admin-Vorschau).
     """
-    floor = int(params["min_price"])
-    # Schätze vorheriges Bot-Angebot: Falls keines, nimm Listenpreis
-    prev_bot = get_last_offer(history, role="assistant") or int(params["list_price"])
-    user_offer = get_last_offer(history, role="user")
-    if user_offer is None:
-        # Kein Preis vom/r Käufer:in – biete kleinen Rabatt als Anker, aber weit über Floor
-        target = max(prev_bot - 30, floor + 80)
-        return target
-
-    # Grundschritt: in Richtung Nutzerangebot, aber nicht zu schnell
-    spread = max(prev_bot - user_offer, 0)
-    # Schrittweite abhängig vom Spread (kleiner Schritt bei großem Spread)
-    step = max(10, int(spread * 0.35))
-    raw_target = prev_bot - step
-
-    # Nie unter Nutzerangebot, aber zwischen beiden
-    midpoint = int((prev_bot + user_offer) / 2)
-    # Bleibe über dem Midpoint in frühen Runden, nähere dich später
-    bias = max(0, 15 - 3*rounds)  # kleiner Bias mit Runden
-    target = max(user_offer + 5, min(raw_target, midpoint + bias))
-
-    # Pacing: Abstand zur Untergrenze in frühen Runden hoch halten
-    buffer_above_floor = max(50 - 10*rounds, 15)  # Runde0:>=+50, Runde1:>=+40, ...
-    target = max(target, floor + buffer_above_floor)
-
-    # Obergrenze nicht erhöhen (keine Preiserhöhung gegenüber letztem Bot-Preis)
-    target = min(target, prev_bot - 5) if prev_bot - 5 >= floor else max(target, floor + buffer_above_floor)
-
-    return int(target)
+    return counter_offer(ledger.last("assistant"), ledger.last("user"), rounds,
+                         int(params["min_price"]), int(params["list_price"]))
 
 # -----------------------------
 # [SYSTEM-PROMPT KONSTRUKTION]
@@ -156,62 +202,76 @@ def system_prompt(params: dict) -> str:
         "Bleibe strikt in der Rolle. "
         f"Preisliche Untergrenze (geheim): Du akzeptierst niemals < {params['min_price']} € und machst keine Angebote darunter. Verrate niemals, dass du eine Untergrenze hast, nenne keine konkreten Minimalpreise und verwende keine Formulierungen wie 'Untergrenze', 'Schmerzgrenze', 'darunter gehe ich nicht', 'mindestens X €'. "
         "Wenn der/die Käufer:in deutlich unterbietet, bleibe freundlich und verhandle, mache kleine Zugeständnisse und bleibe über der Untergrenze. "
-        "Nimm ein Angebot erst an, wenn es >= {params['min_price']} € ist und es mindestens zwei Gegenrunden gab; ansonsten mache ein konkretes Gegenangebot."
+        f"Nimm ein Angebot erst an, wenn es >= {params['min_price']} € ist und es mindestens zwei Gegenrunden gab; ansonsten mache ein konkretes Gegenangebot."
     )
 
 # -----------------------------
 # [OPENAI: REST CALL]
 # -----------------------------
-def call_openai(messages, temperature=0.3, max_tokens=240):
-    import json, requests, streamlit as st
-
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json",
-    }
+@st.cache_resource
+def get_llm_client() -> LLMClient | LimitedClient:
+    # Ein Verbindungspool pro Server-Prozess: DNS/TCP/TLS nur beim ersten Aufruf je Verbindung
+    client = LLMClient(BASE_URL, API_KEY, pool_size=POOL_SIZE,
+                       connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT)
+    if MAX_CONCURRENCY or RPM_LIMIT or TPM_LIMIT:
+        # Alle Sessions stellen sich in EINE FIFO-Schlange (rate_limiter.py) statt in 429-Bursts zu laufen
+        client = LimitedClient(client, AsyncLimiter(MAX_CONCURRENCY, RPM_LIMIT, TPM_LIMIT))
+    return client
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    # Record/Replay-Cache vor call_openai (Pilot-Wiederholungen, Regressionstests ohne API-Kosten)
+    return ResponseCache(CACHE_MODE, CACHE_DIR, max_disk_bytes=CACHE_MB * 1024 * 1024)
+
+def log_llm_error(e: LLMError):
+    # Statt Fehlermeldung im Chat: Fallback-Antwort; Details nur im Log
+    append_log({"t": datetime.utcnow().isoformat(), "event": "llm_error", "error": str(e),
+                "status": e.status, "body": (e.body or "")[:1000]})
+
+def call_openai(messages, temperature=0.3, max_tokens=240, timeout=None) -> str:
+    """Antworttext; wirft LLMError (LLMTimeout bei überschrittenem Zeitbudget)."""
     payload = {
         "model": MODEL,            # z. B. "gpt-4o-mini"
         "messages": messages,      # [{"role":"system"/"user"/"assistant","content":"..."}]
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
+    return cached_chat(get_response_cache(), get_llm_client(), payload, timeout=timeout)
 
-    try:
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
-    except requests.RequestException as e:
-        st.error(f"Netzwerkfehler zur OpenAI-API: {e}")
-        return None
-
-    status = r.status_code
-    text = r.text
-
-    try:
-        data = r.json()
-    except Exception:
-        st.error(f"API-Fehler ({status}):\n{text}")
-        return None
-
-    if status >= 400:
-        st.error(f"API-Fehler ({status}):\n{json.dumps(data, ensure_ascii=False, indent=2)}")
-        return None
+def correction(reason: str) -> dict:
+    return {"role": "system", "content": f"REGEL-VERSTOSS: {reason}. Bitte korrigiere dich. "}
 
-    try:
-        return data["choices"][0]["message"]["content"]
-    except Exception:
-        st.error("Antwortformat unerwartet. Rohdaten:")
-        st.code(text[:1000])
+def repaired(reply: str, reason: str, params: dict, repair: dict, partial: bool = False) -> str | None:
+    """
+    Regelverstoß lokal beheben (reply_repair.py) – ohne weiteren API-Aufruf.
+    repair: {"target": Gegenangebot, "user_offer": letztes Nutzerangebot}; bei Erfolg
+    wird repair["repaired"] = Verstoßgrund gesetzt. None → Korrektur-Runde wie bisher.
+    """
+    if not LOCAL_REPAIR or not reply:
         return None
+    with span("repair"):
+        fixed, _ = repair_reply(reply, params, repair.get("target"), repair.get("user_offer"), partial=partial)
+    if fixed:
+        repair["repaired"] = rule_key(reason)
+    return fixed
 
 
 # -----------------------------
 # [REPLY-GENERATOR]
 # -----------------------------
-def generate_reply(history, params: dict) -> str:
-    # Runde bestimmen (Anzahl bisheriger User-Nachrichten)
-    rounds = len([m for m in history if m.get("role") == "user"])
+def generate_reply(history, params: dict, ledger: OfferLedger) -> tuple[str, dict]:
+    """
+    Bot-Antwort + Metadaten fürs Log ({"source": "llm"|"fallback", ...}).
+    Liegt bis TURN_BUDGET_S keine regelkonforme LLM-Antwort vor (Timeout, API-Fehler,
+    Regelverstoß auch nach Korrektur), antwortet der regelbasierte Verkäufer (rule_seller.py).
+    """
+    t0 = time.monotonic()
+    deadline = t0 + TURN_BUDGET_S if TURN_BUDGET_S > 0 else None
+    # Runde bestimmen (Anzahl bisheriger User-Nachrichten) – aus dem Ledger, ohne Verlaufs-Scan
+    rounds = ledger.rounds("user")
     # Konkreten Gegenpreis vorschlagen (für das Modell als Guidance)
-    suggested = suggest_counter_offer(history, params, rounds)
+    with span("counter"):
+        suggested = suggest_counter_offer(ledger, params, rounds)
     strategy = (
         "Verhandlungsstrategie: "
         "Mache ein konkretes Gegenangebot, steigere die Einigungschance realistisch und gehe in kleinen Schritten herunter. "
@@ -219,38 +279,167 @@ def generate_reply(history, params: dict) -> str:
     )
     if suggested:
         strategy += f"Konkretes Gegenangebot für diese Runde: {suggested} €."
-    sys_msg = {"role": "system", "content": system_prompt(params) + " " + strategy}
-    reply = call_openai([sys_msg] + history)
-    if not isinstance(reply, str):
-        return "Entschuldigung, gerade gab es ein technisches Problem. Bitte versuchen Sie es erneut."
-
-    # 2. Compliance: keine Machtprimes, Untergrenze einhalten
-    def violates_rules(text: str, params: dict) -> str | None:
-        t = text.lower()
-        if contains_power_primes(text):
-            return "Keine Macht-/Knappheits-/Autoritäts-Frames verwenden."
-        # Keine Offenlegung der Untergrenze / Minimalpreis
-        if re.search(r"\buntergrenze\b|\bschmerzgrenze\b|darunter\s+gehe\s+ich\s+nicht|nicht\s+unter\s*\d+", t):
-            return "Verrate keine Untergrenze oder Minimalpreise."
-        # Preis-Floor check
-        prices = extract_prices(text)
-        if any(p < params["min_price"] for p in prices):
-            return f"Unterschreite nie {params['min_price']} €; mache kein Angebot darunter."
-        return None
-
-    reason = violates_rules(reply, params)
-    attempts = 0
-    while reason and attempts < 2:
-        attempts += 1
-        history2 = [{"role": "system", "content": system_prompt(params) + " " + strategy}] + history + [
-            {"role":"system","content": f"REGEL-VERSTOSS: {reason}. Bitte korrigiere dich. "}
-        ]
-        reply = call_openai(history2, temperature=0.2)
-        if not isinstance(reply, str):
-            return "Entschuldigung, es gab ein Problem. Bitte erneut versuchen."
-        reason = violates_rules(reply, params)
-
-    return reply
+    with span("history"):
+        # Kontext-Verdichtung: ältere Turns als Zusammenfassung aus dem Verlauf (context_compaction.py)
+        context, ctx = compact_history(history, CONTEXT_KEEP_TURNS, offer_in)
+        # Reihenfolge für Prompt-Caching beim Anbieter: byte-gleicher Präfix (System-Prompt, dann der
+        # nur wachsende Verlauf) zuerst, die rundenabhängige Strategie als LETZTE Nachricht
+        messages = ([{"role": "system", "content": system_prompt(params)}] + context
+                    + [{"role": "system", "content": strategy}])
+    client = get_llm_client()
+    client.take_usage()   # Token-Zähler dieses Threads für den neuen Turn zurücksetzen
+    repair = {"target": suggested, "user_offer": ledger.last("user")}
+    if CANDIDATES > 1:
+        reply, why = generate_reply_candidates(messages, params, deadline, repair)
+    elif LIVE_STREAM:
+        reply, why = generate_reply_streamed(messages, params, deadline, repair)
+    else:
+        reply, why = generate_reply_plain(messages, params, deadline, repair)
+
+    meta = {"source": "llm"}
+    if repair.get("repaired"):
+        meta["repaired"] = repair["repaired"]   # LLM-Antwort lokal korrigiert (Verstoßgrund)
+    if reply is None:
+        with span("fallback"):
+            reply = fallback_reply(history[-1]["content"], params, suggested,
+                                   ledger.last("assistant"), ledger.last("user"))
+        meta = {"source": "fallback", "fallback_reason": why}
+    meta["ms"] = round((time.monotonic() - t0) * 1000, 1)
+    meta["prompt_tokens_est"] = approx_tokens(messages)
+    usage = client.take_usage()   # laut API (usage): prompt_tokens, davon cached_tokens; ggf. queue_ms
+    for key, value in repair.get("usage", {}).items():   # parallele Kandidaten (Pool-Threads)
+        usage[key] += value
+    if usage["calls"]:
+        meta.update(usage)
+    if ctx["summarized"]:
+        meta["summarized"] = ctx["summarized"]
+    return reply, meta
+
+def generate_reply_plain(messages, params: dict, deadline=None, repair=None):
+    """
+    Nicht gestreamt: Verstoß zuerst lokal reparieren, sonst bis zu 2 Korrektur-Runden.
+    (antwort, None) oder (None, grund).
+    """
+    reason = None
+    for attempt in range(3):
+        msgs = messages + [correction(reason)] if reason else messages
+        if reason:
+            count_retry(rule_key(reason))
+        try:
+            with span("api"):
+                reply = call_openai(msgs, temperature=0.3 if attempt == 0 else 0.2, timeout=budget_left(deadline))
+        except LLMTimeout:
+            return None, "timeout"
+        except LLMError as e:
+            log_llm_error(e)
+            return None, "error"
+        with span("rules"):
+            reason = violates_rules(reply, params)
+        if not reason:
+            return reply, None
+        fixed = repaired(reply, reason, params, repair or {})
+        if fixed:
+            return fixed, None
+    return None, "rules"
+
+# -----------------------------
+# [KANDIDATEN-REPLY-GENERATOR]
+# -----------------------------
+def generate_reply_candidates(messages, params: dict, deadline=None, repair=None):
+    """
+    Wie generate_reply_plain, aber ohne sequenzielle Korrektur-Runden: CANDIDATES Antworten
+    werden gleichzeitig angefordert (OPENAI_CANDIDATE_MODE), die erste regelkonforme gewinnt.
+    Passt KEIN Kandidat, wird der erste lokal repariert; erst wenn das nicht gelingt,
+    folgt eine (ebenfalls parallele) Korrektur-Runde.
+    Wie viele Kandidaten nötig waren, landet als Event "candidates" im Log.
+    """
+    payload = {"model": MODEL, "messages": messages, "temperature": 0.3, "max_tokens": 240}
+    client, cache = get_llm_client(), get_response_cache()
+    repair = {} if repair is None else repair   # nimmt auch die Usage der Kandidaten auf
+    for rnd in (1, 2):
+        try:
+            with span("api"):   # inkl. Regelprüfung der Kandidaten
+                reply, info = first_compliant(client, payload, params, CANDIDATES, CANDIDATE_MODE, cache,
+                                          timeout=budget_left(deadline))
+        except LLMTimeout:
+            return None, "timeout"
+        except LLMError as e:
+            log_llm_error(e)
+            return None, "error"
+        append_log({"t": datetime.utcnow().isoformat(), "event": "candidates", "round": rnd, **info})
+        pooled = repair.setdefault("usage", {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        for key, value in info.get("usage", {}).items():   # Modus "parallel": lief nicht in diesem Thread
+            pooled[key] += value
+        if info["compliant"]:
+            return reply, None
+        fixed = repaired(reply, info["rejected"][0], params, repair)
+        if fixed:
+            return fixed, None
+        count_retry(rule_key(info["rejected"][0]))
+        payload = dict(payload, messages=messages + [correction(info["rejected"][0])], temperature=0.2)
+    return None, "rules"
+
+# -----------------------------
+# [STREAMING-REPLY-GENERATOR]
+# -----------------------------
+def _guarded(deltas, guard: StreamGuard, deadline=None):
+    """Deltas durchreichen, bis der StreamGuard einen Verstoß meldet oder das Zeitbudget abläuft."""
+    try:
+        for d in deltas:
+            with span("rules"):
+                hit = guard.feed(d)
+            if hit:
+                return
+            budget_left(deadline)
+            yield d
+    finally:
+        deltas.close()
+
+def generate_reply_streamed(messages, params: dict, deadline=None, repair=None):
+    """
+    Wie generate_reply_plain, aber Token für Token sichtbar (st.write_stream).
+    Machtprimes/Untergrenze/Preisfloor werden laufend geprüft; ein verstoßender Stream
+    wird sofort abgebrochen und – falls der bisherige Text lokal reparierbar ist – durch
+    die reparierte Fassung ersetzt, sonst die Anzeige geleert und mit Korrekturhinweis neu angefragt.
+    Ohne regelkonforme Antwort (auch im letzten Versuch) wird die Anzeige geleert
+    und (None, grund) zurückgegeben – generate_reply antwortet dann regelbasiert.
+    """
+    slot = st.empty()
+    reason = None
+    for attempt in range(3):
+        msgs = messages + [correction(reason)] if reason else messages
+        if reason:
+            count_retry(rule_key(reason))
+        payload = {"model": MODEL, "messages": msgs, "temperature": 0.3 if attempt == 0 else 0.2, "max_tokens": 240}
+        guard = StreamGuard(params)
+        try:
+            with span("api"), slot.container():   # inkl. Anzeige der Tokens und laufender Prüfung ("rules")
+                st.write_stream(_guarded(
+                    cached_stream(get_response_cache(), get_llm_client(), payload, timeout=budget_left(deadline)),
+                    guard, deadline,
+                ))
+        except LLMTimeout:
+            slot.empty()
+            return None, "timeout"
+        except LLMError as e:
+            log_llm_error(e)
+            slot.empty()
+            return None, "error"
+        if not guard.buffer:
+            slot.empty()
+            return None, "error"
+        with span("rules"):
+            reason = guard.reason or guard.finish()
+        if not reason:
+            return guard.buffer, None
+        fixed = repaired(guard.buffer, reason, params, repair or {}, partial=guard.reason is not None)
+        if fixed:
+            slot.markdown(fixed)
+            return fixed, None
+        append_log({"t": datetime.utcnow().isoformat(), "event": "stream_abort", "attempt": attempt,
+                    "reason": reason, "chars": len(guard.buffer)})
+        slot.empty()
+    return None, "rules"
 
 # -----------------------------
 # [UI]
@@ -258,13 +447,15 @@ def generate_reply(history, params: dict) -> str:
 st.write(f"**Ausgangspreis:** {st.session_state.params['list_price']} €")
 
 st.caption(f"Session-ID: `{st.session_state.sid}`")
+if st.session_state.pop("reloaded", False):
+    st.info("Die Verhandlung wurde in einem anderen Fenster weitergeführt – Stand neu geladen.")
 
 # -----------------------------
 # [CHAT-VERLAUF]
 # -----------------------------
-for m in st.session_state.chat:
-    with st.chat_message(m["role"]):
-        st.markdown(m["content"])
+for role, content in st.session_state.chat:
+    with st.chat_message(role):
+        st.markdown(content)
 
 # Eingabe der Proband:innen
 user_msg = st.chat_input("Ihre Nachricht …", disabled=st.session_state.closed)
@@ -273,29 +464,54 @@ user_msg = st.chat_input("Ihre Nachricht …", disabled=st.session_state.closed)
 # [LOGGING]
 # -----------------------------
 def append_log(event: dict):
-    os.makedirs("logs", exist_ok=True)
+    if event.get("event") == "outcome" and not st.session_state.store.claim("outcome"):
+        return   # Outcome dieser Session schon geschrieben (anderer Worker/Tab)
+    with span("log"):
+        _append_log(event)
+
+def _append_log(event: dict):
+    # Asynchron über den gemeinsamen Log-Writer (gebündelt, Hintergrund-Thread) – ins Segment-Log
+    # oder (LOG_FORMAT=files) wie bisher in logs/<sid>.jsonl
     path = os.path.join("logs", f"{st.session_state.sid}.jsonl")
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    write_session_record("chat", st.session_state.sid, event, JsonlTarget(path))
+    # Indizierte Kopie im Store (Standard: SQLite) für Auswertungen im Admin-Bereich
+    store = get_store()
+    if "role" in event:
+        store.save_message("chat", st.session_state.sid, event["role"], event.get("content"),
+                           ts=event.get("t"), source=event.get("source"))
+    elif event.get("event") == "outcome":
+        store.save_outcome(
+            "chat", st.session_state.sid, event["outcome"], final_price=event.get("final_price"),
+            user_turns=st.session_state.ledger.rounds("user"),
+            original_price=st.session_state.params["list_price"], ts=event.get("t"),
+        )
+        store.flush()
 
 # -----------------------------
 # [INTERAKTION]
 # -----------------------------
 if user_msg and not st.session_state.closed:
-    st.session_state.chat.append({"role":"user","content":user_msg})
-    append_log({"t": datetime.utcnow().isoformat(), "role":"user", "content": user_msg})
-
-    with st.chat_message("assistant"):
-        # Sichtbare History (wie im Chat zu sehen)
-        visible_history = [
-            {"role":m["role"], "content":m["content"]}
-            for m in st.session_state.chat
-        ]
-        reply = generate_reply(visible_history, st.session_state.params)
-        st.markdown(reply)
-
-    st.session_state.chat.append({"role":"assistant","content":reply})
-    append_log({"t": datetime.utcnow().isoformat(), "role":"assistant", "content": reply})
+    # Zeit-Spans des Turns (turn_metrics.py): history, counter, api, rules, repair, fallback, log, render
+    with st.session_state.store.lock, measure_turn("chat", st.session_state.sid) as turn:   # Tabs derselben Session nacheinander
+        add_message("user", user_msg)
+        append_log({"t": datetime.utcnow().isoformat(), "role":"user", "content": user_msg})
+
+        with st.chat_message("assistant"):
+            # Sichtbare History (wie im Chat zu sehen)
+            with span("history"):
+                visible_history = [
+                    {"role": role, "content": content}
+                    for role, content in st.session_state.chat
+                ]
+            reply, meta = generate_reply(visible_history, st.session_state.params, st.session_state.ledger)
+            if not LIVE_STREAM or meta["source"] == "fallback":
+                with span("render"):
+                    st.markdown(reply)   # im Streaming-Modus bereits angezeigt
+
+        add_message("assistant", reply)
+        append_log({"t": datetime.utcnow().isoformat(), "role":"assistant", "content": reply, **meta})
+        save_session()
+        turn.note(**meta)
 
 # -----------------------------
 # [DEAL / ABBRECHEN – Buttons]
@@ -318,6 +534,7 @@ if deal_click and not st.session_state.closed:
             st.session_state.outcome = "deal"
             st.session_state.final_price = int(final)
             append_log({"t": datetime.utcnow().isoformat(), "event":"outcome", "outcome":"deal", "final_price": int(final)})
+            save_session()
             st.success("Einigung gespeichert. Vielen Dank!")
 
 if abort_click and not st.session_state.closed:
@@ -325,6 +542,7 @@ if abort_click and not st.session_state.closed:
     st.session_state.outcome = "aborted"
     st.session_state.final_price = None
     append_log({"t": datetime.utcnow().isoformat(), "event":"outcome", "outcome":"aborted"})
+    save_session()
     st.warning("Die Verhandlung wurde abgebrochen.")
 
 # -----------------------------
@@ -339,26 +557,111 @@ with st.expander("Admin-Bereich öffnen"):
 
         # --- Parametrisierung (nur Admin kann ändern) ---
         st.markdown("**Parameter anpassen**")
-        with st.form("param_form"):
-            scen = st.text_area("Szenario-Text", value=st.session_state.params["scenario_text"])
-            list_price = st.number_input("Ausgangspreis (€)", min_value=0, max_value=10000, value=st.session_state.params["list_price"], step=10)
-            min_price  = st.number_input("Untergrenze (€)", min_value=0, max_value=10000, value=st.session_state.params["min_price"], step=10)
-            tone = st.text_input("Ton (Beschreibung)", value=st.session_state.params["tone"])
-            max_sent = st.number_input("Max. Sätze pro Antwort", min_value=1, max_value=10, value=st.session_state.params["max_sentences"], step=1)
-            ok = st.form_submit_button("Speichern")
+        # Ohne st.form: jede Änderung rendert die Kurven-Vorschau sofort neu, gespeichert wird erst per Button
+        scen = st.text_area("Szenario-Text", value=st.session_state.params["scenario_text"])
+        list_price = st.number_input("Ausgangspreis (€)", min_value=0, max_value=10000, value=st.session_state.params["list_price"], step=10)
+        min_price  = st.number_input("Untergrenze (€)", min_value=0, max_value=10000, value=st.session_state.params["min_price"], step=10)
+        tone = st.text_input("Ton (Beschreibung)", value=st.session_state.params["tone"])
+        max_sent = st.number_input("Max. Sätze pro Antwort", min_value=1, max_value=10, value=st.session_state.params["max_sentences"], step=1)
+
+        # --- Live-Vorschau der Gegenpreis-Kurven (vor dem Speichern) ---
+        if list_price > 0:
+            curve = evaluate_curve({"list_price": list_price, "min_price": min_price})
+            levels = curve["user_offers"][::max(len(curve["user_offers"]) // 6, 1)]
+            picked = np.isin(curve["user_offers"], levels)
+            st.line_chart(pd.DataFrame(
+                curve["trajectories"][picked].T, index=pd.Index(curve["rounds"], name="Runde"),
+                columns=[f"Nutzer {u} €" for u in levels],
+            ))
+            st.caption(f"Bot-Gegenpreis je Runde bei gleichbleibendem Nutzerangebot · berechnet in {curve['ms']} ms")
+            labels = {"floor": "Gegenpreis unter der Untergrenze", "raise": "Preiserhöhung gegenüber letztem Bot-Angebot",
+                      "below_user": "Gegenpreis unter dem Nutzerangebot",
+                      "non_monotonic": "sinkender Gegenpreis bei höherem Nutzerangebot"}
+            for name, rounds_found in curve["regions"].items():
+                if rounds_found:
+                    r, where = next(iter(rounds_found.items()))
+                    spans = lambda parts: ", ".join(f"{a}–{b} €" for a, b in parts)  # noqa: E731
+                    st.warning(f"{labels[name]}: {curve['flags'][name]:.1%} der Fälle, z. B. Runde {r} bei "
+                               f"Nutzerangebot {spans(where['user'])} und letztem Bot-Angebot {spans(where['prev_bot'])}")
+
+        ok = st.button("Speichern")
         if ok:
-            st.session_state.params.update({
+            st.session_state.params = {
+                **st.session_state.params,
                 "scenario_text": scen,
                 "list_price": int(list_price),
                 "min_price": int(min_price),
                 "tone": tone,
                 "max_sentences": int(max_sent),
-            })
+            }
+            save_session()
             st.success("Parameter aktualisiert.")
 
         # --- Debug: Letzte Preise (optional) ---
         if st.checkbox("Letzte Angebote anzeigen"):
-            last_bot = get_last_offer(st.session_state.chat, role="assistant")
-            last_user = get_last_offer(st.session_state.chat, role="user")
+            ledger = st.session_state.ledger
+            last_bot = ledger.last("assistant")
+            last_user = ledger.last("user")
             st.write(f"Letztes Bot-Angebot: {last_bot}")
             st.write(f"Letztes Nutzer-Angebot: {last_user}")
+            st.write(f"Bestes Nutzer-Angebot: {ledger.best_user_offer} · Runden: {ledger.rounds('user')}")
+            st.write(f"Verlauf: {ledger.trajectory}")
+
+        # --- Auswertung aus dem Store (indiziert, kein Scan der Log-Dateien) ---
+        if st.checkbox("Ergebnisse (alle Sessions) anzeigen"):
+            store = get_store()
+            st.write(store.summary(app="chat"))
+            st.dataframe(pd.DataFrame(store.outcomes(app="chat")))
+            sid_q = st.text_input("Transkript zu Session-ID")
+            if sid_q:
+                st.dataframe(pd.DataFrame(store.transcript(sid_q.strip())))
+
+        # --- Dashboard aus der Spalten-Ablage (Parquet, inkrementell aus den Log-Dateien) ---
+        if st.checkbox("Dashboard (alle Sessions) anzeigen"):
+            if st.button("Neue Log-Zeilen einlesen"):
+                get_writer().flush()
+                st.json(analytics.ingest())
+            scope = st.radio("App", ["alle", "chat", "app"], horizontal=True)
+            dash = analytics.dashboard(app=None if scope == "alle" else scope)
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Sessions", dash["sessions"])
+            c2.metric("Deal-Quote", f"{dash['deal_rate']:.1%}")
+            c3.metric("Ø Endpreis", f"{dash['price']['avg']} €" if dash["price"] else "–")
+            c4.metric("Ø Turns bis Deal", dash["turns"]["avg"] if dash["turns"] else "–")
+            if dash["price_hist"]:
+                st.markdown("Endpreise (Deals)")
+                st.bar_chart(pd.Series(dash["price_hist"], name="Deals").rename_axis("ab €"))
+            if dash["turns_hist"]:
+                st.markdown("Turns bis Deal")
+                st.bar_chart(pd.Series(dash["turns_hist"], name="Deals").rename_axis("Turns"))
+            st.caption(f"Geladen in {dash['ms']} ms · Stand: letzter Einlese-Lauf (python analytics.py ingest)")
+
+        # --- OpenAI-Verbindungspool: Verbindungsaufbau vs. Serverzeit, Prompt-Cache-Anteil, Warteschlange ---
+        if st.checkbox("API-Verbindungskennzahlen anzeigen"):
+            client = get_llm_client()
+            st.json(client.stats())
+            st.dataframe(pd.DataFrame(list(client.recent)))
+            st.json(get_response_cache().stats())
+
+        # --- Fallback-Quote: regelbasierte statt LLM-Antworten (Zeitbudget/Fehler/Regeln) ---
+        if st.checkbox("Fallback-Quote anzeigen"):
+            st.json(get_store().reply_sources(app="chat"))
+
+        # --- Log-Writer: Queue-Tiefe & Flush-Latenz ---
+        if st.checkbox("Log-Writer-Kennzahlen anzeigen"):
+            st.json(get_writer().stats())
+
+        # --- Turn-Metriken: Spans je Turn, Korrektur-Runden nach Grund (turn_metrics.py) ---
+        if st.checkbox("Turn-Metriken anzeigen"):
+            registry = get_registry()
+            recent = [{"t": r["t"], "app": r["app"], "ms": r["ms"], **r["spans"],
+                       "retries": sum(r["retries"].values()), "source": r.get("source")}
+                      for r in registry.recent]
+            st.dataframe(pd.DataFrame(recent[::-1]))
+            prom = registry.prometheus_text()
+            st.download_button("Prometheus-Snapshot herunterladen", prom, file_name="turns.prom")
+            st.code(prom, language="text")
+
+        # --- Session-Speicher (compact_state.py) ---
+        if st.checkbox("Session-Speicher anzeigen"):
+            st.json(state_stats())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# KOMPAKTER SESSION-ZUSTAND + AUSLAGERN INAKTIVER SESSIONS (app.py, chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] ChatLog statt Liste von Tupeln/Dicts: Rollen als 1 Byte (ROLES-Index),
+#     Angebote in array('i'), alle Texte hintereinander als UTF-8 in EINEM
+#     bytearray (+ Offsets). Ein Python-str pro Nachricht kostet 49–80 Byte
+#     Overhead und bei "€"/Emoji 2–4 Byte pro Zeichen – hier ~1 Byte/Zeichen.
+#     Verhält sich beim Lesen wie eine Liste von (rolle, text): len, Iteration,
+#     Index und Slice.
+# [2] Auslagern: Jede ChatLog-Nutzung merkt sich die Zeit. sweep_idle()
+#     (aus den Reruns beliebiger Sessions, höchstens alle SWEEP_INTERVAL_S)
+#     schreibt Sessions, die länger als SESSION_IDLE_EVICT_S unbenutzt sind,
+#     nach SESSION_SPILL_DIR/<sid>-<uuid>.chat (eine Datei je Objekt – zwei
+#     Tabs derselben Session kommen sich nicht in die Quere) und gibt den
+#     Speicher frei. Beim nächsten Zugriff (Teilnehmer:in kommt zurück) wird
+#     transparent nachgeladen; die Datei verschwindet mit dem Objekt.
+# [3] Kennzahlen: Sessions im Speicher / ausgelagert, Bytes, Nachladevorgänge.
+#
+# Benchmark (RSS pro 1.000 Sessions):  python bench_session_memory.py
+# ============================================================================
+
+import os
+import struct
+import threading
+import time
+import uuid
+import weakref
+from array import array
+from pathlib import Path
+
+SESSION_IDLE_EVICT_S = float(os.environ.get("SESSION_IDLE_EVICT_S", "900"))   # 0 = nie auslagern
+SESSION_SPILL_DIR = Path(os.environ.get("SESSION_SPILL_DIR", "logs/spill"))
+SWEEP_INTERVAL_S = 30.0
+ROLES = ("user", "bot", "assistant", "system")
+NO_OFFER = -1
+OFFER_MAX = 2**31 - 1             # array('i'): größere Beträge ("99999999999 €") gelten als kein Angebot
+_HEADER = struct.Struct("<4sI")   # Magic, Anzahl Nachrichten
+
+# ------------------------------- [1] CHATLOG ------------------------------
+def _offer_code(offer) -> int:
+    """Angebot für array('i'); fehlend, negativ oder zu groß → NO_OFFER."""
+    if offer is None:
+        return NO_OFFER
+    value = int(offer)
+    return value if 0 <= value <= OFFER_MAX else NO_OFFER
+
+
+class ChatLog:
+    """Kompakter, nur anhängbarer Chatverlauf einer Session; lagert sich bei Inaktivität aus."""
+
+    __slots__ = ("sid", "last_used", "_roles", "_offers", "_ends", "_buf", "_path", "_spill_path",
+                 "_lock", "__weakref__")
+
+    def __init__(self, sid: str = ""):
+        self.sid = sid
+        self.last_used = time.monotonic()
+        self._roles = bytearray()
+        self._offers = array("i")
+        self._ends = array("I")      # Ende jeder Nachricht im Puffer
+        self._buf = bytearray()
+        self._path = None            # gesetzt, solange ausgelagert
+        self._spill_path = SESSION_SPILL_DIR / f"{sid or 'chat'}-{uuid.uuid4().hex}.chat"   # eindeutig je Objekt
+        self._lock = threading.Lock()
+        weakref.finalize(self, _remove, self._spill_path)   # Session verworfen → Datei weg (einmal registriert)
+        if sid:
+            _track(self)
+
+    # --- Zugriff ---
+    def _load(self):
+        """Vor jedem Zugriff (unter _lock): ausgelagerte Daten zurückholen, Zeit merken."""
+        self.last_used = time.monotonic()
+        if self._path is not None:
+            self._read(self._path)
+            _stats["rehydrations"] += 1
+
+    def append(self, role: str, text: str, offer: int | None = None):
+        # Erst alles prüfen/umwandeln, dann anhängen – die parallelen Arrays bleiben gleich lang
+        role_i, code, data = ROLES.index(role), _offer_code(offer), (text or "").encode("utf-8")
+        with self._lock:
+            self._load()
+            self._roles.append(role_i)
+            self._offers.append(code)
+            self._buf += data
+            self._ends.append(len(self._buf))
+
+    def _item(self, i: int) -> tuple[str, str]:
+        start = self._ends[i - 1] if i else 0
+        return ROLES[self._roles[i]], self._buf[start:self._ends[i]].decode("utf-8")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._roles)
+
+    def __getitem__(self, index):
+        with self._lock:
+            self._load()
+            if isinstance(index, slice):
+                return [self._item(i) for i in range(*index.indices(len(self._roles)))]
+            if index < 0:
+                index += len(self._roles)
+            if not 0 <= index < len(self._roles):
+                raise IndexError(index)
+            return self._item(index)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def offer(self, index: int) -> int | None:
+        with self._lock:
+            self._load()
+            v = self._offers[index]
+        return None if v == NO_OFFER else v
+
+    def to_dict(self) -> dict:
+        """JSON-fähiger Schnappschuss (session_store.py): [[rolle, text, angebot], …]."""
+        with self._lock:
+            self._load()
+            return {"messages": [[*self._item(i), None if self._offers[i] == NO_OFFER else self._offers[i]]
+                                 for i in range(len(self._roles))]}
+
+    @classmethod
+    def from_dict(cls, sid: str, d: dict) -> "ChatLog":
+        log = cls(sid)
+        for role, text, offer in d.get("messages", []):
+            log.append(role, text, offer)
+        return log
+
+    def nbytes(self) -> int:
+        """Nutzdaten im Speicher (0, solange ausgelagert)."""
+        return len(self._roles) + len(self._buf) + self._offers.itemsize * len(self._offers) \
+            + self._ends.itemsize * len(self._ends)
+
+    # --- [2] Auslagern ---
+    def to_bytes(self) -> bytes:
+        return b"".join([_HEADER.pack(b"CLG1", len(self._roles)), bytes(self._roles),
+                         self._offers.tobytes(), self._ends.tobytes(), bytes(self._buf)])
+
+    def _read(self, path: Path):
+        data = path.read_bytes()
+        magic, n = _HEADER.unpack_from(data)
+        if magic != b"CLG1":
+            raise ValueError(f"keine ChatLog-Datei: {path}")
+        pos = _HEADER.size
+        self._roles = bytearray(data[pos:pos + n])
+        pos += n
+        self._offers = array("i")
+        self._offers.frombytes(data[pos:pos + 4 * n])
+        pos += 4 * n
+        self._ends = array("I")
+        self._ends.frombytes(data[pos:pos + 4 * n])
+        self._buf = bytearray(data[pos + 4 * n:])
+        self._path = None
+        path.unlink(missing_ok=True)
+
+    def spill(self) -> int:
+        """Auf die Platte schreiben und Speicher freigeben; gibt die freigegebenen Bytes zurück."""
+        with self._lock:
+            if self._path is not None or not self._roles:
+                return 0
+            freed = self.nbytes()
+            path = self._spill_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(self.to_bytes())
+            os.replace(tmp, path)
+            self._roles, self._offers, self._ends, self._buf = bytearray(), array("i"), array("I"), bytearray()
+            self._path = path
+        _stats["spills"] += 1
+        return freed
+
+    @property
+    def spilled(self) -> bool:
+        return self._path is not None
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+# ------------------------------- [2] SWEEP --------------------------------
+_live = weakref.WeakSet()            # alle ChatLogs mit Session-ID im Prozess
+_live_lock = threading.Lock()
+_stats = {"spills": 0, "rehydrations": 0}
+_last_sweep = 0.0
+
+
+def _track(log: ChatLog):
+    with _live_lock:
+        _live.add(log)
+
+
+def sweep_idle(idle_s: float = SESSION_IDLE_EVICT_S, force: bool = False) -> int:
+    """Inaktive Sessions auslagern (höchstens alle SWEEP_INTERVAL_S); gibt die Anzahl zurück."""
+    global _last_sweep
+    now = time.monotonic()
+    if idle_s <= 0 or (not force and now - _last_sweep < SWEEP_INTERVAL_S):
+        return 0
+    _last_sweep = now
+    with _live_lock:
+        idle = [log for log in _live if not log.spilled and now - log.last_used >= idle_s]
+    return sum(1 for log in idle if log.spill())
+
+# ----------------------------- [3] KENNZAHLEN -----------------------------
+def stats() -> dict:
+    with _live_lock:
+        logs = list(_live)
+    spilled = sum(1 for log in logs if log.spilled)
+    return {"sessions": len(logs), "in_memory": len(logs) - spilled, "spilled": spilled,
+            "bytes": sum(log.nbytes() for log in logs), **_stats}
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# REGELN: KEINE MACHTPRIMES + PREISFLOOR (aus chat.py ausgelagert)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Verbotene Formulierungen (Macht-/Knappheits-/Autoritäts-Frames).
+# [2] Preise aus Text extrahieren (einheitenbewusst, siehe text_analysis.py:
+#     "256 GB", Jahreszahlen, Prozent … zählen nicht); offer_in = maßgeblicher
+#     Preis einer Nachricht.
+# [3] violates_rules: Grund des Regelverstoßes oder None; rule_key: kurzer,
+#     fester Schlüssel des Grundes (für Zähler/Metriken).
+# [4] StreamGuard: dieselben Prüfungen inkrementell auf einem wachsenden
+#     Token-Puffer – ein verstoßender Stream kann früh abgebrochen werden.
+# ============================================================================
+
+# Vokabular und Scanner liegen in text_analysis.py: EIN Durchlauf pro Nachricht,
+# Ergebnis pro Text gecacht (StreamGuard, Regelprüfung und Ledger teilen es).
+from text_analysis import analyze
+
+# -------------------------- [1]+[2] MUSTER & PREISE -----------------------
+# Offenlegung der Untergrenze – Teilmenge der Machtprimes
+DISCLOSURE_PATTERNS = frozenset([
+    r"\buntergrenze\b", r"\bschmerzgrenze\b", r"darunter\s+gehe\s+ich\s+nicht", r"nicht\s+unter\s*\d+",
+])
+
+def contains_power_primes(text: str) -> bool:
+    return bool(analyze(text).primes)
+
+def extract_prices(text: str):
+    return list(analyze(text).prices)
+
+def offer_in(text: str) -> int | None:
+    """Maßgeblicher Preis einer Nachricht: die zuletzt genannte Zahl (oder None)."""
+    prices = extract_prices(text or "")
+    return prices[-1] if prices else None
+
+# ---------------------------- [3] REGELPRÜFUNG ----------------------------
+def violates_rules(text: str, params: dict) -> str | None:
+    a = analyze(text)
+    # Keine Offenlegung der Untergrenze / Minimalpreis – vor den übrigen Primes prüfen (Teilmenge)
+    if DISCLOSURE_PATTERNS.intersection(a.primes):
+        return "Verrate keine Untergrenze oder Minimalpreise."
+    if a.primes:
+        return "Keine Macht-/Knappheits-/Autoritäts-Frames verwenden."
+    # Preis-Floor check
+    if any(p < params["min_price"] for p in a.prices):
+        return f"Unterschreite nie {params['min_price']} €; mache kein Angebot darunter."
+    return None
+
+# Grund-Text → Schlüssel
+RULE_KEYS = (
+    ("Keine Macht-", "power_frame"),
+    ("Verrate keine", "disclosure"),
+    ("Unterschreite nie", "below_floor"),
+)
+
+def rule_key(reason: str | None) -> str:
+    for prefix, key in RULE_KEYS:
+        if reason and reason.startswith(prefix):
+            return key
+    return "other"
+
+# ----------------------------- [4] STREAMGUARD ----------------------------
+class StreamGuard:
+    """
+    Prüft einen Token-Stream fortlaufend. Geprüft wird nur der "abgeschlossene"
+    Teil bis zum letzten Leerzeichen – so werden halbe Wörter ("knapp" → "knapper")
+    und halbe Zahlen ("7" → "750") nicht fälschlich als Verstoß gewertet; eine Zahl
+    am Ende wartet zusätzlich auf das nächste Wort (Einheit wie "256 GB"?).
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.buffer = ""
+        self.reason = None
+        self._checked_upto = 0
+
+    def feed(self, delta: str) -> str | None:
+        """Neues Token anhängen; gibt den Verstoßgrund zurück, sobald einer feststeht."""
+        self.buffer += delta
+        cut = max(self.buffer.rfind(" "), self.buffer.rfind("\n"))
+        head = self.buffer[:cut].rstrip()
+        if head[-1:].isdigit():
+            # Zahl am Ende: Einheit ("256 GB") oder Tausendergruppe ("1 000") kann noch folgen
+            cut = max(head.rfind(" "), head.rfind("\n"))
+        if cut > self._checked_upto:
+            self._checked_upto = cut
+            self.reason = violates_rules(self.buffer[:cut], self.params)
+        return self.reason
+
+    def finish(self) -> str | None:
+        """Abschließende Prüfung auf dem vollständigen Text."""
+        self.reason = violates_rules(self.buffer, self.params)
+        return self.reason
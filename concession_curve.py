@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# KONZESSIONSKURVEN für suggest_counter_offer (chat.py) – skalar und als Batch
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] counter_offer: die Gegenpreis-Policy von chat.py als reine Funktion
+#     (prev_bot, user_offer, rounds, floor, list_price) → Gegenpreis.
+# [2] counter_offer_batch: dieselbe Policy mit NumPy über ganze Arrays
+#     (Broadcasting; fehlendes Nutzerangebot = NaN). Ergebnisse identisch.
+# [3] Auswertung für EINE Parametrierung (Admin-Vorschau in chat.py):
+#     • Antwortfläche: Gegenpreis über Runde × letztes Bot-Angebot × Nutzerangebot,
+#     • Verläufe: Bot-Angebote Runde für Runde bei festem Nutzerangebot,
+#     • Auffälligkeiten: unter der Untergrenze (floor), Preiserhöhung gegenüber
+#       dem letzten Bot-Angebot (raise), Gegenpreis unter dem Nutzerangebot
+#       (below_user), sinkender Gegenpreis bei höherem Nutzerangebot
+#       (non_monotonic) – jeweils mit den betroffenen Bereichen.
+# [4] Raster über viele list_price/min_price-Einstellungen (Kommandozeile).
+#
+# Aufruf:  python concession_curve.py [--list 600:1400:100] [--floor 400:1200:50]
+# ============================================================================
+
+import argparse
+import time
+
+import numpy as np
+
+FLAGS = ("floor", "raise", "below_user", "non_monotonic")
+MAX_ROUNDS = 8
+
+# ------------------------------ [1] SKALAR --------------------------------
+def counter_offer(prev_bot: int | None, user_offer: int | None, rounds: int, floor: int, list_price: int) -> int:
+    """
+    Konkreter Gegenpreis zwischen letztem Bot-Angebot und letztem Nutzer-Angebot.
+    Springt nicht direkt auf die Untergrenze. Je niedriger das Nutzerangebot,
+    desto kleinere Schritte und längere Verhandlung.
+    """
+    # Schätze vorheriges Bot-Angebot: Falls keines, nimm Listenpreis
+    prev_bot = prev_bot or int(list_price)
+    if user_offer is None:
+        # Kein Preis vom/r Käufer:in – biete kleinen Rabatt als Anker, aber weit über Floor
+        return max(prev_bot - 30, floor + 80)
+
+    # Grundschritt: in Richtung Nutzerangebot, aber nicht zu schnell
+    spread = max(prev_bot - user_offer, 0)
+    # Schrittweite abhängig vom Spread (kleiner Schritt bei großem Spread)
+    step = max(10, int(spread * 0.35))
+    raw_target = prev_bot - step
+
+    # Nie unter Nutzerangebot, aber zwischen beiden
+    midpoint = int((prev_bot + user_offer) / 2)
+    # Bleibe über dem Midpoint in frühen Runden, nähere dich später
+    bias = max(0, 15 - 3*rounds)  # kleiner Bias mit Runden
+    target = max(user_offer + 5, min(raw_target, midpoint + bias))
+
+    # Pacing: Abstand zur Untergrenze in frühen Runden hoch halten
+    buffer_above_floor = max(50 - 10*rounds, 15)  # Runde0:>=+50, Runde1:>=+40, ...
+    target = max(target, floor + buffer_above_floor)
+
+    # Obergrenze nicht erhöhen (keine Preiserhöhung gegenüber letztem Bot-Preis)
+    target = min(target, prev_bot - 5) if prev_bot - 5 >= floor else max(target, floor + buffer_above_floor)
+
+    return int(target)
+
+# ------------------------------- [2] BATCH --------------------------------
+def counter_offer_batch(prev_bot, user_offer, rounds, floor, list_price) -> np.ndarray:
+    """
+    counter_offer für ganze Arrays (beliebig broadcastbar). user_offer = NaN bedeutet
+    "kein Preis genannt", prev_bot = NaN oder 0 "noch kein Bot-Angebot". Gibt int64 zurück.
+    """
+    prev_bot, user_offer, rounds, floor, list_price = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (prev_bot, user_offer, rounds, floor, list_price)))
+    prev_bot = np.where(np.isnan(prev_bot) | (prev_bot == 0), np.trunc(list_price), prev_bot)
+    no_offer = np.isnan(user_offer)
+    user = np.where(no_offer, prev_bot, user_offer)
+
+    spread = np.maximum(prev_bot - user, 0)
+    step = np.maximum(10, np.trunc(spread * 0.35))
+    raw_target = prev_bot - step
+    midpoint = np.trunc((prev_bot + user) / 2)
+    bias = np.maximum(0, 15 - 3 * rounds)
+    target = np.maximum(user + 5, np.minimum(raw_target, midpoint + bias))
+
+    buffer_above_floor = np.maximum(50 - 10 * rounds, 15)
+    target = np.maximum(target, floor + buffer_above_floor)
+    target = np.where(prev_bot - 5 >= floor, np.minimum(target, prev_bot - 5),
+                      np.maximum(target, floor + buffer_above_floor))
+
+    target = np.where(no_offer, np.maximum(prev_bot - 30, floor + 80), target)
+    return np.trunc(target).astype(np.int64)
+
+# ------------------------------ [3] AUSWERTUNG ----------------------------
+def trajectories(user_offers, floor: int, list_price: int, max_rounds: int = MAX_ROUNDS) -> np.ndarray:
+    """
+    Bot-Angebote Runde für Runde (Spalte r = Antwort auf die (r+1)-te Nutzer-Nachricht),
+    wenn die Käufer:in jedes Mal user_offers[i] bietet und der Bot den Vorschlag übernimmt.
+    Startwert ist der Listenpreis (erste Bot-Nachricht in chat.py).
+    """
+    offers = np.asarray(user_offers, dtype=np.float64)
+    out = np.empty((offers.size, max_rounds), dtype=np.int64)
+    prev = np.full(offers.size, list_price, dtype=np.float64)
+    for r in range(max_rounds):
+        out[:, r] = counter_offer_batch(prev, offers, r + 1, floor, list_price)
+        prev = out[:, r]
+    return out
+
+
+def regions(mask: np.ndarray, values) -> list[tuple[int, int]]:
+    """Zusammenhängende Bereiche von values, in denen mask wahr ist: [(von, bis), ...]."""
+    values = np.asarray(values)
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    return [(int(values[a]), int(values[b])) for a, b in zip(starts, stops)]
+
+
+def evaluate(params: dict, max_rounds: int = MAX_ROUNDS, offer_step: int = 5, bot_step: int = 10) -> dict:
+    """
+    Policy für eine Parametrierung (list_price, min_price) vermessen. Gibt zurück:
+    user_offers, prev_bots, rounds, surface [runde, prev_bot, nutzerangebot],
+    trajectories (je Nutzerangebot), flags {name: anteil der Zellen}, trajectory_flags
+    {name: anzahl Verläufe}, regions {name: {runde: {"user": [(von, bis)], "prev_bot": [(von, bis)]}}}
+    (betroffene Nutzerangebote bzw. letzte Bot-Angebote je Runde) und ms.
+    """
+    t0 = time.perf_counter()
+    list_price, floor = int(params["list_price"]), int(params["min_price"])
+    user_offers = np.arange(list_price // 2, list_price + offer_step + 1, offer_step)
+    prev_bots = np.arange(min(floor, list_price), list_price + 1, bot_step)
+    rounds = np.arange(1, max_rounds + 1)
+
+    R, P, U = np.ix_(rounds, prev_bots, user_offers)
+    surface = counter_offer_batch(P, U, R, floor, list_price)
+    masks = {
+        "floor": surface < floor,
+        "raise": surface > P,
+        "below_user": surface < U,
+        "non_monotonic": np.concatenate((np.diff(surface, axis=-1) < 0,
+                                         np.zeros(surface.shape[:-1] + (1,), dtype=bool)), axis=-1),
+    }
+    flags = {name: float(m.mean()) for name, m in masks.items()}
+    found = {name: {int(r): {"user": regions(m[i].any(axis=0), user_offers),
+                             "prev_bot": regions(m[i].any(axis=1), prev_bots)}
+                    for i, r in enumerate(rounds) if m[i].any()}
+             for name, m in masks.items()}
+
+    curves = trajectories(user_offers, floor, list_price, max_rounds)
+    prev = np.concatenate((np.full((curves.shape[0], 1), list_price), curves[:, :-1]), axis=1)
+    trajectory_flags = {
+        "floor": int((curves < floor).any(axis=1).sum()),
+        "raise": int((curves > prev).any(axis=1).sum()),
+        "below_user": int((curves < user_offers[:, None]).any(axis=1).sum()),
+    }
+    return {
+        "user_offers": user_offers, "prev_bots": prev_bots, "rounds": rounds,
+        "surface": surface, "trajectories": curves, "flags": flags, "trajectory_flags": trajectory_flags,
+        "regions": found, "ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+# -------------------------------- [4] RASTER ------------------------------
+def scan(list_prices, min_prices, max_rounds: int = MAX_ROUNDS, n_bot: int = 21, n_user: int = 41) -> dict:
+    """
+    Alle Kombinationen list_price × min_price in EINEM Batch auswerten. prev_bot läuft
+    relativ von der Untergrenze bis zum Listenpreis, das Nutzerangebot von 50 % bis 100 %
+    des Listenpreises. Gibt je Auffälligkeit den Anteil betroffener Zellen [list, floor] zurück.
+    """
+    lp = np.asarray(list_prices, dtype=np.float64)[:, None, None, None, None]
+    fl = np.asarray(min_prices, dtype=np.float64)[None, :, None, None, None]
+    rounds = np.arange(1, max_rounds + 1, dtype=np.float64)[None, None, :, None, None]
+    bot_frac = np.linspace(0, 1, n_bot)[None, None, None, :, None]
+    user_frac = np.linspace(0.5, 1, n_user)[None, None, None, None, :]
+    prev_bot = np.round(fl + bot_frac * np.maximum(lp - fl, 0))
+    user = np.round(user_frac * lp)
+
+    target = counter_offer_batch(prev_bot, user, rounds, fl, lp)
+    valid = np.broadcast_to(fl <= lp, target.shape)   # Untergrenze über Listenpreis: Einstellung unsinnig
+    masks = {
+        "floor": target < fl,
+        "raise": target > prev_bot,
+        "below_user": target < user,
+        "non_monotonic": np.concatenate((np.diff(target, axis=-1) < 0,
+                                         np.zeros(target.shape[:-1] + (1,), dtype=bool)), axis=-1),
+    }
+    axes = (2, 3, 4)
+    return {name: np.where(valid.all(axis=axes), (m & valid).mean(axis=axes), np.nan)
+            for name, m in masks.items()} | {"cells": target.size}
+
+
+def _range(spec: str) -> np.ndarray:
+    lo, hi, step = (int(x) for x in spec.split(":"))
+    return np.arange(lo, hi + 1, step)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--list", default="600:1400:100", help="Listenpreise von:bis:schritt")
+    ap.add_argument("--floor", default="400:1200:50", help="Untergrenzen von:bis:schritt")
+    ap.add_argument("--rounds", type=int, default=MAX_ROUNDS)
+    a = ap.parse_args()
+    list_prices, min_prices = _range(a.list), _range(a.floor)
+
+    # Gegenprobe + Laufzeit: Batch vs. skalare Schleife
+    rng = np.random.default_rng(0)
+    n = 200_000
+    lp = rng.integers(500, 1500, n)
+    fl = (lp * rng.uniform(0.5, 1.0, n)).astype(int)
+    pb = np.where(rng.random(n) < 0.1, 0, rng.integers(300, 1600, n))
+    uo = rng.integers(100, 1600, n).astype(np.float64)
+    uo[rng.random(n) < 0.1] = np.nan
+    rd = rng.integers(0, 12, n)
+    t0 = time.perf_counter()
+    batch = counter_offer_batch(pb, uo, rd, fl, lp)
+    t_batch = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    scalar = [counter_offer(int(pb[i]), None if np.isnan(uo[i]) else int(uo[i]), int(rd[i]), int(fl[i]), int(lp[i]))
+              for i in range(n)]
+    t_scalar = time.perf_counter() - t0
+    if not np.array_equal(batch, scalar):
+        raise AssertionError(f"Batch weicht ab bei Index {int(np.flatnonzero(batch != scalar)[0])}")
+    print(f"Gegenprobe: {n:,} Zufallsfälle identisch – skalar {t_scalar * 1e9 / n:.0f} ns/Fall, "
+          f"Batch {t_batch * 1e9 / n:.1f} ns/Fall ({t_scalar / t_batch:.0f}×)")
+
+    t0 = time.perf_counter()
+    res = scan(list_prices, min_prices, a.rounds)
+    secs = time.perf_counter() - t0
+    print(f"Raster: {len(list_prices)} Listenpreise × {len(min_prices)} Untergrenzen, "
+          f"{res['cells']:,} Zellen in {secs * 1000:.0f} ms")
+    for name in FLAGS:
+        share = res[name]
+        print(f"\n{name}: Anteil betroffener Zellen (Zeilen Listenpreis, Spalten Untergrenze; '  -' = Untergrenze > Listenpreis)")
+        print("       " + "".join(f"{f:>6}" for f in min_prices))
+        for i, l in enumerate(list_prices):
+            cells = "".join("     -" if np.isnan(v) else f"{v:6.0%}" for v in share[i])
+            print(f"{l:>6} {cells}")
+
+
+if __name__ == "__main__":
+    main()
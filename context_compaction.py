@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# KONTEXT-VERDICHTUNG für lange Verhandlungen (chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Token-Schätzung ohne Tokenizer-Abhängigkeit (~4 Zeichen pro Token
+#     + 4 Token Overhead je Nachricht) – dieselbe Schätzung nutzt mock_openai.py
+#     für usage.prompt_tokens.
+# [2] Zusammenfassung älterer Turns direkt aus dem Verlauf (KEIN LLM-Aufruf):
+#     Angebotsverlauf, genannte Argumente beider Seiten, Zugeständnisse.
+# [3] compact_history: die letzten K Turns (ab der K-letzten Nutzer-Nachricht)
+#     bleiben wörtlich, alles davor ersetzt EINE system-Nachricht mit der
+#     Zusammenfassung. Damit wächst der Prompt pro Turn nicht mehr mit der
+#     Verhandlungslänge (und die Tokens pro Session nicht mehr quadratisch).
+# ============================================================================
+
+import math
+
+from text_analysis import ARG_KEYS, arg_flags
+
+# Anzeige-Namen der Argument-Kategorien (Reihenfolge wie ARG_KEYS)
+ARG_LABELS = {
+    "student": "Studium", "budget": "Budget", "cheaper": "günstigere Angebote anderswo",
+    "condition": "Zustand", "immediacy": "Eile", "cash": "Barzahlung", "pickup": "Abholung",
+    "shipping": "Versand", "warranty": "Garantie/Rechnung",
+}
+ROLE_LABELS = {"assistant": "Verkäufer", "user": "Käufer:in"}
+MAX_TRAJECTORY = 10   # höchstens so viele Angebote im Verlauf der Zusammenfassung
+
+# --------------------------- [1] TOKEN-SCHÄTZUNG --------------------------
+def approx_tokens(messages) -> int:
+    """Grobe Prompt-Tokens einer Nachrichtenliste (für Vergleiche, nicht für Abrechnung)."""
+    return sum(4 + math.ceil(len(m.get("content") or "") / 4) for m in messages)
+
+# ---------------------------- [2] ZUSAMMENFASSUNG -------------------------
+def summarize(messages, price_of) -> str:
+    """Strukturierte Zusammenfassung der übergebenen (älteren) Nachrichten."""
+    offers, args = [], {"user": set(), "assistant": set()}
+    for m in messages:
+        role, text = m["role"], m.get("content") or ""
+        if role not in ROLE_LABELS:
+            continue
+        price = price_of(text)
+        if price is not None:
+            offers.append((role, price))
+        for key, hit in arg_flags(text).items():
+            if hit:
+                args[role].add(key)
+
+    n_user = sum(1 for m in messages if m["role"] == "user")
+    parts = [f"Zusammenfassung des bisherigen Verlaufs ({n_user} frühere Nachrichten der Käufer:in):"]
+    if offers:
+        shown = [f"{ROLE_LABELS[r]} {p} €" for r, p in offers]
+        if len(shown) > MAX_TRAJECTORY:   # Länge begrenzen: Anfang + jüngste Angebote
+            shown = shown[:1] + ["…"] + shown[-(MAX_TRAJECTORY - 1):]
+        parts.append("Angebotsverlauf: " + " → ".join(shown) + ".")
+    seller = [p for r, p in offers if r == "assistant"]
+    buyer = [p for r, p in offers if r == "user"]
+    if len(seller) >= 2:
+        steps = sum(1 for a, b in zip(seller, seller[1:]) if a != b)
+        moved = seller[-1] - seller[0]
+        parts.append(f"Zugeständnisse Verkäufer: {seller[0]} € → {seller[-1]} € "
+                     f"({steps} Schritte, zusammen {'−' if moved < 0 else '+'}{abs(moved)} €).")
+    if buyer:
+        parts.append(f"Käufer:in: erstes Angebot {buyer[0]} €, höchstes {max(buyer)} €, zuletzt {buyer[-1]} €.")
+    for role, label in (("user", "Argumente Käufer:in"), ("assistant", "Bereits genannte Argumente Verkäufer")):
+        if args[role]:
+            parts.append(f"{label}: " + ", ".join(ARG_LABELS[k] for k in ARG_KEYS if k in args[role]) + ".")
+    return " ".join(parts)
+
+# ------------------------------ [3] VERDICHTEN ----------------------------
+def compact_history(history, keep_turns: int, price_of):
+    """
+    Verlauf für den Prompt: die letzten keep_turns Turns wörtlich, davor eine Zusammenfassung.
+    keep_turns <= 0 oder kurzer Verlauf → unverändert. Gibt (nachrichten, info) zurück;
+    info: summarized (ersetzte Nachrichten), kept (wörtliche Nachrichten).
+    """
+    user_idx = [i for i, m in enumerate(history) if m["role"] == "user"]
+    if keep_turns <= 0 or len(user_idx) <= keep_turns:
+        return history, {"summarized": 0, "kept": len(history)}
+    cut = user_idx[-keep_turns]
+    older, recent = history[:cut], history[cut:]
+    summary = {"role": "system", "content": summarize(older, price_of)}
+    return [summary] + recent, {"summarized": len(older), "kept": len(recent)}
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# DEADLINE-SCHEDULER: serverseitiges Zeitlimit pro Session (app.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Deadline: ein Eintrag pro Session (Fälligkeit, Callback, Lock, done).
+#     Der Lock serialisiert Nutzer-Turn und Ablauf derselben Session;
+#     finish_once() liefert genau einmal True – wer zuerst das Outcome
+#     schreibt (Turn oder Scheduler), sagt damit auch den Timer ab.
+# [2] DeadlineScheduler: Min-Heap nach Fälligkeit + EIN Hintergrund-Thread pro
+#     Prozess, der bis zur frühesten Deadline schläft (Condition.wait). Kein
+#     Polling pro Session: Einplanen O(log n), CPU nur beim Auslösen.
+#     Abgesagte Einträge bleiben ohne Callback im Heap und werden beim
+#     Erreichen der Spitze verworfen (höchstens ein Zeitlimit lang).
+# [3] Prozessweite Instanz + Kennzahlen (geplant, ausgelöst, Verspätung).
+#
+# Benchmark (CPU bei tausenden Sessions):  python bench_deadlines.py
+# ============================================================================
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+
+# ------------------------------- [1] DEADLINE -----------------------------
+class Deadline:
+    __slots__ = ("key", "at", "callback", "lock", "done")
+
+    def __init__(self, key: str, at: float, callback):
+        self.key = key               # Session-ID
+        self.at = at                 # Fälligkeit (time.monotonic)
+        self.callback = callback     # callback(deadline), läuft im Scheduler-Thread unter lock
+        self.lock = threading.RLock()
+        self.done = False            # Outcome geschrieben – Timer erledigt
+
+    def finish_once(self) -> bool:
+        """True beim ersten Aufruf (Outcome jetzt schreiben), danach False; sagt den Timer ab."""
+        with self.lock:
+            if self.done:
+                return False
+            self.done = True
+            self.callback = None     # Session-Objekte nicht bis zur Fälligkeit festhalten
+            return True
+
+    def cancel(self):
+        """Timer absagen, ohne ein Outcome zu vermerken (z. B. Stand an einen anderen Worker verloren)."""
+        with self.lock:
+            self.callback = None
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+# ------------------------------- [2] SCHEDULER ----------------------------
+class DeadlineScheduler:
+    def __init__(self):
+        self._heap = []                  # (fällig, seq, Deadline)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = {"scheduled": 0, "fired": 0, "skipped": 0, "errors": 0,
+                       "max_lag_ms": 0.0}
+
+    def schedule(self, key: str, delay_s: float, callback) -> Deadline:
+        """callback(deadline) nach delay_s Sekunden aufrufen – außer finish_once() kam vorher."""
+        d = Deadline(key, time.monotonic() + max(0.0, delay_s), callback)
+        with self._cond:
+            heapq.heappush(self._heap, (d.at, next(self._seq), d))
+            self._stats["scheduled"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is d:
+                self._cond.notify()      # neue früheste Deadline → Thread neu stellen
+        return d
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].callback is None:
+                        heapq.heappop(self._heap)          # abgesagt/erledigt
+                        self._stats["skipped"] += 1
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                at, _, d = heapq.heappop(self._heap)
+            self._fire(d, now - at)
+
+    def _fire(self, d: Deadline, lag_s: float):
+        with d.lock:
+            callback, d.callback = d.callback, None
+            if callback is None or d.done:
+                return
+            try:
+                callback(d)
+                ok = True
+            except Exception:
+                traceback.print_exc(file=sys.stderr)   # Scheduler läuft für alle anderen Sessions weiter
+                ok = False
+        with self._cond:
+            self._stats["fired" if ok else "errors"] += 1
+            self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], round(lag_s * 1000.0, 3))
+
+    def stats(self) -> dict:
+        with self._cond:
+            pending = sum(1 for _, _, d in self._heap if d.callback is not None)
+            return {**self._stats, "pending": pending, "heap": len(self._heap)}
+
+# ------------------------ [3] PROZESSWEITE INSTANZ ------------------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> DeadlineScheduler:
+    """Ein Scheduler pro Server-Prozess (überlebt Streamlit-Reruns, da Modul gecacht)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = DeadlineScheduler()
+    return _scheduler
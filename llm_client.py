@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# OPENAI CHAT-COMPLETIONS: HTTP-CLIENT (Pool, Keep-Alive, Streaming)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Fehler-Typ für API-/Netzwerkprobleme (UI entscheidet über die Anzeige);
+#     LLMTimeout + budget_left für ein Zeitbudget pro Turn (Deadline).
+# [2] SSE-Parser: "data: {...}"-Zeilen → Text-Deltas, Ende bei "data: [DONE]";
+#     der usage-Chunk am Stream-Ende (stream_options.include_usage) wird mitgelesen.
+# [3] Verbindungsaufbau messen: eigene urllib3-Verbindungsklassen stoppen
+#     DNS + TCP-Connect + TLS-Handshake (nur bei NEUEN Verbindungen).
+#     CancelToken: eine laufende Anfrage aus einem anderen Thread abbrechen –
+#     trennt ihre Verbindung sofort (z. B. überzählige parallele Kandidaten).
+# [4] LLMClient: EIN requests.Session-Pool pro Server-Prozess (Keep-Alive),
+#     konfigurierbare Poolgröße und Connect-/Read-Timeouts, Kennzahlen pro Aufruf
+#     (Verbindungsaufbau vs. Serverzeit) und Token-Verbrauch aus usage
+#     (prompt_tokens, davon aus dem Prompt-Cache des Anbieters: cached_tokens).
+# ============================================================================
+
+import json
+import socket
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# ------------------------------- [1] FEHLER -------------------------------
+class LLMError(Exception):
+    """Netzwerk-/API-Fehler; status ist None bei Verbindungsproblemen, retry_after (s) aus dem Header bei 429."""
+
+    def __init__(self, message: str, status: int | None = None, body: str | None = None,
+                 retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+class LLMTimeout(LLMError):
+    """Antwort kam nicht innerhalb des Timeouts bzw. Zeitbudgets."""
+
+
+def _is_read_timeout(e: requests.RequestException) -> bool:
+    """requests meldet einen Lese-Timeout in iter_lines als ConnectionError(ReadTimeoutError), nicht als Timeout."""
+    return isinstance(e, requests.Timeout) or any(isinstance(a, ReadTimeoutError) for a in e.args)
+
+
+def budget_left(deadline: float | None) -> float | None:
+    """Restzeit bis deadline (time.monotonic) in Sekunden; None = kein Budget. Abgelaufen → LLMTimeout."""
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise LLMTimeout("Zeitbudget für diese Runde überschritten")
+    return left
+
+# ------------------------------ [2] SSE-PARSER ----------------------------
+def iter_sse_deltas(lines, usage: dict | None = None):
+    """Text-Deltas aus den Zeilen eines chat.completions-Streams liefern (usage: wird ggf. befüllt)."""
+    for raw in lines:
+        if not raw:
+            continue
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        for choice in chunk.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+# ------------------------ [3] VERBINDUNGSAUFBAU MESSEN ---------------------
+_tls = threading.local()   # Connect-Zeit des laufenden Requests (pro Thread)
+
+
+_cancel_lock = threading.Lock()   # Zuordnung Verbindung ↔ CancelToken (Verbindungen wandern durch den Pool)
+
+
+class CancelToken:
+    """
+    Abbruch von Anfragen aus einem anderen Thread (chat(..., cancel=token)). cancel() trennt die
+    Verbindung einer laufenden Anfrage sofort, statt bis zur vollständigen Antwort Pool- und
+    Limiter-Slot zu belegen; spätere Anfragen mit dem Token scheitern gleich (LLMError).
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._conns = []
+
+    def cancel(self):
+        with _cancel_lock:
+            self.cancelled = True
+            for conn in self._conns:
+                if conn.cancel_token is self:
+                    conn.drop()
+
+    def _done(self):
+        """Anfrage dieses Threads beendet: ihre Verbindungen gehören wieder dem Pool."""
+        me = threading.get_ident()
+        with _cancel_lock:
+            mine = [conn for conn in self._conns if conn.cancel_thread == me]
+            for conn in mine:
+                if conn.cancel_token is self:
+                    conn.cancel_token = None
+            self._conns = [conn for conn in self._conns if conn.cancel_thread != me]
+
+
+class _Cancellable:
+    """Verbindung merkt sich das CancelToken der Anfrage, die sie gerade ausführt."""
+
+    cancel_token = None
+    cancel_thread = None
+
+    def request(self, *args, **kwargs):
+        token = getattr(_tls, "cancel", None)
+        with _cancel_lock:
+            self.cancel_token, self.cancel_thread = token, threading.get_ident()
+            if token is not None:
+                if token.cancelled:
+                    raise ConnectionAbortedError("Anfrage abgebrochen")
+                token._conns.append(self)
+        return super().request(*args, **kwargs)
+
+    def connect(self):
+        super().connect()
+        with _cancel_lock:
+            if self.cancel_token is not None and self.cancel_token.cancelled:
+                self.drop()   # während des Verbindungsaufbaus abgebrochen
+
+    def drop(self):
+        """Socket sofort schließen – ein blockierendes Lesen im anderen Thread endet mit Fehler."""
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _TimedHTTPConnection(_Cancellable, HTTPConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _tls.connect_s = getattr(_tls, "connect_s", 0.0) + time.perf_counter() - t0
+            _tls.new_conns = getattr(_tls, "new_conns", 0) + 1
+
+
+class _TimedHTTPSConnection(_Cancellable, HTTPSConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _tls.connect_s = getattr(_tls, "connect_s", 0.0) + time.perf_counter() - t0
+            _tls.new_conns = getattr(_tls, "new_conns", 0) + 1
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool,
+        }
+
+# ------------------------------- [4] CLIENT -------------------------------
+def _retry_after(r) -> float | None:
+    """Retry-After-Header (Sekunden) einer Antwort, sonst None."""
+    try:
+        return float(r.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def usage_tokens(usage: dict | None) -> tuple[int, int]:
+    """(prompt_tokens, cached_tokens) aus dem usage-Feld einer Antwort (fehlend → 0)."""
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return int(usage.get("prompt_tokens") or 0), int(details.get("cached_tokens") or 0)
+
+
+class LLMClient:
+    """Prozessweiter Chat-Completions-Client mit Verbindungspool (thread-safe)."""
+
+    def __init__(self, base_url: str, api_key: str, pool_size=20, connect_timeout=5.0, read_timeout=60.0):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+        })
+        adapter = _PooledAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "new_connections": 0, "reused": 0,
+                       "connect_ms_total": 0.0, "server_ms_total": 0.0,
+                       "prompt_tokens": 0, "cached_tokens": 0}
+        self.recent = deque(maxlen=200)   # letzte Einzelmessungen (fürs Admin)
+
+    # --- Messung ---
+    def _start(self):
+        _tls.connect_s = 0.0
+        _tls.new_conns = 0
+        return time.perf_counter()
+
+    def _record(self, t0, r=None, error=False, stream=False, usage=None):
+        total_s = time.perf_counter() - t0
+        connect_s = getattr(_tls, "connect_s", 0.0)
+        new_conns = getattr(_tls, "new_conns", 0)
+        # r.elapsed = Zeit bis zu den Antwort-Headern (inkl. Verbindungsaufbau)
+        ttfb_s = r.elapsed.total_seconds() if r is not None else total_s
+        prompt_tokens, cached_tokens = usage_tokens(usage)
+        m = {
+            "t": time.time(), "stream": stream, "error": error,
+            "status": r.status_code if r is not None else None,
+            "reused": new_conns == 0,
+            "connect_ms": round(connect_s * 1000, 2),
+            "server_ms": round(max(ttfb_s - connect_s, 0.0) * 1000, 2),
+            "total_ms": round(total_s * 1000, 2),
+            "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens,
+        }
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["errors"] += int(error)
+            self._stats["new_connections"] += new_conns
+            self._stats["reused"] += int(new_conns == 0)
+            self._stats["connect_ms_total"] += m["connect_ms"]
+            self._stats["server_ms_total"] += m["server_ms"]
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["cached_tokens"] += cached_tokens
+            self.recent.append(m)
+        _tls.last = m
+        turn = getattr(_tls, "turn", None)
+        if turn is None:
+            turn = _tls.turn = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        turn["calls"] += 1
+        turn["prompt_tokens"] += prompt_tokens
+        turn["cached_tokens"] += cached_tokens
+        return m
+
+    def last_metrics(self) -> dict | None:
+        """Kennzahlen des letzten Aufrufs im aktuellen Thread."""
+        return getattr(_tls, "last", None)
+
+    def take_usage(self) -> dict:
+        """
+        Token-Summe aller Aufrufe im aktuellen Thread seit dem letzten take_usage()
+        (calls, prompt_tokens, cached_tokens) – für die Kennzahlen eines Chat-Turns.
+        """
+        turn = getattr(_tls, "turn", None) or {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        _tls.turn = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        return turn
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        n = s["calls"] or 1
+        s["avg_connect_ms"] = round(s.pop("connect_ms_total") / n, 2)
+        s["avg_server_ms"] = round(s.pop("server_ms_total") / n, 2)
+        s["cached_share"] = round(s["cached_tokens"] / s["prompt_tokens"], 3) if s["prompt_tokens"] else 0.0
+        return s
+
+    # --- Aufrufe ---
+    def _timeout(self, budget):
+        """(connect, read)-Timeout, bei Zeitbudget entsprechend gekürzt."""
+        if budget is None:
+            return self.timeout
+        return tuple(min(t, budget) for t in self.timeout)
+
+    def chat(self, payload: dict, timeout: float | None = None, cancel: CancelToken | None = None) -> dict:
+        """
+        Nicht-gestreamte Anfrage; gibt das JSON der Antwort zurück oder wirft LLMError.
+        timeout: optionales Zeitbudget in Sekunden (kürzt Connect-/Read-Timeout).
+        cancel: CancelToken, über das ein anderer Thread die Anfrage abbrechen kann.
+        """
+        t0 = self._start()
+        _tls.cancel = cancel
+        try:
+            r = self.session.post(self.url, json=payload, timeout=self._timeout(timeout))
+        except requests.Timeout as e:
+            self._record(t0, error=True)
+            raise LLMTimeout(f"Zeitüberschreitung der OpenAI-API: {e}") from e
+        except requests.RequestException as e:
+            if cancel is not None and cancel.cancelled:
+                self._record(t0)   # gewollt abgebrochen – kein API-Fehler
+                raise LLMError("Anfrage abgebrochen") from e
+            self._record(t0, error=True)
+            raise LLMError(f"Netzwerkfehler zur OpenAI-API: {e}") from e
+        finally:
+            _tls.cancel = None
+            if cancel is not None:
+                cancel._done()
+        try:
+            data = r.json()
+        except ValueError:
+            self._record(t0, r, error=True)
+            raise LLMError(f"API-Fehler ({r.status_code})", status=r.status_code, body=r.text,
+                           retry_after=_retry_after(r))
+        self._record(t0, r, error=r.status_code >= 400, usage=data.get("usage") if isinstance(data, dict) else None)
+        if r.status_code >= 400:
+            raise LLMError(f"API-Fehler ({r.status_code})", status=r.status_code,
+                           body=json.dumps(data, ensure_ascii=False, indent=2), retry_after=_retry_after(r))
+        return data
+
+    def stream(self, payload: dict, timeout: float | None = None):
+        """
+        Generator über die Text-Deltas einer Antwort (payload ohne "stream").
+        Wird der Generator vorzeitig geschlossen, wird die Verbindung sofort getrennt.
+        timeout gilt bis zum ersten Byte und zwischen zwei Chunks (nicht für den ganzen Stream).
+        usage kommt als letzter Chunk (stream_options.include_usage) – nur bei vollständig gelesenen Streams.
+        """
+        t0 = self._start()
+        usage = {}
+        body = dict(payload, stream=True, stream_options={"include_usage": True})
+        try:
+            r = self.session.post(self.url, json=body, timeout=self._timeout(timeout),
+                                  stream=True, headers={"Accept": "text/event-stream"})
+        except requests.Timeout as e:
+            self._record(t0, error=True, stream=True)
+            raise LLMTimeout(f"Zeitüberschreitung der OpenAI-API: {e}") from e
+        except requests.RequestException as e:
+            self._record(t0, error=True, stream=True)
+            raise LLMError(f"Netzwerkfehler zur OpenAI-API: {e}") from e
+
+        error = r.status_code >= 400
+        try:
+            if error:
+                raise LLMError(f"API-Fehler ({r.status_code})", status=r.status_code, body=r.text,
+                               retry_after=_retry_after(r))
+            try:
+                yield from iter_sse_deltas(r.iter_lines(), usage)
+            except requests.RequestException as e:
+                error = True
+                if _is_read_timeout(e):
+                    raise LLMTimeout(f"Zeitüberschreitung im Stream der OpenAI-API: {e}") from e
+                raise LLMError(f"Stream abgebrochen: {e}") from e
+        finally:
+            r.close()
+            self._record(t0, r, error=error, stream=True, usage=usage)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# LASTTEST: N gleichzeitige Käufer:innen gegen app.py bzw. chat.py (headless)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Käufer-Skripte: feste Angebotsfolgen (Startgebot, Schritte, Abschluss).
+# [2] Eine Session = ein Streamlit-AppTest im eigenen Thread; jede Nachricht
+#     ist ein Rerun, dessen Dauer als Turn-Latenz gemessen wird.
+# [3] chat.py läuft gegen den lokalen Mock-Server (mock_openai.py) mit
+#     einstellbarer Latenz/Fehlerquote – keine echten API-Kosten; optional mit
+#     Konto-Limits am Mock (--mock-rpm/--mock-tpm → HTTP 429).
+# [4] Bericht je Parallelitätsstufe: p50/p95/p99, Durchsatz, Speicher/Session.
+#
+# Aufruf:  python loadtest.py --app chat --levels 1,5,10,20 --latency 0.3 --error-rate 0.02
+#          python loadtest.py --app app --levels 1,10,50
+#          python loadtest.py --violation-rate 0.3 --stream 0 --secret OPENAI_CANDIDATES=3
+#          python loadtest.py --levels 30 --mock-rpm 60 --secret OPENAI_RPM=60 --secret OPENAI_MAX_CONCURRENCY=8
+# ============================================================================
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from unittest.mock import MagicMock
+
+import streamlit as st
+import streamlit.testing.v1.app_test as _app_test
+import streamlit.testing.v1.local_script_runner as _local_runner
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from mock_openai import start_server  # noqa: E402
+
+# ---------------------------- [1] KÄUFER-SKRIPTE --------------------------
+ARGUMENTS = [
+    "Ich bin Student und mein Budget ist knapp.",
+    "Woanders habe ich es günstiger gesehen.",
+    "Ich könnte es heute noch abholen und bar zahlen.",
+    "Brauche es dringend für die Uni.",
+]
+
+def buyer_script(seed: int, turns: int) -> list[str]:
+    """Angebotsfolge: Startgebot 600–800 €, steigt in 20–40-€-Schritten, am Ende Zusage."""
+    rng = random.Random(seed)
+    offer = rng.randrange(600, 800, 10)
+    msgs = []
+    for i in range(turns - 1):
+        arg = rng.choice(ARGUMENTS) + " " if rng.random() < 0.5 else ""
+        msgs.append(f"{arg}Ich biete {offer} €.")
+        offer += rng.randrange(20, 45, 5)
+    msgs.append(f"Okay, {offer} € – einverstanden, Deal!")
+    return msgs
+
+# ------------------------------ [2] SESSIONS ------------------------------
+# AppTest ist für EINE Session gedacht und setzt globale Objekte (Runtime-Singleton, st.secrets)
+# pro Rerun und räumt sie danach wieder ab. Für parallele Sessions im selben Prozess
+# (= ein Streamlit-Server) werden diese Objekte einmalig und dauerhaft gesetzt.
+_SHARED_SCRIPT_CACHE = ScriptCache()   # wie im Server: einmal kompilieren, nicht je Rerun
+_SHARED_RUNTIME = MagicMock(spec=Runtime)
+_SHARED_RUNTIME.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+_SHARED_RUNTIME.cache_storage_manager = MemoryCacheStorageManager()
+
+
+def _prepare_concurrent_apptest(secrets: dict):
+    _app_test.ScriptCache = _local_runner.ScriptCache = lambda: _SHARED_SCRIPT_CACHE
+    Runtime.instance = classmethod(lambda cls: cls._instance or _SHARED_RUNTIME)
+    Runtime.exists = classmethod(lambda cls: True)
+    shared = Secrets()
+    shared._secrets = dict(secrets)
+    st.secrets = shared   # AppTest bekommt keine eigenen Secrets → kein Hin- und Hertauschen
+
+def _rss_bytes() -> int:
+    """Aktueller Resident-Set-Size des Prozesses (Linux), sonst Maximalwert."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_session(app, script, timeout, out, keep):
+    """Eine Käufer-Session: Start + jede Nachricht als gemessener Rerun."""
+    try:
+        at = AppTest.from_file(str(ROOT / f"{app}.py"), default_timeout=timeout)
+        at.run()
+        for msg in script:
+            if not at.chat_input or at.chat_input[0].disabled:
+                break
+            t0 = time.perf_counter()
+            at.chat_input[0].set_value(msg).run()
+            dt = time.perf_counter() - t0
+            failed = bool(at.exception) or bool(at.error)
+            out.append((dt, failed))
+        keep.append(at)   # Session bleibt für die Speichermessung am Leben
+    except Exception as e:   # Session-Absturz zählt als Fehler, Lauf geht weiter
+        out.append((float("nan"), True))
+        print(f"Session-Fehler: {e!r}", file=sys.stderr)
+
+# ------------------------------- [4] BERICHT ------------------------------
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(p / 100.0 * len(s) + 0.5)) - 1))
+    return s[k]
+
+
+def run_level(app, n, turns, timeout, seed):
+    results, keep, threads = [], [], []
+    rss0 = _rss_bytes()
+    t0 = time.perf_counter()
+    for i in range(n):
+        th = threading.Thread(
+            target=run_session,
+            args=(app, buyer_script(seed + i, turns), timeout, results, keep),
+        )
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - t0
+    rss1 = _rss_bytes()
+    ok = [dt for dt, failed in results if not failed and dt == dt]
+    report = {
+        "app": app, "concurrency": n, "turns": len(results),
+        "errors": sum(1 for _, failed in results if failed),
+        "p50_ms": round(percentile(ok, 50) * 1000, 1),
+        "p95_ms": round(percentile(ok, 95) * 1000, 1),
+        "p99_ms": round(percentile(ok, 99) * 1000, 1),
+        "throughput_turns_s": round(len(results) / wall, 2) if wall else 0.0,
+        "mem_per_session_kb": round(max(rss1 - rss0, 0) / max(len(keep), 1) / 1024, 1),
+    }
+    keep.clear()
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Lasttest für app.py / chat.py")
+    ap.add_argument("--app", choices=["app", "chat"], default="chat")
+    ap.add_argument("--levels", default="1,5,10,20", help="Parallelitätsstufen, kommagetrennt")
+    ap.add_argument("--turns", type=int, default=6, help="Nachrichten pro Käufer:in")
+    ap.add_argument("--latency", type=float, default=0.3, help="Mock: Sekunden bis zur Antwort")
+    ap.add_argument("--jitter", type=float, default=0.1, help="Mock: ± Sekunden Latenzschwankung")
+    ap.add_argument("--token-delay", type=float, default=0.005, help="Mock: Sekunden zwischen Stream-Tokens")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Mock: Anteil HTTP-500-Antworten")
+    ap.add_argument("--violation-rate", type=float, default=0.0, help="Mock: Anteil regelverletzender Antworten")
+    ap.add_argument("--mock-rpm", type=float, default=0, help="Mock: Anfragen pro Minute, darüber 429 (0 = aus)")
+    ap.add_argument("--mock-tpm", type=float, default=0, help="Mock: Tokens pro Minute, darüber 429 (0 = aus)")
+    ap.add_argument("--stream", type=int, default=1, help="chat.py: Streaming an (1) / aus (0)")
+    ap.add_argument("--secret", action="append", default=[], help="zusätzliches Secret KEY=VALUE")
+    ap.add_argument("--timeout", type=float, default=120.0, help="Sekunden pro Rerun")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="Ergebnis als JSON-Zeilen ausgeben")
+    a = ap.parse_args(argv)
+
+    secrets = {}
+    server = None
+    if a.app == "chat":
+        server, url = start_server(latency_s=a.latency, token_delay_s=a.token_delay,
+                                   error_rate=a.error_rate, jitter_s=a.jitter, seed=a.seed,
+                                   violation_rate=a.violation_rate, rpm=a.mock_rpm, tpm=a.mock_tpm)
+        secrets = {"OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": url, "OPENAI_STREAM": bool(a.stream)}
+    for kv in a.secret:
+        k, _, v = kv.partition("=")
+        secrets[k] = json.loads(v) if v[:1] in "0123456789[{tf\"-" and v not in ("", "-") else v
+
+    _prepare_concurrent_apptest(secrets)
+    # Logs/DB des Lasttests in ein Wegwerf-Verzeichnis schreiben
+    os.chdir(tempfile.mkdtemp(prefix="loadtest_"))
+
+    # Aufwärmen: Imports, Bytecode-Cache, Verbindungspool – gehen nicht in die Messung ein
+    run_level(a.app, 1, a.turns, a.timeout, a.seed - 1)
+
+    reports = []
+    for n in [int(x) for x in a.levels.split(",") if x.strip()]:
+        r = run_level(a.app, n, a.turns, a.timeout, a.seed)
+        if server is not None:
+            r["mock_requests"] = server.stats["requests"]
+            r["mock_errors"] = server.stats["errors"]
+            r["mock_429"] = server.stats["rate_limited"]
+        reports.append(r)
+        if a.json:
+            print(json.dumps(r))
+        else:
+            print(f"N={r['concurrency']:>4}  turns={r['turns']:>5}  err={r['errors']:>3}  "
+                  f"p50={r['p50_ms']:>8.1f}ms  p95={r['p95_ms']:>8.1f}ms  p99={r['p99_ms']:>8.1f}ms  "
+                  f"{r['throughput_turns_s']:>7.2f} turns/s  {r['mem_per_session_kb']:>8.1f} KB/Session"
+                  + (f"  429 (Mock, kumuliert)={r['mock_429']}" if a.mock_rpm or a.mock_tpm else ""))
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# ASYNCHRONER LOG-WRITER (Group Commit) – gemeinsam für app.py und chat.py
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Ziele: CSV- und JSONL-Dateien, die zeilenweise beschrieben werden;
+#     RollingJsonlTarget rotiert nach Größe (datei, datei.1, … datei.N).
+# [2] Writer: begrenzte Queue + EIN Hintergrund-Thread pro Prozess.
+#     • Zeilen werden pro Datei gesammelt und gemeinsam geschrieben (ein open/close je Batch).
+#     • Flush bei Batchgröße ODER nach Zeitintervall.
+#     • flush() blockiert, bis alles auf der Platte ist (z. B. bei Outcome-Events).
+#     • Beim Prozessende (atexit) wird automatisch geleert.
+# [3] Kennzahlen: Queue-Tiefe, Flush-Latenz, Anzahl Batches/Zeilen.
+# ============================================================================
+
+import atexit
+import csv
+import io
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+# Konfiguration (per Umgebungsvariable überschreibbar)
+QUEUE_SIZE = int(os.environ.get("LOGWRITER_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.environ.get("LOGWRITER_BATCH_SIZE", "256"))
+FLUSH_INTERVAL_S = float(os.environ.get("LOGWRITER_FLUSH_INTERVAL_S", "0.5"))
+
+# ------------------------------- [1] ZIELE --------------------------------
+class CsvTarget:
+    """CSV-Datei; Header wird geschrieben, wenn die Datei neu/leer ist."""
+
+    def __init__(self, path, header=None):
+        self.path = Path(path)
+        self.header = list(header) if header else None
+
+    def __hash__(self):
+        return hash(("csv", str(self.path)))
+
+    def __eq__(self, other):
+        return isinstance(other, CsvTarget) and other.path == self.path
+
+    def encode(self, row) -> str:
+        buf = io.StringIO()
+        csv.writer(buf).writerow(row)
+        return buf.getvalue()
+
+    def write_batch(self, lines):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Nur der Writer-Thread schreibt -> die exists()-Prüfung ist hier nicht racy
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        with self.path.open("a", newline="", encoding="utf-8") as f:
+            if is_new and self.header:
+                f.write(self.encode(self.header))
+            f.write("".join(lines))
+
+
+class JsonlTarget:
+    """JSON-Lines-Datei (ein Objekt pro Zeile)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __hash__(self):
+        return hash(("jsonl", str(self.path)))
+
+    def __eq__(self, other):
+        return isinstance(other, JsonlTarget) and other.path == self.path
+
+    def encode(self, obj) -> str:
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    def write_batch(self, lines):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+class RollingJsonlTarget(JsonlTarget):
+    """JSONL-Datei mit Größenrotation: ab max_bytes → .1 (älteste über keep werden gelöscht)."""
+
+    def __init__(self, path, max_bytes=20 * 1024 * 1024, keep=5):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.keep = keep
+
+    def __hash__(self):
+        return hash(("rolling-jsonl", str(self.path)))
+
+    def __eq__(self, other):
+        return isinstance(other, RollingJsonlTarget) and other.path == self.path
+
+    def _rotate(self):
+        # Nur der Writer-Thread schreibt -> Umbenennen ohne Sperre
+        for i in range(self.keep, 0, -1):
+            src = self.path if i == 1 else self.path.with_name(f"{self.path.name}.{i - 1}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i}"))
+
+    def write_batch(self, lines):
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            size = 0
+        if size and size + sum(len(line) for line in lines) > self.max_bytes:
+            self._rotate()
+        super().write_batch(lines)
+
+# ------------------------------- [2] WRITER -------------------------------
+_FLUSH = object()   # Marker: sofort alles schreiben
+_STOP = object()    # Marker: Thread beenden
+
+
+class LogWriter:
+    """Sammelt Zeilen in einer begrenzten Queue und schreibt sie gebündelt im Hintergrund."""
+
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval_s=FLUSH_INTERVAL_S):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._q = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {
+            "enqueued": 0, "written": 0, "batches": 0, "errors": 0,
+            "max_queue_depth": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+
+    # --- Produzenten-Seite (Streamlit-Script-Threads) ---
+    def write(self, target, record):
+        """Datensatz (CSV-Zeile als Liste bzw. JSON-Objekt) zum Schreiben einreihen."""
+        self._ensure_thread()
+        line = target.encode(record)   # Serialisierung im Aufrufer: Writer-Thread bleibt schlank
+        self._q.put((target, line))    # blockiert nur, wenn die Queue voll ist (Backpressure)
+        with self._lock:
+            self._stats["enqueued"] += 1
+            depth = self._q.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+
+    def flush(self, timeout=5.0) -> bool:
+        """Bis hierhin eingereihte Zeilen sofort schreiben; True, wenn rechtzeitig erledigt."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._q.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Rest schreiben und Thread beenden (atexit)."""
+        if self._thread is None:
+            return
+        self._q.put((_STOP, None))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+        s["queue_depth"] = self._q.qsize()
+        s["avg_flush_ms"] = round(s["total_flush_ms"] / s["batches"], 3) if s["batches"] else 0.0
+        return s
+
+    # --- Konsumenten-Seite (Hintergrund-Thread) ---
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="logwriter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        pending = {}        # target -> [zeilen]
+        n_pending = 0
+        first_at = None     # Zeitpunkt der ältesten ungeschriebenen Zeile
+        while True:
+            timeout = None
+            if first_at is not None:
+                timeout = max(0.0, first_at + self.flush_interval_s - time.monotonic())
+            try:
+                target, item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                target, item = None, None
+
+            if target is _FLUSH or target is _STOP:
+                self._flush_pending(pending)
+                pending, n_pending, first_at = {}, 0, None
+                if target is _FLUSH:
+                    item.set()
+                    continue
+                return
+
+            if target is not None:
+                pending.setdefault(target, []).append(item)
+                n_pending += 1
+                if first_at is None:
+                    first_at = time.monotonic()
+
+            due = first_at is not None and time.monotonic() - first_at >= self.flush_interval_s
+            if n_pending >= self.batch_size or due:
+                self._flush_pending(pending)
+                pending, n_pending, first_at = {}, 0, None
+
+    def _flush_pending(self, pending):
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        written = errors = 0
+        for target, lines in pending.items():
+            try:
+                target.write_batch(lines)
+                written += len(lines)
+            except Exception:
+                errors += 1
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            self._stats["written"] += written
+            self._stats["errors"] += errors
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round(ms, 3)
+            self._stats["total_flush_ms"] += ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], round(ms, 3))
+
+# ------------------------ [3] PROZESSWEITE INSTANZ ------------------------
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> LogWriter:
+    """Ein Writer pro Server-Prozess (überlebt Streamlit-Reruns, da Modul gecacht)."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = LogWriter()
+                atexit.register(_writer.close)
+    return _writer
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# LOKALER MOCK-SERVER für die OpenAI-Chat-Completions-API (nur für Tests)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] POST /v1/chat/completions – normal (JSON) oder gestreamt (SSE, "stream": true).
+# [2] Antworttext: deutscher Verkäufer-Satz mit dem Gegenangebot aus der
+#     Strategie-Zeile ("Konkretes Gegenangebot für diese Runde: X €").
+# [3] Optional: Regelverstöße einstreuen (--violation-rate), um den
+#     Stream-Abbruch und die Korrektur-Runde zu testen.
+# [4] Lasttests: feste Latenz + Jitter und Fehlerquote (HTTP 500) einstellbar;
+#     Zähler für Anfragen/Fehler/Prompt-Tokens unter server.stats
+#     (usage.prompt_tokens geschätzt wie context_compaction.approx_tokens).
+# [5] Prompt-Caching wie beim Anbieter: Präfix-Blöcke zu 128 Tokens (~512
+#     Zeichen) werden gehasht; ab CACHE_MIN_TOKENS Prompt-Länge zählt der
+#     längste bereits gesehene Präfix als usage.prompt_tokens_details.cached_tokens
+#     (auch im Stream, mit stream_options.include_usage). Optional kostet jeder
+#     NICHT gecachte Token Prefill-Zeit (--prefill-ms-per-ktok).
+# [6] Rate-Limits wie beim Konto: --rpm / --tpm (Token-Buckets, Tokens =
+#     Prompt + max_tokens); Überschreitung → HTTP 429 mit Retry-After.
+#
+# Aufruf:  python mock_openai.py --port 8765
+#          In .streamlit/secrets.toml: OPENAI_BASE_URL = "http://127.0.0.1:8765/v1"
+# ============================================================================
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from context_compaction import approx_tokens
+from rate_limiter import TokenBucket
+
+OFFER_RE = re.compile(r"Gegenangebot für diese Runde:\s*(\d+)")
+CACHE_BLOCK_TOKENS = 128      # Granularität des Präfix-Caches
+CACHE_MIN_TOKENS = 1024       # kürzere Prompts werden nie gecacht
+CACHE_MAX_BLOCKS = 200_000    # gemerkte Präfix-Blöcke (LRU)
+
+# ------------------------------ [2] ANTWORTEN -----------------------------
+def make_reply(messages, violation_rate=0.0, rng=random) -> str:
+    """Plausible Verkäufer-Antwort; bei Verstoß mit verbotener Formulierung."""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    m = OFFER_RE.search(system)
+    offer = int(m.group(1)) if m else 950
+    if rng.random() < violation_rate:
+        return (f"Danke für Ihr Angebot. Der Neupreis liegt deutlich höher, daher bleibe ich bei "
+                f"{offer} €. Das ist wirklich fair.")
+    return (f"Danke für Ihr Angebot. Für ein neues, originalverpacktes Gerät kann ich Ihnen "
+            f"{offer} € anbieten. Wäre das für Sie in Ordnung?")
+
+
+def _chunks(text):
+    """Text in Token-ähnliche Stücke (Wort + Leerzeichen) zerlegen."""
+    return re.findall(r"\S+\s*", text)
+
+# ---------------------------- [5] PROMPT-CACHE ----------------------------
+class PrefixCache:
+    """Merkt sich Hashes von Prompt-Präfixen in 128-Token-Blöcken (thread-safe, LRU)."""
+
+    def __init__(self, min_tokens=CACHE_MIN_TOKENS, max_blocks=CACHE_MAX_BLOCKS):
+        self.min_tokens = min_tokens
+        self.max_blocks = max_blocks
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, messages, prompt_tokens: int) -> int:
+        """Gecachte Tokens dieses Prompts; danach sind alle seine Präfix-Blöcke gemerkt."""
+        text = "".join(f"{m.get('role')}\x00{m.get('content') or ''}\x01" for m in messages).encode("utf-8")
+        block = CACHE_BLOCK_TOKENS * 4
+        h, digests = hashlib.blake2b(digest_size=16), []
+        for i in range(0, len(text) - block + 1, block):
+            h.update(text[i:i + block])
+            digests.append(h.copy().digest())
+        hit = 0
+        with self._lock:
+            for k, d in enumerate(digests, 1):
+                if d in self._seen:
+                    self._seen.move_to_end(d)
+                    hit = k if hit == k - 1 else hit
+                else:
+                    self._seen[d] = None
+            while len(self._seen) > self.max_blocks:
+                self._seen.popitem(last=False)
+        if prompt_tokens < self.min_tokens:
+            return 0
+        return min(hit * CACHE_BLOCK_TOKENS, prompt_tokens)
+
+# ------------------------------- [1] SERVER -------------------------------
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status, obj, headers=None):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limit(self, tokens):
+        """[6] Anfrage gegen RPM/TPM buchen; bei Überschreitung 429 senden und True zurückgeben."""
+        buckets = self.server.limits
+        if not buckets:
+            return False
+        with self.server.stats_lock:
+            now = time.monotonic()
+            delays = {kind: b.delay(1 if kind == "requests" else tokens, now) for kind, b in buckets.items()}
+            kind, delay = max(delays.items(), key=lambda kv: kv[1])
+            if delay <= 0:
+                for k, b in buckets.items():
+                    b.take(1 if k == "requests" else tokens, now)
+                return False
+            self.server.stats["rate_limited"] += 1
+        self._json(429, {"error": {
+            "message": f"mock: Rate limit reached ({kind} per min). Please try again in {delay:.2f}s.",
+            "type": kind, "code": "rate_limit_exceeded"}}, {"Retry-After": f"{delay:.2f}"})
+        return True
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "invalid json"}})
+
+        cfg = self.server.config
+        prompt_tokens = approx_tokens(req.get("messages", []))
+        if self._rate_limit(prompt_tokens + max(1, int(req.get("n") or 1)) * int(req.get("max_tokens") or 0)):
+            return
+        cached_tokens = self.server.prefix_cache.lookup(req.get("messages", []), prompt_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["prompt_tokens"] += prompt_tokens
+            self.server.stats["cached_tokens"] += cached_tokens
+        prefill_s = (prompt_tokens - cached_tokens) / 1000 * cfg["prefill_ms_per_ktok"] / 1000
+        if cfg["error_rate"] and cfg["rng"].random() < cfg["error_rate"]:
+            time.sleep(cfg["latency_s"])
+            with self.server.stats_lock:
+                self.server.stats["errors"] += 1
+            return self._json(500, {"error": {"message": "mock: simulierter Serverfehler", "type": "server_error"}})
+        n = max(1, int(req.get("n") or 1))
+        texts = [make_reply(req.get("messages", []), cfg["violation_rate"], cfg["rng"]) for _ in range(n)]
+        text = texts[0]
+        cid = f"chatcmpl-mock-{int(time.time() * 1000)}"
+
+        if not req.get("stream"):
+            time.sleep(_latency(cfg) + prefill_s)
+            return self._json(200, {
+                "id": cid, "object": "chat.completion", "model": req.get("model"),
+                "choices": [{"index": i, "message": {"role": "assistant", "content": t},
+                             "finish_reason": "stop"} for i, t in enumerate(texts)],
+                "usage": dict(usage, completion_tokens=sum(len(_chunks(t)) for t in texts)),
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(_latency(cfg) + prefill_s)   # Zeit bis zum ersten Token
+        try:
+            for piece in _chunks(text):
+                chunk = {"id": cid, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(cfg["token_delay_s"])
+            if (req.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": cid, "object": "chat.completion.chunk", "choices": [],
+                         "usage": dict(usage, completion_tokens=len(_chunks(text)))}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # Client hat den Stream abgebrochen
+        self.close_connection = True
+
+
+def _latency(cfg) -> float:
+    jitter = cfg["jitter_s"]
+    return max(0.0, cfg["latency_s"] + (cfg["rng"].uniform(-jitter, jitter) if jitter else 0.0))
+
+
+def start_server(port=0, latency_s=0.0, token_delay_s=0.0, violation_rate=0.0, seed=None,
+                 error_rate=0.0, jitter_s=0.0, prefill_ms_per_ktok=0.0, cache_min_tokens=CACHE_MIN_TOKENS,
+                 rpm=0, tpm=0):
+    """Server im Hintergrund-Thread starten; gibt (server, base_url) zurück."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency_s": latency_s, "token_delay_s": token_delay_s, "jitter_s": jitter_s,
+        "violation_rate": violation_rate, "error_rate": error_rate, "rng": random.Random(seed),
+        "prefill_ms_per_ktok": prefill_ms_per_ktok,
+    }
+    server.prefix_cache = PrefixCache(cache_min_tokens)
+    server.limits = {k: TokenBucket(v) for k, v in (("requests", rpm), ("tokens", tpm)) if v}
+    server.stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "cached_tokens": 0, "rate_limited": 0}
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Lokaler Mock der OpenAI-Chat-Completions-API")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.0, help="Sekunden bis zur Antwort/zum ersten Token")
+    ap.add_argument("--token-delay", type=float, default=0.02, help="Sekunden zwischen Stream-Tokens")
+    ap.add_argument("--violation-rate", type=float, default=0.0, help="Anteil Antworten mit Regelverstoß")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Anteil Anfragen mit HTTP 500")
+    ap.add_argument("--jitter", type=float, default=0.0, help="± Sekunden Zufallsschwankung der Latenz")
+    ap.add_argument("--prefill-ms-per-ktok", type=float, default=0.0, help="ms Prefill je 1000 nicht gecachter Prompt-Tokens")
+    ap.add_argument("--cache-min-tokens", type=int, default=CACHE_MIN_TOKENS, help="Mindestlänge für Prompt-Caching")
+    ap.add_argument("--rpm", type=float, default=0, help="Anfragen pro Minute (0 = unbegrenzt)")
+    ap.add_argument("--tpm", type=float, default=0, help="Tokens pro Minute (0 = unbegrenzt)")
+    a = ap.parse_args()
+    srv, url = start_server(a.port, a.latency, a.token_delay, a.violation_rate,
+                            error_rate=a.error_rate, jitter_s=a.jitter,
+                            prefill_ms_per_ktok=a.prefill_ms_per_ktok, cache_min_tokens=a.cache_min_tokens,
+                            rpm=a.rpm, tpm=a.tpm)
+    print(f"Mock-Server läuft: {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# VERHANDLUNGS-ENGINE von app.py (ohne Streamlit, deterministisch testbar)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Konstanten der Strategie (Zielpreis, interne Untergrenze, Zeitlimit).
+# [2] NegotiationState: kompakter Zustand einer Session (__slots__).
+# [3] NegotiationEngine: Gegenangebote (_counter_logic), Deal-Erkennung
+#     (_detect_deal), Abschluss/Absage und Zeit-Logik (_time_guard…) aus app.py –
+#     reine Funktionen auf dem Zustand, Zufall über ein injizierbares RNG
+#     (random.Random(seed) für reproduzierbare Läufe, Standard: Modul random).
+# [4] respond(): ein kompletter Nutzer-Turn wie in app.py → Bot-Nachrichten.
+#
+# app.py nutzt die Engine direkt; negotiation_sim.py spielt dieselbe Strategie
+# vektorisiert mit Millionen Käufer-Verläufen durch.
+# ============================================================================
+
+import random
+
+from rule_seller import CLOSERS, EMPATHY, compose_argument_response, round5
+from text_analysis import analyze, arg_flags
+
+# ------------------------------ [1] KONSTANTEN ----------------------------
+ORIGINAL_PRICE = 1000                    # Zielpreis
+INTERNAL_MIN_PRICE = int(ORIGINAL_PRICE * 0.90)  # interne Untergrenze (10 % Nachlass) – NIEMALS nennen!
+TIME_LIMIT_SECONDS = 10 * 60             # 10 Minuten – niemals offenlegen
+
+# Aufschlag auf das Nutzerangebot bei den ersten drei Zahlenangeboten
+FIRST_COUNTER_DELTAS = {1: [40, 50, 35, 30], 2: [25, 30, 20, 15], 3: [10, 15, 20]}
+# Schrittweite der Annäherung ab dem 4. Zahlenangebot
+STEP_DOWNS = [5, 10, 15]
+DECLINES = [
+    "Schade – so tief kann ich leider nicht gehen. Ich bleibe dann lieber bei meinem Angebot.",
+    "Danke für die Verhandlung! Preislich liege ich höher; so komme ich leider nicht mit.",
+    "Ich verstehe Ihre Position, aber darunter kann ich es nicht abgeben.",
+]
+
+# ------------------------------- [2] ZUSTAND ------------------------------
+class NegotiationState:
+    __slots__ = ("current_offer", "numeric_offer_count", "best_user_offer",
+                 "deal_reached", "final_price", "outcome", "ended_by")
+
+    def __init__(self, current_offer: int = ORIGINAL_PRICE):
+        self.current_offer = current_offer   # aktuelles Bot-Angebot
+        self.numeric_offer_count = 0         # Anzahl der vom Gegenüber genannten Zahlenangebote
+        self.best_user_offer = None          # bestes (höchstes) Angebot des Gegenübers
+        self.deal_reached = False
+        self.final_price = None
+        self.outcome = None                  # "deal" / "no_deal" – wird genau einmal gesetzt
+        self.ended_by = None
+
+    def to_dict(self) -> dict:
+        """JSON-fähiger Schnappschuss (session_store.py)."""
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "NegotiationState":
+        state = cls()
+        for k in cls.__slots__:
+            if k in d:
+                setattr(state, k, d[k])
+        return state
+
+# ------------------------------- [3] ENGINE -------------------------------
+class NegotiationEngine:
+    """Strategie von app.py; rng braucht nur .choice und .sample (random.Random oder Modul random)."""
+
+    def __init__(self, rng=None, original_price=ORIGINAL_PRICE, min_price=INTERNAL_MIN_PRICE,
+                 time_limit_s=TIME_LIMIT_SECONDS):
+        self.rng = rng if rng is not None else random.Random()
+        self.original_price = original_price
+        self.min_price = min_price
+        self.time_limit_s = time_limit_s
+
+    def new_state(self) -> NegotiationState:
+        return NegotiationState(self.original_price)
+
+    # --- Preislogik (ohne Text) ---
+    def counter_price(self, state: NegotiationState, offer_user: int | None) -> tuple[str, int]:
+        """
+        Kernlogik für Gegenangebote; gibt (art, preis) zurück, art ∈
+        ask (kein Preis genannt) | hold (≥ Zielpreis) | counter (erste 3 Angebote) |
+        agree (Einigung angeboten) | concede (Annäherung).
+        """
+        if offer_user is None:
+            return "ask", state.current_offer
+
+        # Update Zähler & bestes Angebot
+        state.numeric_offer_count += 1
+        state.best_user_offer = max(state.best_user_offer or 0, offer_user)
+
+        # Falls Nutzer*in ≥ Originalpreis bietet -> fair bestätigen (sofern keine "Überzahlung")
+        if offer_user >= self.original_price:
+            state.current_offer = self.original_price
+            return "hold", self.original_price
+
+        # 1) Erste drei numerische Angebote: immer ein Gegenangebot ÜBER dem Nutzerpreis
+        if state.numeric_offer_count <= 3:
+            delta = self.rng.choice(FIRST_COUNTER_DELTAS[state.numeric_offer_count])
+            # Obergrenze nicht über Originalpreis, nicht über aktuelles Angebot
+            upper_cap = min(self.original_price, state.current_offer)
+            # Untere Schranke: mindestens Nutzerpreis + 5
+            new_offer = min(upper_cap, max(offer_user + delta, offer_user + 5))
+            # Leichte Rundung auf 5er; nicht unter aktuellem Angebot fallen
+            new_offer = min(round5(new_offer), state.current_offer)
+            state.current_offer = new_offer
+            return "counter", new_offer
+
+        # 2) Ab dem 4. Zahlenangebot: moderat annähern, nie "unter Wert"
+        current = state.current_offer
+        # Wenn Nutzerangebot nahe am aktuellen Bot-Angebot liegt (≤10 € Abstand) -> Einigung anbieten
+        if current - offer_user <= 10 and offer_user >= self.min_price:
+            final = round5(max(min(current, self.original_price), offer_user))
+            state.current_offer = final
+            return "agree", final
+
+        # Nutzerangebot deutlich unter aktuellem Bot-Angebot
+        # -> vorsichtige Bewegung Richtung Mitte, aber nicht unter internen Mindestwert
+        midpoint = int(round((current + max(offer_user, self.min_price)) / 2.0))
+        step_down = self.rng.choice(STEP_DOWNS)
+        new_offer = round5(max(self.min_price, min(current - step_down, midpoint)))
+        state.current_offer = min(new_offer, current)
+        return "concede", state.current_offer
+
+    # --- Text ---
+    def counter(self, state: NegotiationState, user_text: str) -> tuple[str, int]:
+        """Gegenangebot als Text (wie app.py _counter_logic); gibt (antwort, angebot) zurück."""
+        offer_user = analyze(user_text).first_price
+        empathy = self.rng.choice(EMPATHY)
+        args = compose_argument_response(arg_flags(user_text), self.rng)
+        close = self.rng.choice(CLOSERS)
+        kind, price = self.counter_price(state, offer_user)
+        if kind == "ask":
+            reply = f"{empathy} Der Neupreis liegt bei **{self.original_price} €**. Woran denken Sie preislich?"
+        elif kind == "hold":
+            reply = f"{empathy} {args} Da der **Originalpreis 1.000 €** ist, bleiben wir bei **1.000 €**. {close}"
+        elif kind == "counter":
+            reply = (f"{empathy} {args} Für ein **neues, originalverpacktes** Gerät halte ich "
+                     f"**{price} €** für angemessen. {close}")
+        elif kind == "agree":
+            reply = f"{empathy} {args} Wenn wir uns auf **{price} €** verständigen, passt es für mich. {close}"
+        else:
+            reply = (f"{empathy} {args} Ich kann preislich entgegenkommen und **{price} €** anbieten – "
+                     f"darunter würde ich es ungern abgeben. {close}")
+        return reply, price
+
+    @staticmethod
+    def detect_deal(text: str) -> tuple[bool, int | None]:
+        """Expliziten Abschluss erkennen; gibt (is_deal, price_if_any) zurück."""
+        a = analyze(text)
+        return a.deal, a.first_price
+
+    # --- Abschluss ---
+    def finish(self, state: NegotiationState, final_price: int, ended_by: str) -> str:
+        """Deal finalisieren (Outcome nur, falls noch keines feststeht)."""
+        state.deal_reached = True
+        state.final_price = final_price
+        if state.outcome is None:
+            state.outcome, state.ended_by = "deal", ended_by
+        return f"Einverstanden – **{final_price} €**. Vielen Dank! 🤝"
+
+    def decline(self, state: NegotiationState) -> str:
+        """Höflich ohne Deal beenden (Preis zu niedrig, ohne Untergrenze zu nennen)."""
+        if state.outcome is None:
+            state.outcome, state.ended_by = "no_deal", "too_low"
+        return self.rng.choice(DECLINES)
+
+    def time_guard(self, state: NegotiationState, elapsed_s: float, latest_user_price: int | None) -> str | None:
+        """Spätestens nach dem Zeitlimit unauffällig zum Abschluss führen (oder höflich absagen)."""
+        if state.deal_reached or elapsed_s < self.time_limit_s:
+            return None
+        # Deadline erreicht – nicht kommunizieren, nur natürlich handeln
+        best_offer = state.best_user_offer or (latest_user_price or 0)
+        if best_offer >= self.min_price:
+            # Einigung zum besten genannten Preis (oder aktuellem Bot-Angebot, falls höher)
+            final = round5(max(self.min_price, min(state.current_offer, self.original_price, best_offer)))
+            return self.finish(state, final, "time_finalization")
+        return self.decline(state)
+
+    # ----------------------------- [4] TURN -------------------------------
+    def respond(self, state: NegotiationState, user_text: str, elapsed_s: float = 0.0) -> list[str]:
+        """Ein Nutzer-Turn wie in app.py; gibt die Bot-Nachrichten in Reihenfolge zurück."""
+        if state.deal_reached:
+            return []
+        out = []
+        is_deal, price_in_text = self.detect_deal(user_text)
+        if is_deal and price_in_text is not None and self.min_price <= price_in_text <= self.original_price:
+            out.append(self.finish(state, price_in_text, "user_says_deal_with_price"))
+        elif is_deal and price_in_text is None:
+            # Kein Preis genannt -> Abschluss zum aktuellen Bot-Angebot
+            out.append(self.finish(state, state.current_offer, "user_says_deal_no_price"))
+        else:
+            # Normales Gegenangebot (auch bei "Deal" mit zu niedrigem Preis – keine harte Zahl nennen)
+            out.append(self.counter(state, user_text)[0])
+        msg = self.time_guard(state, elapsed_s, price_in_text)
+        if msg:
+            out.append(msg)
+        return out
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# MONTE-CARLO-SIMULATION der Verhandlungsstrategie von app.py (NumPy, vektorisiert)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Käufer-Modell: je Verlauf Startangebot, Schrittweite, Reservationspreis
+#     (Zahlungsbereitschaft), Toleranz und Sekunden pro Nachricht zufällig ziehen.
+#     Der Käufer sagt "Deal" (ohne Preis), sobald das Bot-Angebot ≤ Reservation
+#     liegt UND höchstens "Toleranz" über seinem letzten Angebot; sonst bietet
+#     er min(Start + Schritt·t, Reservation).
+# [2] Strategie: counter_price und time_guard aus negotiation_engine.py als
+#     Array-Operationen über ALLE Verläufe gleichzeitig (ein Schritt je Turn).
+#     Zufallswahl (Aufschlag/Schrittweite) über gleichverteilte u ∈ [0, 1):
+#     Index = int(u · Länge) – genau so wie _ScriptedRng unten für die Engine.
+# [3] Gegenprobe: dieselben Käufer und dieselben u-Werte durch die skalare
+#     NegotiationEngine schicken → Endpreise/Turns müssen identisch sein.
+# [4] Bericht: Verteilung der Endpreise, Turns bis zum Deal, Anteil der
+#     Verläufe, die die interne Untergrenze (INTERNAL_MIN_PRICE) erreichen –
+#     die ersten drei Gegenangebote liegen nur 5–50 € über dem Nutzerpreis und
+#     können daher schon unter der Untergrenze liegen (wird getrennt ausgewiesen).
+#
+# Aufruf:  python negotiation_sim.py [--n 1000000] [--seed 1] [--check 2000]
+# ============================================================================
+
+import argparse
+import time
+
+import numpy as np
+
+from negotiation_engine import (FIRST_COUNTER_DELTAS, INTERNAL_MIN_PRICE, ORIGINAL_PRICE, STEP_DOWNS,
+                                TIME_LIMIT_SECONDS, NegotiationEngine)
+
+MAX_TURNS = 60   # Sicherheitsgrenze; mit Zeitlimit endet praktisch jeder Verlauf vorher
+
+# Ergebnis-Codes (ended_by)
+OPEN, USER_DEAL, TIME_DEAL, TOO_LOW = 0, 1, 2, 3
+ENDED_BY = {OPEN: "offen", USER_DEAL: "user_says_deal_no_price", TIME_DEAL: "time_finalization",
+            TOO_LOW: "too_low"}
+
+# ------------------------------ [1] KÄUFER --------------------------------
+def draw_buyers(n: int, rng: np.random.Generator) -> dict:
+    """Käufer-Parameter je Verlauf (ganzzahlige Euro-Beträge, Sekunden pro Nachricht)."""
+    return {
+        "open": rng.integers(600, 851, n),          # erstes Angebot
+        "step": rng.integers(10, 41, n),            # Erhöhung pro Turn
+        "reservation": rng.integers(850, 1001, n),  # höchster akzeptabler Preis
+        "tolerance": rng.integers(0, 41, n),        # akzeptierter Abstand zum eigenen Angebot
+        "secs": rng.uniform(20.0, 90.0, n),         # Sekunden pro Nachricht
+    }
+
+
+def buyer_offer(buyers: dict, turn: int, idx=slice(None)):
+    """Angebot des Käufers im Turn (0-basiert)."""
+    return np.minimum(buyers["open"][idx] + buyers["step"][idx] * turn, buyers["reservation"][idx])
+
+
+def buyer_accepts(buyers: dict, turn: int, bot_offer, idx=slice(None)):
+    """Käufer nimmt das Bot-Angebot an (Vergleich mit seinem letzten Angebot)."""
+    last = buyer_offer(buyers, max(turn - 1, 0), idx)
+    return (bot_offer <= buyers["reservation"][idx]) & (bot_offer - last <= buyers["tolerance"][idx])
+
+# ------------------------------ [2] STRATEGIE -----------------------------
+def _round5(x):
+    # wie rule_seller.round5: round() rundet wie np.round auf die gerade Zahl
+    return (np.round(x / 5) * 5).astype(np.int64)
+
+
+def _pick(options, u):
+    table = np.asarray(options, dtype=np.int64)
+    return table[(u * len(table)).astype(np.int64)]
+
+
+def simulate(buyers: dict, rng: np.random.Generator, engine: NegotiationEngine | None = None,
+             record_u: int = 0) -> dict:
+    """
+    Alle Verläufe gleichzeitig durchspielen. Gibt Arrays zurück: final_price (0 ohne Deal),
+    ended_by, turns (Nutzer-Nachrichten bis zum Ende), floor_hit (Bot-Angebot hat die
+    Untergrenze erreicht). record_u > 0 speichert die u-Werte der ersten record_u Verläufe.
+    """
+    eng = engine or NegotiationEngine()
+    top, floor, limit = eng.original_price, eng.min_price, eng.time_limit_s
+    n = len(buyers["open"])
+
+    current = np.full(n, top, dtype=np.int64)
+    count = np.zeros(n, dtype=np.int64)
+    best = np.zeros(n, dtype=np.int64)
+    final = np.zeros(n, dtype=np.int64)
+    ended = np.full(n, OPEN, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int64)
+    active = np.ones(n, dtype=bool)
+    floor_hit = np.zeros(n, dtype=bool)
+    u_log = []
+
+    for t in range(MAX_TURNS):
+        idx = np.flatnonzero(active)
+        if not idx.size:
+            break
+        u = rng.random(n)
+        if record_u:
+            u_log.append(u[:record_u].copy())
+        turns[idx] = t + 1
+
+        # Käufer akzeptiert das aktuelle Bot-Angebot ("Deal", ohne Preis)
+        cur = current[idx]
+        accept = buyer_accepts(buyers, t, cur, idx)
+        acc = idx[accept]
+        final[acc], ended[acc], active[acc] = current[acc], USER_DEAL, False
+
+        # sonst: Zahlenangebot → Gegenangebot (counter_price)
+        idx = idx[~accept]
+        cur, ui = current[idx], u[idx]
+        offer = buyer_offer(buyers, t, idx)
+        cnt = count[idx] + 1
+        count[idx] = cnt
+        best[idx] = np.maximum(best[idx], offer)
+
+        new = cur.copy()
+        hold = offer >= top
+        new[hold] = top
+
+        first = ~hold & (cnt <= 3)
+        for k, deltas in FIRST_COUNTER_DELTAS.items():
+            m = first & (cnt == k)
+            if m.any():
+                delta = _pick(deltas, ui[m])
+                upper_cap = np.minimum(top, cur[m])
+                val = np.minimum(upper_cap, np.maximum(offer[m] + delta, offer[m] + 5))
+                new[m] = np.minimum(_round5(val), cur[m])
+
+        later = ~hold & (cnt > 3)
+        agree = later & (cur - offer <= 10) & (offer >= floor)
+        new[agree] = _round5(np.maximum(np.minimum(cur[agree], top), offer[agree]))
+        concede = later & ~agree
+        if concede.any():
+            c, o = cur[concede], offer[concede]
+            midpoint = np.round((c + np.maximum(o, floor)) / 2.0).astype(np.int64)
+            step_down = _pick(STEP_DOWNS, ui[concede])
+            val = _round5(np.maximum(floor, np.minimum(c - step_down, midpoint)))
+            new[concede] = np.minimum(val, c)
+        current[idx] = new
+        floor_hit[idx] |= new <= floor
+
+        # Zeitlimit (time_guard): Einigung zum besten Angebot oder höfliche Absage
+        elapsed = (t + 1) * buyers["secs"][idx]
+        due = elapsed >= limit
+        d = idx[due]
+        ok = best[d] >= floor
+        fin = d[ok]
+        final[fin] = _round5(np.maximum(floor, np.minimum(np.minimum(current[fin], top), best[fin])))
+        ended[fin] = TIME_DEAL
+        floor_hit[fin] |= final[fin] <= floor
+        ended[d[~ok]] = TOO_LOW
+        active[d] = False
+
+    return {"final_price": final, "ended_by": ended, "turns": turns, "floor_hit": floor_hit,
+            "u": np.array(u_log).T if record_u else None}
+
+# ------------------------------ [3] GEGENPROBE ----------------------------
+class _ScriptedRng:
+    """Liefert der Engine vorgegebene u-Werte: choice(seq) = seq[int(u · len(seq))]."""
+
+    def __init__(self):
+        self.u = 0.0
+
+    def choice(self, seq):
+        return seq[int(self.u * len(seq))]
+
+
+def scalar_run(buyers: dict, i: int, u_row, engine: NegotiationEngine):
+    """Einen Verlauf mit der skalaren Engine spielen; gibt (final_price, ended_by, turns) zurück."""
+    rng = engine.rng
+    state = engine.new_state()
+    for t in range(MAX_TURNS):
+        rng.u = float(u_row[t])
+        if buyer_accepts(buyers, t, state.current_offer, i):
+            engine.finish(state, state.current_offer, ENDED_BY[USER_DEAL])
+            return state.final_price, USER_DEAL, t + 1
+        offer = int(buyer_offer(buyers, t, i))
+        engine.counter_price(state, offer)
+        engine.time_guard(state, (t + 1) * float(buyers["secs"][i]), offer)
+        if state.outcome == "deal":
+            return state.final_price, TIME_DEAL, t + 1
+        if state.outcome == "no_deal":
+            return 0, TOO_LOW, t + 1
+    return 0, OPEN, MAX_TURNS
+
+
+def cross_check(n: int, seed: int) -> float:
+    """Vektorisierte Simulation gegen die Engine prüfen; gibt die Engine-Laufzeit pro Verlauf (s) zurück."""
+    rng = np.random.default_rng(seed)
+    buyers = draw_buyers(n, rng)
+    res = simulate(buyers, rng, record_u=n)
+    engine = NegotiationEngine(rng=_ScriptedRng())
+    t0 = time.perf_counter()
+    for i in range(n):
+        got = scalar_run(buyers, i, res["u"][i], engine)
+        want = (int(res["final_price"][i]), int(res["ended_by"][i]), int(res["turns"][i]))
+        if got != want:
+            raise AssertionError(f"Verlauf {i}: Engine {got} ≠ Simulation {want}")
+    return (time.perf_counter() - t0) / n
+
+# ------------------------------- [4] BERICHT ------------------------------
+def report(res: dict, secs: float):
+    n = len(res["final_price"])
+    ended, final, turns = res["ended_by"], res["final_price"], res["turns"]
+    deal = (ended == USER_DEAL) | (ended == TIME_DEAL)
+    prices = final[deal]
+
+    print(f"Verläufe: {n:,}   Laufzeit {secs:.2f} s   ({n / secs:,.0f} Verläufe/s)")
+    for code, label in ENDED_BY.items():
+        share = np.mean(ended == code)
+        if share:
+            print(f"  {label:<26} {share:7.2%}")
+    print(f"Deal-Quote: {deal.mean():.2%}")
+    if prices.size:
+        q = np.percentile(prices, [5, 25, 50, 75, 95])
+        print(f"Endpreis (Deals): Ø {prices.mean():.1f} €   P5/P25/P50/P75/P95 = "
+              + " / ".join(f"{v:.0f}" for v in q))
+        lo = min(int(prices.min()) // 50 * 50, INTERNAL_MIN_PRICE)
+        edges = np.arange(lo, ORIGINAL_PRICE + 51, 50)
+        hist, _ = np.histogram(prices, bins=edges)
+        for left, cnt in zip(edges[:-1], hist):
+            share = cnt / prices.size
+            print(f"  {left:>5}–{left + 49:<5} {share:7.2%} {'█' * int(round(share * 50))}")
+        tq = np.percentile(turns[deal], [50, 90, 99])
+        print(f"Turns bis Deal: Ø {turns[deal].mean():.2f}   P50/P90/P99 = " + " / ".join(f"{v:.0f}" for v in tq))
+        tc = np.bincount(turns[deal])
+        print("  " + "  ".join(f"{t}:{c / prices.size:.1%}" for t, c in enumerate(tc) if c / prices.size >= 0.0005))
+    print(f"Untergrenze {INTERNAL_MIN_PRICE} € erreicht (Bot-Angebot ≤ Untergrenze): {res['floor_hit'].mean():.2%}   "
+          f"Deals genau auf der Untergrenze: {np.mean(deal & (final == INTERNAL_MIN_PRICE)):.2%}   "
+          f"Deals darunter: {np.mean(deal & (final < INTERNAL_MIN_PRICE)):.2%}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000, help="Anzahl simulierter Verläufe")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--check", type=int, default=2000, help="Verläufe für die Gegenprobe mit der Engine (0 = aus)")
+    a = ap.parse_args()
+
+    if a.check:
+        per_run = cross_check(a.check, a.seed)
+        print(f"Gegenprobe: {a.check} Verläufe identisch mit NegotiationEngine "
+              f"(skalar {1 / per_run:,.0f} Verläufe/s, TIME_LIMIT {TIME_LIMIT_SECONDS} s)")
+
+    rng = np.random.default_rng(a.seed)
+    t0 = time.perf_counter()
+    res = simulate(draw_buyers(a.n, rng), rng)
+    report(res, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
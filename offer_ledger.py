@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# ANGEBOTS-LEDGER pro Session (gemeinsam für app.py und chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# Wird EINMAL beim Anhängen jeder Nachricht aktualisiert und hält:
+#   • letztes Angebot je Rolle, bestes (höchstes) Nutzerangebot,
+#   • Angebotsverlauf [(rolle, preis), ...],
+#   • Rundenzähler je Rolle (alle Nachrichten, auch ohne Preis).
+# Damit sind alle Entscheidungen pro Runde O(1) – unabhängig von der
+# Länge des Chatverlaufs (kein Rückwärts-Scan mit Regex mehr).
+# ============================================================================
+
+
+class OfferLedger:
+    __slots__ = ("last_offers", "trajectory", "round_counts", "best_user_offer")
+
+    def __init__(self):
+        self.last_offers = {}        # rolle -> letzter genannter Preis
+        self.trajectory = []         # [(rolle, preis)] in Reihenfolge der Nachrichten
+        self.round_counts = {}       # rolle -> Anzahl Nachrichten
+        self.best_user_offer = None  # höchstes Angebot der Käufer:in
+
+    def record(self, role: str, price: int | None):
+        """Nachricht verbuchen; price ist der für diese Nachricht maßgebliche Preis (oder None)."""
+        self.round_counts[role] = self.round_counts.get(role, 0) + 1
+        if price is None:
+            return
+        self.last_offers[role] = price
+        self.trajectory.append((role, price))
+        if role == "user" and (self.best_user_offer is None or price > self.best_user_offer):
+            self.best_user_offer = price
+
+    def to_dict(self) -> dict:
+        """JSON-fähiger Schnappschuss (session_store.py)."""
+        return {"last_offers": self.last_offers, "trajectory": self.trajectory,
+                "round_counts": self.round_counts, "best_user_offer": self.best_user_offer}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "OfferLedger":
+        ledger = cls()
+        ledger.last_offers = dict(d.get("last_offers", {}))
+        ledger.trajectory = [tuple(x) for x in d.get("trajectory", [])]
+        ledger.round_counts = dict(d.get("round_counts", {}))
+        ledger.best_user_offer = d.get("best_user_offer")
+        return ledger
+
+    def last(self, role: str) -> int | None:
+        return self.last_offers.get(role)
+
+    def rounds(self, role: str = "user") -> int:
+        return self.round_counts.get(role, 0)
+
+    @classmethod
+    def from_messages(cls, messages, price_of):
+        """Ledger aus einem bestehenden Verlauf [(rolle, text)] nachbauen (z. B. alte Sessions)."""
+        ledger = cls()
+        for role, text in messages:
+            ledger.record(role, price_of(text))
+        return ledger
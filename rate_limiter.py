@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# RATE-LIMITER für OpenAI-Aufrufe (prozessweit, asyncio)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] TokenBucket: Limit pro Minute, volle Minute als Burst; einer für Anfragen
+#     (RPM), einer für geschätzte Tokens (TPM: Prompt-Schätzung + max_tokens).
+# [2] AsyncLimiter: eigener asyncio-Loop in einem Hintergrund-Thread. Eine
+#     Warteschlange für ALLE Sessions, strikt FIFO: der Kopf wartet auf einen
+#     freien Slot (max. gleichzeitige Anfragen) UND auf beide Buckets, niemand
+#     überholt. Ein 429 vom Server pausiert die ganze Schlange (Retry-After).
+# [3] LimitedClient: gleiche Schnittstelle wie LLMClient (chat/stream/stats/…).
+#     Nur die Zulassung läuft über den Loop – die HTTP-Anfrage selbst wie bisher
+#     im aufrufenden Thread über den Verbindungspool. Nach der Antwort wird der
+#     Token-Bucket mit usage abgeglichen; 429 → Pause + erneut anstellen.
+# [4] Kennzahlen: Wartezeit in der Schlange (p50/p95/max), Drosselzeit durch
+#     die Buckets, 429-Anzahl, aktuelle Schlangenlänge und laufende Anfragen.
+# ============================================================================
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+
+from context_compaction import approx_tokens
+from llm_client import LLMError, LLMTimeout, budget_left
+
+DEFAULT_429_PAUSE_S = 1.0   # Pause, wenn der Server kein Retry-After mitschickt
+HEADROOM = 0.95             # Buckets etwas unter dem Konto-Limit fahren (Schätzfehler, Uhren)
+
+# ------------------------------ [1] TOKEN-BUCKET --------------------------
+class TokenBucket:
+    """Füllt sich mit per_minute/60 pro Sekunde bis per_minute; Anfragen über der Kapazität zählen als voll."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.t = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.t) * self.rate)
+        self.t = now
+
+    def delay(self, n: float, now: float) -> float:
+        """Sekunden, bis n verfügbar sind (0 = sofort)."""
+        self._refill(now)
+        n = min(n, self.capacity)
+        return 0.0 if self.level >= n else (n - self.level) / self.rate
+
+    def take(self, n: float, now: float):
+        self._refill(now)
+        self.level -= min(n, self.capacity)
+
+    def adjust(self, n: float):
+        """Nachträgliche Korrektur (+ = mehr verbraucht als geschätzt); darf ins Minus gehen."""
+        self.level = min(self.capacity, self.level - n)
+
+# ------------------------------ [2] LIMITER -------------------------------
+class AsyncLimiter:
+    """
+    Prozessweite Zulassung zu API-Aufrufen. 0 = ohne Grenze (Slots, RPM bzw. TPM).
+    Aufrufe aus beliebigen Threads: acquire() blockiert bis zur Zulassung, release() gibt frei.
+    """
+
+    def __init__(self, max_concurrency: int = 0, rpm: float = 0, tpm: float = 0):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm * HEADROOM) if rpm else None
+        self.tokens = TokenBucket(tpm * HEADROOM) if tpm else None
+        self._queue = deque()            # (future, tokens, t_angestellt) – nur im Loop-Thread angefasst
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._throttled_head = None      # zuletzt gezählter gedrosselter Kopf
+        self._lock = threading.Lock()    # nur für die Kennzahlen
+        self._waits = deque(maxlen=1000)
+        self._stats = {"granted": 0, "timeouts": 0, "throttled": 0, "throttled_s": 0.0,
+                       "rate_limited": 0, "paused_s": 0.0}
+        self.loop = asyncio.new_event_loop()
+        self._wake = asyncio.Event()     # ab Python 3.10 nicht mehr an einen Loop gebunden
+        threading.Thread(target=self.loop.run_forever, name="llm-limiter", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._dispatch(), self.loop)
+
+    # --- im Loop-Thread ---
+    async def _dispatch(self):
+        while True:
+            while not self._queue or (self.max_concurrency and self._in_flight >= self.max_concurrency):
+                self._wake.clear()
+                await self._wake.wait()
+            fut, tokens, t_enq = self._queue[0]
+            if fut.cancelled():          # Zeitbudget des Aufrufers abgelaufen
+                self._queue.popleft()
+                continue
+            now = time.monotonic()
+            pause = self._paused_until - now
+            throttle = max(self.requests.delay(1, now) if self.requests else 0.0,
+                           self.tokens.delay(tokens, now) if self.tokens else 0.0)
+            if pause > 0 or throttle > 0:
+                wait = max(pause, throttle)
+                with self._lock:
+                    self._stats["paused_s" if pause >= throttle else "throttled_s"] += wait
+                    if pause < throttle and fut is not self._throttled_head:
+                        self._stats["throttled"] += 1
+                        self._throttled_head = fut
+                await asyncio.sleep(wait)
+                continue                 # neu prüfen: Kopf evtl. abgebrochen, neue Pause …
+            self._queue.popleft()
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(tokens, now)
+            self._in_flight += 1
+            waited = now - t_enq
+            with self._lock:
+                self._stats["granted"] += 1
+                self._waits.append(waited)
+            fut.set_result(waited)
+
+    async def _enqueue(self, tokens: float, front: bool) -> float:
+        fut = self.loop.create_future()
+        (self._queue.appendleft if front else self._queue.append)((fut, tokens, time.monotonic()))
+        self._wake.set()
+        try:
+            return await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():   # zugelassen, aber Aufrufer ist schon weg
+                self._finish(0)
+            else:
+                fut.cancel()
+            raise
+
+    def _finish(self, token_delta: float):
+        self._in_flight -= 1
+        if self.tokens and token_delta:
+            self.tokens.adjust(token_delta)
+        self._wake.set()
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        for bucket in (self.requests, self.tokens):   # Server sagt: Kontingent ist leer
+            if bucket:
+                bucket.level = min(bucket.level, 0.0)
+        with self._lock:
+            self._stats["rate_limited"] += 1
+        self._wake.set()
+
+    # --- aus beliebigen Threads ---
+    def acquire(self, tokens: float, timeout: float | None = None, front: bool = False) -> float:
+        """
+        Blockiert bis zur Zulassung; gibt die Wartezeit (s) zurück. Zeitbudget überschritten → LLMTimeout.
+        front: vorne anstellen (Wiederholung nach 429 – war schon an der Reihe).
+        """
+        fut = asyncio.run_coroutine_threadsafe(self._enqueue(tokens, front), self.loop)
+        try:
+            return fut.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if not fut.cancel() and fut.exception() is None:
+                self.release()        # Zulassung kam gleichzeitig mit dem Timeout – Slot zurückgeben
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise LLMTimeout("Zeitbudget in der Warteschlange für die API abgelaufen") from None
+
+    def release(self, token_delta: float = 0):
+        """Slot freigeben; token_delta = tatsächlich − geschätzt verbrauchte Tokens."""
+        self.loop.call_soon_threadsafe(self._finish, token_delta)
+
+    def pause(self, seconds: float):
+        """Nach 429: Schlange für seconds anhalten."""
+        self.loop.call_soon_threadsafe(self._pause, seconds)
+
+    # --- [4] Kennzahlen ---
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            waits = sorted(self._waits)
+        s["queued"] = len(self._queue)
+        s["in_flight"] = self._in_flight
+        s["throttled_s"] = round(s["throttled_s"], 2)
+        s["paused_s"] = round(s["paused_s"], 2)
+        if waits:
+            s["wait_ms_p50"] = round(waits[len(waits) // 2] * 1000, 1)
+            s["wait_ms_p95"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1)
+            s["wait_ms_max"] = round(waits[-1] * 1000, 1)
+        return s
+
+# ---------------------------- [3] CLIENT-WRAPPER --------------------------
+_tls = threading.local()   # Wartezeit des laufenden Turns (pro Thread)
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Tokens für den TPM-Bucket: Prompt-Schätzung + max_tokens je angeforderter Antwort."""
+    n = max(1, int(payload.get("n") or 1))
+    return approx_tokens(payload.get("messages") or []) + n * int(payload.get("max_tokens") or 0)
+
+
+def _used_tokens(data) -> int | None:
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if not usage:
+        return None
+    return int(usage.get("total_tokens") or (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0))
+
+
+class LimitedClient:
+    """LLMClient hinter dem AsyncLimiter; 429 → Schlange pausieren, bis zu retries Mal neu anstellen."""
+
+    def __init__(self, client, limiter: AsyncLimiter, retries: int = 2):
+        self.client = client
+        self.limiter = limiter
+        self.retries = retries
+        self.recent = client.recent
+
+    def _admit(self, tokens: float, deadline, retry=False):
+        waited = self.limiter.acquire(tokens, budget_left(deadline), front=retry)
+        _tls.queue_s = getattr(_tls, "queue_s", 0.0) + waited
+
+    def _rate_limited(self, e: LLMError, attempt: int) -> bool:
+        if e.status != 429:
+            return False
+        self.limiter.pause(e.retry_after or DEFAULT_429_PAUSE_S)
+        return attempt < self.retries
+
+    def chat(self, payload: dict, timeout: float | None = None, cancel=None) -> dict:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        est = estimate_tokens(payload)
+        for attempt in range(self.retries + 1):
+            self._admit(est, deadline, retry=attempt > 0)
+            try:
+                data = self.client.chat(payload, timeout=budget_left(deadline), cancel=cancel)
+            except LLMError as e:
+                self.limiter.release()
+                if self._rate_limited(e, attempt):
+                    continue
+                raise
+            used = _used_tokens(data)
+            self.limiter.release(used - est if used is not None else 0)
+            return data
+
+    def stream(self, payload: dict, timeout: float | None = None):
+        """Wie LLMClient.stream; der Slot bleibt bis zum Ende (oder Abbruch) des Streams belegt."""
+        deadline = time.monotonic() + timeout if timeout is not None else None   # ein Budget für alle Versuche
+        est = estimate_tokens(payload)
+        for attempt in range(self.retries + 1):
+            self._admit(est, deadline, retry=attempt > 0)
+            started, deltas = False, None
+            try:
+                deltas = self.client.stream(payload, timeout=budget_left(deadline))
+                for delta in deltas:
+                    started = True
+                    yield delta
+                return
+            except LLMError as e:
+                if started or not self._rate_limited(e, attempt):
+                    raise
+            finally:
+                if deltas is not None:
+                    deltas.close()
+                self.limiter.release()
+
+    def last_metrics(self) -> dict | None:
+        return self.client.last_metrics()
+
+    def take_usage(self) -> dict:
+        """Wie LLMClient.take_usage, zusätzlich queue_ms (Wartezeit in der Schlange)."""
+        usage = self.client.take_usage()
+        usage["queue_ms"] = round(getattr(_tls, "queue_s", 0.0) * 1000, 1)
+        _tls.queue_s = 0.0
+        return usage
+
+    def stats(self) -> dict:
+        s = self.client.stats()
+        s["limiter"] = self.limiter.stats()
+        return s
@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# REPLAY: geloggte Sessions durch die AKTUELLE Verhandlungslogik schicken
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Laden: alle Sessions aus logs/ (Segment-Log bzw. transcript_*.csv und
+#     <sid>.jsonl), Outcomes aus negotiation.db bzw. outcomes.csv.
+# [2] app.py (NegotiationEngine), Turn für Turn ab dem GELOGGTEN Zustand
+#     (Bot-Angebot vor dem Turn steht in jeder Nutzerzeile). Der Zufall wird
+#     nicht nachgebaut, sondern jeder Zweig der RNG-Auswahl durchgespielt
+#     (_PinnedRng): Abweichung = das geloggte Angebot ist mit der aktuellen
+#     Logik nicht erreichbar. Danach wieder auf den Log-Zustand setzen, damit
+#     eine Abweichung nicht alle folgenden Turns mitzieht. Deal/Abbruch-Buttons
+#     und Zeitlimit-Abschlüsse des Deadline-Schedulers (Bot-Zeilen ohne
+#     Nutzerzeile) werden nachgespielt, am Ende Outcome und Endpreis gegen das
+#     geloggte Outcome.
+# [3] chat.py, Modus "policy" (Standard): Ledger + counter_offer wie in
+#     generate_reply → vorgeschlagenes Gegenangebot je Antwort vs. Preis der
+#     geloggten Antwort; dazu die aktuellen Regeln (violates_rules) auf den
+#     geloggten Antworten. Modus "full": chat.py headless (AppTest) gegen den
+#     lokalen Mock (oder --secret OPENAI_BASE_URL=…) – echte generate_reply-Läufe.
+# [4] Parallel über alle Kerne (ProcessPoolExecutor, Sessions in Blöcken);
+#     Bericht: Abweichungen (Angebote, Regeln, Outcomes), Zeit pro Turn,
+#     Durchsatz; --out schreibt jede Abweichung als JSONL-Zeile.
+# [5] --fake N: synthetische Logs (app: echte Engine mit Zufall, chat: Policy
+#     mit gelegentlich abweichendem/regelwidrigem "LLM") für Benchmarks.
+#
+# Aufruf:  python replay.py [--log-dir logs] [--app all|app|chat] [--workers 8]
+#          python replay.py --engine min_price=880            (Strategie-Änderung prüfen)
+#          python replay.py --chat-param min_price=800
+#          python replay.py --chat-mode full --limit 50
+#          python replay.py --fake 5000                       (Benchmark, synthetische Logs)
+# ============================================================================
+
+import argparse
+import copy
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+from compliance import offer_in, rule_key, violates_rules  # noqa: E402
+from concession_curve import counter_offer  # noqa: E402
+from negotiation_engine import (DECLINES, FIRST_COUNTER_DELTAS, STEP_DOWNS,  # noqa: E402
+                                NegotiationEngine)
+from offer_ledger import OfferLedger  # noqa: E402
+from storage import (LEGACY_OUTCOME_HEADER, SqliteStore, _app_transcript_rows,  # noqa: E402
+                     _chat_event_rows, _read_app_transcript, _read_chat_log, _read_legacy_outcomes)
+from segment_log import iter_records  # noqa: E402
+
+CHAT_PARAMS = {"list_price": 1000, "min_price": 750}   # wie DEFAULT_PARAMS in chat.py
+MAX_EXAMPLES = 5                                         # Beispiele je Abweichungsart im Bericht
+
+# ------------------------------- [1] LADEN --------------------------------
+def _session():
+    return {"app": None, "messages": [], "outcome": None}
+
+
+def load_sessions(log_dir, apps=("app", "chat"), segment_dir=None) -> dict:
+    """session_id → {"app", "messages" (Message-Dicts wie im Store), "outcome" (oder None)}."""
+    log_dir = Path(log_dir)
+    sessions = defaultdict(_session)
+    for app, sid, rec in iter_records(segment_dir or log_dir / "segments"):
+        if app not in apps:
+            continue
+        s = sessions[sid]
+        s["app"] = app
+        if app == "app":
+            s["messages"].extend(_app_transcript_rows([rec]))
+            continue
+        for msg, outcome in _chat_event_rows(sid, [rec]):
+            if msg:
+                s["messages"].append(msg)
+            elif s["outcome"] is None:
+                s["outcome"] = outcome
+    from_segments = set(sessions)
+    # Einzeldateien (LOG_FORMAT=files) – Sessions, die schon im Segment-Log stehen, nicht doppelt
+    if "app" in apps:
+        for path in sorted(log_dir.glob("transcript_*.csv")):
+            sid = path.stem[len("transcript_"):]
+            if sid not in from_segments:
+                sessions[sid]["app"] = "app"
+                sessions[sid]["messages"].extend(_read_app_transcript(path))
+    if "chat" in apps:
+        for path in sorted(log_dir.glob("*.jsonl")):
+            if path.stem in from_segments:
+                continue
+            s = sessions[path.stem]
+            s["app"] = "chat"
+            for msg, outcome in _read_chat_log(path):
+                if msg:
+                    s["messages"].append(msg)
+                elif s["outcome"] is None:
+                    s["outcome"] = outcome
+    # Outcomes von app.py stehen nur im Store
+    outcomes = list(_read_legacy_outcomes(log_dir / "outcomes.csv"))
+    if (log_dir / "negotiation.db").exists():
+        outcomes += SqliteStore(log_dir / "negotiation.db").outcomes(app="app")
+    for o in outcomes:
+        s = sessions.get(o["session_id"])
+        if s is not None and s["app"] == "app" and s["outcome"] is None:
+            s["outcome"] = o
+    return {sid: s for sid, s in sessions.items() if s["messages"]}
+
+
+def _ts(value) -> datetime | None:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+# ----------------------------- [2] APP-REPLAY -----------------------------
+class _PinnedRng:
+    """RNG für einen Zweig der Zufallsauswahl: wählt immer Eintrag index (gekappt auf die Länge)."""
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def choice(self, seq):
+        return seq[min(self.index, len(seq) - 1)]
+
+    def sample(self, seq, k):
+        return list(seq)[:k]
+
+
+BRANCHES = max(len(STEP_DOWNS), *(len(v) for v in FIRST_COUNTER_DELTAS.values()))
+
+
+def _is_deal_text(text: str) -> bool:
+    return (text or "").startswith("Einverstanden")
+
+
+def replay_app(session: dict, engine_kwargs: dict) -> dict:
+    """Eine app.py-Session nachspielen; gibt Abweichungen, Turn-Zeiten und Outcome-Vergleich zurück."""
+    engines = [NegotiationEngine(rng=_PinnedRng(i), **engine_kwargs) for i in range(BRANCHES)]
+    main = engines[0]
+    msgs = session["messages"]
+    start = _ts(msgs[0]["ts"])
+    state = main.new_state()
+    divergences, turn_s = [], []
+
+    def diverge(kind, turn, **info):
+        divergences.append({"kind": kind, "turn": turn, **info})
+
+    i = 0
+    while i < len(msgs) and msgs[i]["role"] != "user":
+        i += 1                               # Begrüßung
+    turn = 0
+    while i < len(msgs):
+        user = msgs[i]
+        bots = []
+        i += 1
+        while i < len(msgs) and msgs[i]["role"] != "user":
+            bots.append(msgs[i])
+            i += 1
+        turn += 1
+        if state.deal_reached:
+            diverge("ended_early", turn, text=user["content"])
+            break
+        if user["current_offer"] is not None:
+            state.current_offer = user["current_offer"]   # Anker: Bot-Angebot vor dem Turn laut Log
+        now = _ts(user["ts"])
+        elapsed = (now - start).total_seconds() if now and start else 0.0
+
+        t0 = time.perf_counter()
+        variants = []
+        for eng in engines:
+            s = copy.copy(state)
+            variants.append((s, eng.respond(s, user["content"], elapsed_s=elapsed)))
+        logged = bots[0]["current_offer"] if bots else None
+        match = next((v for v in variants if v[0].current_offer == logged), None)
+        turn_s.append(time.perf_counter() - t0)
+
+        if logged is not None and match is None:
+            diverge("offer", turn, text=user["content"], logged=logged,
+                    replay=sorted({s.current_offer for s, _ in variants}))
+        state, out = match or variants[0]
+        if logged is not None:
+            state.current_offer = logged
+        if len(bots) < len(out):
+            diverge("messages", turn, text=user["content"], logged=len(bots), replay=len(out),
+                    replay_text=out[len(bots):])
+        # Bot-Zeilen über die Engine-Antworten hinaus: Deal- bzw. Abbruch-Button
+        # oder – nach dem Zeitlimit ohne Nutzer-Turn – der Deadline-Scheduler von app.py
+        for extra in bots[len(out):]:
+            if state.deal_reached:
+                break
+            at = _ts(extra["ts"])
+            late = (at - start).total_seconds() if at and start else 0.0
+            if state.outcome is None and late >= main.time_limit_s:
+                main.time_guard(state, late, None)
+            elif _is_deal_text(extra["content"]):
+                main.finish(state, state.current_offer, "deal_button")
+            elif extra["content"] in DECLINES:
+                main.decline(state)
+    # Buttons vor dem ersten Nutzer-Turn (Deal/Abbruch direkt nach der Begrüßung)
+    if turn == 0:
+        for extra in msgs[1:]:
+            if _is_deal_text(extra["content"]):
+                main.finish(state, state.current_offer, "deal_button")
+            elif extra["content"] in DECLINES:
+                main.decline(state)
+
+    logged = session["outcome"]
+    replay_outcome = (state.outcome, state.final_price if state.outcome == "deal" else None)
+    logged_outcome = ((logged["outcome"], logged["final_price"] if logged["outcome"] == "deal" else None)
+                      if logged else (None, None))
+    if replay_outcome != logged_outcome:
+        diverge("outcome", turn, logged=list(logged_outcome), replay=list(replay_outcome))
+    return {"turns": turn, "turn_s": turn_s, "divergences": divergences}
+
+# ----------------------------- [3] CHAT-REPLAY ----------------------------
+def replay_chat_policy(session: dict, params: dict) -> dict:
+    """Policy + Regeln der aktuellen Version gegen die geloggten Bot-Antworten."""
+    ledger = OfferLedger()
+    ledger.record("assistant", int(params["list_price"]))   # Begrüßung nennt den Ausgangspreis
+    divergences, turn_s, turn = [], [], 0
+    floor, list_price = int(params["min_price"]), int(params["list_price"])
+    for m in session["messages"]:
+        price = offer_in(m["content"])
+        if m["role"] == "user":
+            turn += 1
+            ledger.record("user", price)
+            continue
+        t0 = time.perf_counter()
+        suggested = counter_offer(ledger.last("assistant"), ledger.last("user"), ledger.rounds("user"),
+                                  floor, list_price)
+        reason = violates_rules(m["content"] or "", params)
+        turn_s.append(time.perf_counter() - t0)
+        if suggested is not None and price != suggested:
+            divergences.append({"kind": "offer", "turn": turn, "logged": price, "replay": suggested,
+                                "source": m["source"]})
+        if reason:
+            divergences.append({"kind": "rule:" + rule_key(reason), "turn": turn, "text": m["content"],
+                                "source": m["source"]})
+        ledger.record("assistant", price)
+    return {"turns": turn, "turn_s": turn_s, "divergences": divergences}
+
+
+_full = {}   # pro Worker: Secrets für chat.py (Mock wird einmal pro Prozess gestartet)
+
+
+def replay_chat_full(session: dict, secrets: dict) -> dict:
+    """chat.py headless mit den geloggten Nutzer-Nachrichten; Bot-Angebote neu vs. geloggt."""
+    from streamlit.testing.v1 import AppTest
+    if "secrets" not in _full:
+        secrets = dict(secrets)
+        if "OPENAI_BASE_URL" not in secrets:
+            from mock_openai import start_server
+            _full["server"], secrets["OPENAI_BASE_URL"] = start_server(seed=1)
+            secrets.setdefault("OPENAI_API_KEY", "mock")
+        secrets.setdefault("OPENAI_STREAM", False)
+        _full["secrets"] = secrets
+    at = AppTest.from_file(str(ROOT / "chat.py"), default_timeout=120)
+    for k, v in _full["secrets"].items():
+        at.secrets[k] = v
+    at.run()
+    logged = iter([m for m in session["messages"] if m["role"] == "assistant"])
+    divergences, turn_s, turn = [], [], 0
+    for m in session["messages"]:
+        if m["role"] != "user":
+            continue
+        turn += 1
+        t0 = time.perf_counter()
+        at.chat_input[0].set_value(m["content"]).run()
+        turn_s.append(time.perf_counter() - t0)
+        if at.exception:
+            divergences.append({"kind": "exception", "turn": turn, "error": str(at.exception[0].value)})
+            break
+        reply = at.session_state.chat[-1]["content"]
+        old = next(logged, None)
+        old_price = offer_in(old["content"]) if old else None
+        if offer_in(reply) != old_price:
+            divergences.append({"kind": "offer", "turn": turn, "logged": old_price, "replay": offer_in(reply)})
+        reason = violates_rules(reply, CHAT_PARAMS)
+        if reason:
+            divergences.append({"kind": "rule:" + rule_key(reason), "turn": turn, "text": reply})
+    return {"turns": turn, "turn_s": turn_s, "divergences": divergences}
+
+# ----------------------------- [4] PARALLEL -------------------------------
+def _replay_chunk(chunk, cfg):
+    out = []
+    for sid, session in chunk:
+        if session["app"] == "app":
+            r = replay_app(session, cfg["engine"])
+        elif cfg["chat_mode"] == "full":
+            r = replay_chat_full(session, cfg["secrets"])
+        else:
+            r = replay_chat_policy(session, cfg["chat_params"])
+        out.append({"sid": sid, "app": session["app"], **r})
+    return out
+
+
+def run(sessions: dict, cfg: dict, workers: int) -> list[dict]:
+    items = sorted(sessions.items())
+    if workers <= 1:
+        return _replay_chunk(items, cfg)
+    size = max(1, min(200, len(items) // (workers * 4)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    with ProcessPoolExecutor(workers) as pool:
+        return [r for rs in pool.map(_replay_chunk, chunks, [cfg] * len(chunks)) for r in rs]
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summarize(results: list[dict], wall_s: float) -> dict:
+    report = {"wall_s": round(wall_s, 2), "apps": {}}
+    for app in sorted({r["app"] for r in results}):
+        rs = [r for r in results if r["app"] == app]
+        turn_s = [t for r in rs for t in r["turn_s"]]
+        kinds = Counter(d["kind"] for r in rs for d in r["divergences"])
+        examples = defaultdict(list)
+        for r in rs:
+            for d in r["divergences"]:
+                if len(examples[d["kind"]]) < MAX_EXAMPLES:
+                    examples[d["kind"]].append({"sid": r["sid"], **d})
+        turns = sum(r["turns"] for r in rs)
+        report["apps"][app] = {
+            "sessions": len(rs), "turns": turns,
+            "sessions_diverged": sum(1 for r in rs if r["divergences"]),
+            "divergences": dict(kinds), "examples": dict(examples),
+            "turn_us_p50": round(_pct(turn_s, 0.5) * 1e6, 1), "turn_us_p95": round(_pct(turn_s, 0.95) * 1e6, 1),
+            "turns_per_s": round(turns / wall_s, 1) if wall_s else None,
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"Replay in {report['wall_s']} s")
+    for app, r in report["apps"].items():
+        print(f"\n[{app}] {r['sessions']} Sessions, {r['turns']} Turns ({r['turns_per_s']} Turns/s gesamt), "
+              f"Turn p50 {r['turn_us_p50']} µs / p95 {r['turn_us_p95']} µs")
+        print(f"  Sessions mit Abweichung: {r['sessions_diverged']}")
+        for kind, n in sorted(r["divergences"].items(), key=lambda kv: -kv[1]):
+            print(f"  {kind:<18} {n:>7}")
+            for ex in r["examples"][kind][:2]:
+                print(f"      z. B. {json.dumps(ex, ensure_ascii=False)[:160]}")
+
+# ------------------------------ [5] FAKE-LOGS -----------------------------
+def _fake_app(log_dir: Path, n: int, seed: int, outcomes):
+    for k in range(n):
+        rng = random.Random(seed + k)
+        engine = NegotiationEngine(rng=rng)
+        state = engine.new_state()
+        sid = f"fake_app_{k:06d}"
+        t = datetime(2024, 1, 1) + timedelta(minutes=k)
+        start = t
+        rows = [[t.isoformat(), sid, "bot", "Hallo! Der Neupreis liegt bei **1000 €**.", state.current_offer]]
+        offer, limit = rng.randrange(600, 900, 10), rng.randrange(850, 1000, 5)   # Start, Schmerzgrenze
+        while not state.deal_reached and len(rows) < 60:
+            t += timedelta(seconds=rng.uniform(15, 80))
+            if rng.random() < 0.04:                              # Button statt Nachricht
+                msg = (engine.finish(state, state.current_offer, "deal_button") if rng.random() < 0.7
+                       else engine.decline(state))
+                rows.append([t.isoformat(), sid, "bot", msg, state.current_offer])
+                break
+            text = "Deal!" if state.current_offer <= min(limit, offer + 10) else rng.choice(
+                [f"Ich biete {offer} €.", f"Wie wäre es mit {offer}?", "Das ist mir noch zu teuer."])
+            rows.append([t.isoformat(), sid, "user", text, state.current_offer])
+            for msg in engine.respond(state, text, elapsed_s=(t - start).total_seconds()):
+                rows.append([t.isoformat(), sid, "bot", msg, state.current_offer])
+            offer = min(offer + rng.randrange(5, 30, 5), limit, state.current_offer - 5)
+            if state.outcome == "no_deal":
+                break
+        with (log_dir / f"transcript_{sid}.csv").open("w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["timestamp_utc", "session_id", "role", "text", "current_offer_eur"])
+            w.writerows(rows)
+        if state.outcome:
+            outcomes.writerow([t.isoformat(), sid, "iPad (neu, OVP)", 1000,
+                               state.final_price if state.outcome == "deal" else 0, state.ended_by,
+                               sum(1 for r in rows if r[2] == "user"), int((t - start).total_seconds())])
+
+
+def _fake_chat(log_dir: Path, n: int, seed: int):
+    params = CHAT_PARAMS
+    for k in range(n):
+        rng = random.Random(seed + k)
+        ledger = OfferLedger()
+        ledger.record("assistant", params["list_price"])
+        t = datetime(2024, 1, 1) + timedelta(minutes=k)
+        offer, lines = rng.randrange(550, 800, 10), []
+        for _ in range(rng.randint(3, 12)):
+            t += timedelta(seconds=rng.uniform(10, 60))
+            text = f"Ich könnte {offer} € zahlen." if rng.random() < 0.8 else "Geht da noch etwas?"
+            lines.append({"t": t.isoformat(), "role": "user", "content": text})
+            ledger.record("user", offer_in(text))
+            price = counter_offer(ledger.last("assistant"), ledger.last("user"), ledger.rounds("user"),
+                                  params["min_price"], params["list_price"])
+            source = "llm"
+            if rng.random() < 0.1:                               # LLM weicht vom Vorschlag ab
+                price += rng.choice((-10, 10, 20))
+            reply = f"Danke für Ihr Angebot. Ich kann Ihnen {price} € anbieten."
+            if rng.random() < 0.03:                              # LLM verstößt gegen die Regeln
+                reply = f"Es gibt weitere Interessenten – {price} € ist meine letzte Chance für Sie."
+            t += timedelta(seconds=rng.uniform(1, 4))
+            lines.append({"t": t.isoformat(), "role": "assistant", "content": reply, "source": source})
+            ledger.record("assistant", offer_in(reply))
+            offer += rng.randrange(10, 40, 5)
+        lines.append({"t": t.isoformat(), "event": "outcome", "outcome": "aborted"})
+        with (log_dir / f"fake_chat_{k:06d}.jsonl").open("w", encoding="utf-8") as f:
+            f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+
+
+def write_fake_logs(log_dir: Path, n: int, seed: int = 1, apps=("app", "chat")):
+    """n synthetische Sessions je App im Einzeldatei-Format (LOG_FORMAT=files)."""
+    log_dir.mkdir(parents=True, exist_ok=True)
+    if "app" in apps:
+        with (log_dir / "outcomes.csv").open("w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(LEGACY_OUTCOME_HEADER)
+            _fake_app(log_dir, n, seed, w)
+    if "chat" in apps:
+        _fake_chat(log_dir, n, seed)
+
+# --------------------------------- CLI ------------------------------------
+def _kv(items) -> dict:
+    out = {}
+    for kv in items:
+        k, _, v = kv.partition("=")
+        try:
+            out[k] = json.loads(v)
+        except ValueError:
+            out[k] = v
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Geloggte Sessions gegen die aktuelle Logik nachspielen")
+    ap.add_argument("--log-dir", default="logs")
+    ap.add_argument("--segment-dir", default=None, help="Segment-Log (Standard: <log-dir>/segments)")
+    ap.add_argument("--app", choices=["all", "app", "chat"], default="all")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--limit", type=int, default=0, help="nur die ersten N Sessions")
+    ap.add_argument("--engine", action="append", default=[], help="app.py: NegotiationEngine-Argument KEY=VALUE")
+    ap.add_argument("--chat-param", action="append", default=[], help="chat.py: Parameter KEY=VALUE")
+    ap.add_argument("--chat-mode", choices=["policy", "full"], default="policy")
+    ap.add_argument("--secret", action="append", default=[], help="chat.py (full): Secret KEY=VALUE")
+    ap.add_argument("--fake", type=int, default=0, help="N synthetische Sessions je App erzeugen und nachspielen")
+    ap.add_argument("--out", help="Abweichungen als JSONL schreiben")
+    ap.add_argument("--json", action="store_true", help="Bericht als JSON ausgeben")
+    a = ap.parse_args(argv)
+
+    apps = ("app", "chat") if a.app == "all" else (a.app,)
+    log_dir = Path(a.log_dir)
+    if a.fake:
+        log_dir = Path(tempfile.mkdtemp(prefix="replay_fake_"))
+        write_fake_logs(log_dir, a.fake, apps=apps)
+    t0 = time.perf_counter()
+    sessions = load_sessions(log_dir, apps, a.segment_dir)
+    if a.limit:
+        sessions = dict(sorted(sessions.items())[:a.limit])
+    load_s = time.perf_counter() - t0
+    if a.chat_mode == "full":
+        os.chdir(tempfile.mkdtemp(prefix="replay_full_"))   # Logs der nachgespielten Sessions wegwerfen
+    cfg = {"engine": _kv(a.engine), "chat_params": {**CHAT_PARAMS, **_kv(a.chat_param)},
+           "chat_mode": a.chat_mode, "secrets": _kv(a.secret)}
+    t0 = time.perf_counter()
+    results = run(sessions, cfg, a.workers)
+    report = summarize(results, time.perf_counter() - t0)
+    report.update(load_s=round(load_s, 2), workers=a.workers, log_dir=str(log_dir))
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            for r in results:
+                for d in r["divergences"]:
+                    f.write(json.dumps({"sid": r["sid"], "app": r["app"], **d}, ensure_ascii=False) + "\n")
+    if a.json:
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(f"{sum(r['sessions'] for r in report['apps'].values())} Sessions aus {log_dir} "
+              f"geladen in {report['load_s']} s, {a.workers} Worker")
+        print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# LOKALE REPARATUR regelwidriger LLM-Antworten (vor jeder Korrektur-Runde)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Satzweise Machtprimes: wo es ein neutrales Ersatzwort gibt ("Neupreis"
+#     → "Ausgangspreis"), wird ersetzt; sonst fällt der Satz weg. Nannte der
+#     entfernte Satz ein Angebot, steht an seiner Stelle ein neutraler
+#     Angebotssatz (zulässiger Preis bleibt, sonst das Gegenangebot).
+# [2] Preise unter dem Floor: auf das Gegenangebot der Runde
+#     (suggest_counter_offer) umschreiben. Zitiert der Satz das Angebot der
+#     Käufer:in (gleicher Betrag), fällt er weg statt umgeschrieben zu werden.
+#     Ein abgebrochener Stream endet mitten im Satz – der Rest fällt weg.
+# [3] Hatte die Antwort ein Angebot (oder brach der Stream ab) und ist keines
+#     mehr übrig, wird der Angebotssatz angehängt. Danach erneut violates_rules:
+#     nur eine regelkonforme, nicht leere Antwort wird zurückgegeben – sonst
+#     None, und chat.py fragt wie bisher mit Korrekturhinweis neu an.
+# ============================================================================
+
+import re
+
+from compliance import offer_in, violates_rules
+from text_analysis import AMOUNT_RE, MIN_PRICE_CONFIDENCE, analyze
+
+# Machtprime → neutrales Ersatzwort (Groß-/Kleinschreibung des Originals egal)
+SUBSTITUTES = [
+    (re.compile(r"\bneupreis\b", re.IGNORECASE), "Ausgangspreis"),
+    (re.compile(r"\bbranchenüblich", re.IGNORECASE), "üblich"),
+]
+OFFER_SENTENCE = "Ich kann Ihnen {price} € anbieten."
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# ------------------------------ [2] PREISE --------------------------------
+def _fix_prices(sentence: str, floor: int, target: int | None, user_offer: int | None) -> str | None:
+    """Beträge unter dem Floor auf target setzen; None = Satz entfernen."""
+    t = sentence.lower()
+    if len(t) != len(sentence):
+        return None   # Positionen nicht übertragbar (seltene Sonderzeichen)
+    low = [a for a in analyze(sentence).amounts if a.confidence >= MIN_PRICE_CONFIDENCE and a.value < floor]
+    for a in reversed(low):
+        if a.value == user_offer or target is None or target < floor:
+            return None
+        m = AMOUNT_RE.match(t, a.start)
+        sentence = sentence[:m.start()] + str(target) + sentence[m.end():]
+    return sentence
+
+# ------------------------------ [1]+[3] TEXT ------------------------------
+def repair_reply(text: str, params: dict, target: int | None = None, user_offer: int | None = None,
+                 partial: bool = False) -> tuple[str | None, list[str]]:
+    """
+    (reparierte antwort | None, angewandte schritte). target = Gegenangebot der Runde,
+    user_offer = letztes Angebot der Käufer:in, partial = abgebrochener Stream.
+    """
+    floor = int(params["min_price"])
+    sentences = [s for s in _SENTENCE_RE.split((text or "").strip()) if s]
+    if partial and sentences and sentences[-1][-1] not in ".!?":
+        sentences[-1] += " …"      # unvollständig: wird unten wie ein verstoßender Satz behandelt
+    steps, out, offered = [], [], False
+    for sentence in sentences:
+        for pattern, repl in SUBSTITUTES:
+            sentence, n = pattern.subn(repl, sentence)
+            if n:
+                steps.append("substitute")
+        fixed = None
+        if not analyze(sentence).primes and not sentence.endswith(" …"):
+            fixed = _fix_prices(sentence, floor, target, user_offer)
+            if fixed is not None and fixed != sentence:
+                steps.append("price")
+        if fixed is not None:
+            out.append(fixed)
+            continue
+        steps.append("drop")
+        # Enthielt der Satz ein Angebot: an seiner Stelle den neutralen Angebotssatz
+        price = offer_in(sentence.removesuffix(" …"))
+        if price is not None and not offered:
+            price = price if price >= floor and not partial else target
+            if price is not None:
+                out.append(OFFER_SENTENCE.format(price=price))
+                offered = True
+                steps.append("offer")
+    repaired = " ".join(out)
+    if (partial or offer_in(text) is not None) and offer_in(repaired) is None:
+        if target is None:
+            return None, steps
+        repaired = f"{repaired} {OFFER_SENTENCE.format(price=target)}".strip()
+        steps.append("offer")
+    if not repaired or violates_rules(repaired, params):
+        return None, steps
+    return repaired, steps
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# RECORD/REPLAY-CACHE für OpenAI-Antworten
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Schlüssel: SHA-256 über Modell, Temperatur, max_tokens und die komplette
+#     Nachrichtenliste (System-Prompt + Verlauf + Strategie) – inhaltsadressiert.
+# [2] Zwei Ebenen: In-Memory-LRU + Festplatte (eine JSON-Datei pro Antwort),
+#     Verdrängung nach Gesamtgröße (älteste Zugriffe zuerst).
+# [3] Modi: "off" (aus), "record" (lesen + schreiben), "replay" (nur lesen;
+#     fehlender Eintrag = Fehler → deterministische, sofortige Offline-Läufe).
+# [4] Wrapper für normale und gestreamte Aufrufe des LLMClient.
+# ============================================================================
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from llm_client import LLMError
+
+MODES = ("off", "record", "replay")
+
+
+class CacheMiss(LLMError):
+    """Replay-Modus: zu dieser Anfrage gibt es keine aufgezeichnete Antwort."""
+
+# ------------------------------- [1] SCHLÜSSEL ----------------------------
+def cache_key(payload: dict) -> str:
+    relevant = {
+        "model": payload.get("model"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+        "messages": payload.get("messages"),
+    }
+    blob = json.dumps(relevant, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+# ---------------------------- [2] ZWEI EBENEN -----------------------------
+class ResponseCache:
+    def __init__(self, mode="off", directory="cache/responses", mem_items=1024, max_disk_bytes=200 * 1024 * 1024):
+        if mode not in MODES:
+            raise ValueError(f"Unbekannter Cache-Modus: {mode!r} (erlaubt: {', '.join(MODES)})")
+        self.mode = mode
+        self.dir = Path(directory)
+        self.mem_items = mem_items
+        self.max_disk_bytes = max_disk_bytes
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None   # wird beim ersten Schreiben ermittelt
+        self._stats = {"hits_mem": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self._stats["hits_mem"] += 1
+                return self._mem[key]
+        path = self._path(key)
+        try:
+            content = json.loads(path.read_text(encoding="utf-8"))["content"]
+            os.utime(path)   # Zugriffszeit für die LRU-Verdrängung auf der Platte
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits_disk"] += 1
+            self._remember(key, content)
+        return content
+
+    def put(self, key: str, content: str, payload: dict | None = None):
+        if self.mode != "record":
+            return
+        entry = {"key": key, "content": content, "created": time.time()}
+        if payload is not None:
+            entry.update(model=payload.get("model"), temperature=payload.get("temperature"))
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)   # atomar: parallele Sessions sehen nie halbe Dateien
+        with self._lock:
+            self._stats["stores"] += 1
+            self._remember(key, content)
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(p.stat().st_size for p in self.dir.glob("*/*.json"))
+            else:
+                self._disk_bytes += len(data)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _remember(self, key, content):
+        self._mem[key] = content
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self):
+        """Älteste Einträge löschen, bis der Cache wieder 90 % der Maximalgröße unterschreitet."""
+        files = []
+        for p in self.dir.glob("*/*.json"):
+            try:
+                st_ = p.stat()
+            except OSError:
+                continue
+            files.append((st_.st_mtime, st_.st_size, p))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_disk_bytes * 0.9)
+        evicted = 0
+        for _, size, p in files:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._stats["evictions"] += evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["mem_items"] = len(self._mem)
+            s["disk_bytes"] = self._disk_bytes
+        s["mode"] = self.mode
+        return s
+
+# ------------------------------- [4] WRAPPER ------------------------------
+def _content(data: dict) -> str:
+    try:
+        return data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMError("Antwortformat unerwartet", body=json.dumps(data, ensure_ascii=False)[:1000])
+
+
+def cached_chat(cache: ResponseCache, client, payload: dict, timeout: float | None = None) -> str:
+    """Antworttext (nicht gestreamt) – aus dem Cache oder vom Client (timeout: Zeitbudget in s)."""
+    if not cache.enabled:
+        return _content(client.chat(payload, timeout=timeout))
+    key = cache_key(payload)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    if cache.mode == "replay":
+        raise CacheMiss(f"Replay-Modus: keine Aufzeichnung für Anfrage {key[:12]}…")
+    content = _content(client.chat(payload, timeout=timeout))
+    cache.put(key, content, payload)
+    return content
+
+
+def cached_stream(cache: ResponseCache, client, payload: dict, timeout: float | None = None):
+    """
+    Text-Deltas – bei Treffer sofort aus dem Cache (wortweise), sonst live.
+    Nur vollständig gelesene Streams werden gespeichert, abgebrochene nicht.
+    """
+    if not cache.enabled:
+        yield from client.stream(payload, timeout=timeout)
+        return
+    key = cache_key(payload)
+    hit = cache.get(key)
+    if hit is not None:
+        yield from re.findall(r"\s*\S+|\s+$", hit)
+        return
+    if cache.mode == "replay":
+        raise CacheMiss(f"Replay-Modus: keine Aufzeichnung für Anfrage {key[:12]}…")
+    parts = []
+    deltas = client.stream(payload, timeout=timeout)
+    try:
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+    finally:
+        deltas.close()
+    cache.put(key, "".join(parts), payload)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# REGELBASIERTE VERKÄUFER-ANTWORTEN (gemeinsam für app.py und chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Textbausteine: Empathie + Begründungen + Argumente + Floskeln
+#     (bisher in app.py, dort weiterhin genutzt).
+# [2] Argument-Antwort aus erkannten Argument-Flags zusammensetzen.
+# [3] Fallback für chat.py: kommt die LLM-Antwort nicht rechtzeitig (oder nicht
+#     regelkonform), antwortet der Verkäufer aus den Bausteinen mit dem Preis
+#     aus suggest_counter_offer. Es werden nur Bausteine verwendet, die die
+#     Regeln der Kontrollbedingung einhalten (keine Machtprimes, kein Preis
+#     unter der Untergrenze).
+# ============================================================================
+
+import random
+from functools import lru_cache
+
+from compliance import violates_rules
+from text_analysis import arg_flags
+
+# ---------------------------- [1] TEXTBAUSTEINE ---------------------------
+EMPATHY = [
+    "Verstehe Ihren Punkt.",
+    "Danke für die Offenheit.",
+    "Kann ich gut nachvollziehen.",
+    "Klingt nachvollziehbar.",
+    "Ich sehe, worauf Sie hinauswollen.",
+]
+JUSTIFICATIONS = [
+    "Es handelt sich um ein **neues, originalverpacktes** Gerät – ohne Nutzungsspuren.",
+    "Sie haben es **sofort** verfügbar, keine Lieferzeiten oder Unsicherheiten.",
+    "Der **Originalpreis liegt bei 1.000 €**; knapp darunter ist für Neuware fair.",
+    "Neu/OVP hält den Wiederverkaufswert deutlich besser.",
+    "Im Vergleich zu Gebrauchtware sparen Sie sich jedes Risiko.",
+]
+ARG_BANK = {
+    "student": [
+        "Gerade fürs Studium ist Verlässlichkeit wichtig – neu/OVP sorgt dafür.",
+        "Ich komme Ihnen gern ein Stück entgegen, damit es für die Uni schnell klappt.",
+    ],
+    "budget": [
+        "Ich weiß, das Budget ist im Studium oft knapp – deshalb bewege ich mich vorsichtig.",
+        "Preislich möchte ich fair bleiben, ohne es unter Wert herzugeben.",
+    ],
+    "cheaper": [
+        "Viele günstigere Angebote betreffen Aktionen, ältere Chargen oder Vorführware.",
+        "Bei vermeintlich billigeren Angeboten ist es oft nicht wirklich neu/OVP.",
+    ],
+    "condition": [
+        "Hier ist es **OVP** – das ist preislich ein Unterschied zu 'wie neu'.",
+        "Neu bedeutet: null Zyklen, keine Überraschungen – das rechtfertigt knapp unter Neupreis.",
+    ],
+    "immediacy": [
+        "Wenn es eilig ist, haben Sie es heute/zeitnah – das ist ein Vorteil.",
+        "Schnelle Verfügbarkeit spart Nerven, gerade wenn die Uni losgeht.",
+    ],
+    "cash": [
+        "Barzahlung ist möglich – das macht es unkompliziert.",
+    ],
+    "pickup": [
+        "Abholung ist gern möglich – dann können Sie die Versiegelung direkt prüfen.",
+    ],
+    "shipping": [
+        "Versand ist ordentlich verpackt möglich; Abholung ist natürlich noch bequemer.",
+    ],
+    "warranty": [
+        "Bei Neugeräten greift der Herstellersupport ab Aktivierung.",
+    ],
+}
+CLOSERS = [
+    "Wie klingt das für Sie?",
+    "Wäre das für Sie in Ordnung?",
+    "Können wir uns darauf verständigen?",
+    "Passt das für Sie?",
+]
+ARG_PRIORITY = ["student", "budget", "cheaper", "condition", "immediacy", "pickup", "cash", "shipping", "warranty"]
+
+# --------------------------- [2] ZUSAMMENSETZEN ---------------------------
+def pick(lines, k=1, rng=random):
+    """Zufällig 1..k unterschiedliche Textbausteine wählen."""
+    if k <= 0:
+        return []
+    k = min(k, len(lines))
+    return rng.sample(lines, k)
+
+def compose_argument_response(flags, rng=random, arg_bank=ARG_BANK, justifications=JUSTIFICATIONS):
+    """Passende Argumente dynamisch kombinieren (max. 2 kurze Sätze)."""
+    chosen = []
+    # priorisiere relevante Kategorien in plausibler Reihenfolge
+    for key in ARG_PRIORITY:
+        if flags.get(key, False) and arg_bank.get(key):
+            chosen.extend(pick(arg_bank[key], k=1, rng=rng))
+        if len(chosen) >= 2:
+            break
+    if not chosen:
+        chosen = pick(justifications, k=1, rng=rng)
+    return " ".join(chosen)
+
+# ------------------------------ [3] FALLBACK ------------------------------
+@lru_cache(maxsize=32)
+def _safe_banks(min_price: int):
+    """Nur Bausteine, die violates_rules bestehen (je Untergrenze einmal gefiltert)."""
+    params = {"min_price": min_price}
+    ok = lambda lines: [line for line in lines if violates_rules(line, params) is None]  # noqa: E731
+    return ok(EMPATHY), ok(JUSTIFICATIONS), {k: ok(v) for k, v in ARG_BANK.items()}, ok(CLOSERS)
+
+def round5(price) -> int:
+    return int(round(price / 5) * 5)
+
+def fallback_reply(user_text: str, params: dict, counter_offer: int, last_bot_offer: int | None = None,
+                   user_offer: int | None = None, rng=random) -> str:
+    """
+    Regelbasierte Antwort im Ton von app.py. Liegt das Nutzerangebot über der Untergrenze
+    und höchstens 10 € unter dem letzten Bot-Angebot, wird Einigung angeboten,
+    sonst das Gegenangebot counter_offer (aus suggest_counter_offer).
+    """
+    min_price = int(params["min_price"])
+    empathy, justifications, arg_bank, closers = _safe_banks(min_price)
+    args = compose_argument_response(arg_flags(user_text or ""), rng, arg_bank, justifications)
+    opener, close = rng.choice(empathy), rng.choice(closers)
+
+    if user_offer is not None and last_bot_offer is not None \
+            and user_offer >= min_price and last_bot_offer - user_offer <= 10:
+        final = max(round5(max(min(last_bot_offer, int(params["list_price"])), user_offer)), min_price)
+        offer_line = f"Wenn wir uns auf **{final} €** verständigen, passt es für mich."
+    else:
+        offer_line = f"Für ein **neues, originalverpacktes** Gerät halte ich **{counter_offer} €** für angemessen."
+
+    reply = f"{opener} {args} {offer_line} {close}"
+    if violates_rules(reply, params):
+        reply = f"{opener} {offer_line} {close}"   # Sicherheitsnetz: ohne Argument-Satz
+    return reply
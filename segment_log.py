@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# SEGMENTIERTES LOG statt einer Datei pro Session (app.py + chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Format: logs/segments/seg-000001.log, seg-000002.log, … – nur angehängt,
+#     eine JSON-Zeile pro Datensatz ({"app", "sid", "rec"}), Rotation ab
+#     LOGSEGMENT_MAX_MB. Dazu index.bin: je Datensatz 24 Byte
+#     (Hash der Session-ID, Segment, Byte-Offset, Länge).
+# [2] SegmentTarget für den Log-Writer: ein Batch = ein gesperrter Append
+#     (Sperre über Prozessgrenzen per fcntl, falls vorhanden) + Index-Einträge.
+# [3] Lesen: Index per mmap laden (sortiert, inkrementell nachgeladen) →
+#     Offsets einer Session per Binärsuche → Datensätze per mmap aus den
+#     Segmenten schneiden. Kein Verzeichnis-Scan.
+# [4] Umschalten per LOG_FORMAT=segments|files (Standard: segments);
+#     write_session_record wählt das Ziel für beide Apps.
+# [5] Werkzeug: migrate (vorhandene transcript_*.csv / <sid>.jsonl in Segmente
+#     übernehmen – je Datei ab dem vermerkten Byte-Offset, kaputte Zeilen
+#     übersprungen und gezählt –, optional löschen), reindex (Index aus den
+#     Segmenten neu aufbauen), show <sid>.
+#
+# Aufruf:  python segment_log.py migrate [logs/] [--delete]
+#          python segment_log.py reindex | show <session_id> | bench [--sessions 10000]
+# ============================================================================
+
+import csv
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: nur prozessinterne Sperre
+    fcntl = None
+
+from logwriter import get_writer
+
+LOG_DIR = Path("logs")
+SEGMENT_DIR = Path(os.environ.get("LOGSEGMENT_DIR", str(LOG_DIR / "segments")))
+SEGMENT_MAX_BYTES = int(float(os.environ.get("LOGSEGMENT_MAX_MB", "64")) * 1024 * 1024)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "segments")   # segments | files (bisher: eine Datei pro Session)
+
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("seg", "<u4"), ("off", "<u8"), ("len", "<u4")])   # 24 Byte
+
+
+def session_key(session_id: str) -> int:
+    """64-Bit-Hash der Session-ID (Kollisionen werden beim Lesen über "sid" aussortiert)."""
+    return int.from_bytes(hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _segment_path(root: Path, seg: int) -> Path:
+    return root / f"seg-{seg:06d}.log"
+
+
+def _segments(root: Path) -> list[int]:
+    return sorted(int(p.stem[4:]) for p in root.glob("seg-*.log"))
+
+# ------------------------------ [2] SCHREIBEN -----------------------------
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class _DirLock:
+    """Sperre für Append + Rotation eines Segment-Verzeichnisses (Threads und Prozesse)."""
+
+    def __init__(self, root: Path):
+        with _locks_guard:
+            self._tlock = _locks.setdefault(str(root), threading.Lock())
+        self.root = root
+
+    def __enter__(self):
+        self._tlock.acquire()
+        f = None
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            f = (self.root / ".lock").open("a")
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+        except Exception:
+            # __exit__ läuft nicht – sonst bliebe das Verzeichnis für alle Threads gesperrt
+            if f is not None:
+                f.close()
+            self._tlock.release()
+            raise
+        self._f = f
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+        self._tlock.release()
+
+
+def append_records(root: Path, items, max_bytes: int = SEGMENT_MAX_BYTES) -> int:
+    """[(session_id, zeile_als_bytes)] anhängen und indizieren; gibt die Anzahl zurück."""
+    if not items:
+        return 0
+    with _DirLock(root):
+        segs = _segments(root)
+        seg = segs[-1] if segs else 1
+        path = _segment_path(root, seg)
+        if path.exists() and path.stat().st_size >= max_bytes:
+            seg += 1
+            path = _segment_path(root, seg)
+        entries = np.empty(len(items), dtype=INDEX_DTYPE)
+        with path.open("ab") as f:
+            off = f.seek(0, os.SEEK_END)
+            for i, (sid, data) in enumerate(items):
+                entries[i] = (session_key(sid), seg, off, len(data))
+                off += len(data)
+            f.write(b"".join(data for _, data in items))
+        # Index erst nach den Daten: ein Abbruch dazwischen verliert nur Index-Einträge (→ reindex)
+        with (root / "index.bin").open("ab") as f:
+            f.write(entries.tobytes())
+    return len(items)
+
+
+class SegmentTarget:
+    """Ziel für den Log-Writer: alle Sessions einer App landen im selben Segment-Log."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or SEGMENT_DIR)
+
+    def __hash__(self):
+        return hash(("segments", str(self.root)))
+
+    def __eq__(self, other):
+        return isinstance(other, SegmentTarget) and other.root == self.root
+
+    def encode(self, item) -> tuple[str, bytes]:
+        app, session_id, record = item
+        line = json.dumps({"app": app, "sid": session_id, "rec": record}, ensure_ascii=False) + "\n"
+        return session_id, line.encode("utf-8")
+
+    def write_batch(self, lines):
+        append_records(self.root, lines)
+
+# -------------------------------- [3] LESEN -------------------------------
+class SegmentReader:
+    """Sortierter Index im Speicher; wächst das index.bin, werden nur neue Einträge nachgeladen."""
+
+    def __init__(self, root=None):
+        self.root = Path(root or SEGMENT_DIR)
+        self._lock = threading.Lock()
+        self._read_bytes = 0
+        self._ino = None
+        self._keys = np.empty(0, dtype="<u8")
+        self._entries = np.empty(0, dtype=INDEX_DTYPE)
+
+    def _refresh(self):
+        path = self.root / "index.bin"
+        if not path.exists():
+            return
+        st_ = path.stat()
+        if st_.st_ino != self._ino:   # neu aufgebaut (reindex) → komplett neu laden
+            self._ino, self._read_bytes = st_.st_ino, 0
+            self._entries, self._keys = self._entries[:0], self._keys[:0]
+        size = st_.st_size - st_.st_size % INDEX_DTYPE.itemsize   # halber Eintrag am Ende: beim nächsten Mal
+        if size <= self._read_bytes:
+            return
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            new = np.frombuffer(mm[self._read_bytes:size], dtype=INDEX_DTYPE)
+        entries = np.concatenate((self._entries, new))
+        order = np.argsort(entries["key"], kind="stable")   # stabil: Reihenfolge je Session bleibt
+        self._entries, self._keys = entries[order], entries["key"][order]
+        self._read_bytes = size
+
+    def locate(self, session_id: str) -> np.ndarray:
+        """Index-Einträge (seg, off, len) einer Session in Schreibreihenfolge."""
+        with self._lock:
+            self._refresh()
+            key = np.uint64(session_key(session_id))
+            lo, hi = np.searchsorted(self._keys, key, "left"), np.searchsorted(self._keys, key, "right")
+            return self._entries[lo:hi]
+
+    def records(self, session_id: str, app: str | None = None) -> list[dict]:
+        """Alle Datensätze ("rec") einer Session – per mmap direkt aus den Segmenten."""
+        out = []
+        hits = self.locate(session_id)
+        for seg in np.unique(hits["seg"]):
+            part = hits[hits["seg"] == seg]
+            with _segment_path(self.root, int(seg)).open("rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for off, length in zip(part["off"].tolist(), part["len"].tolist()):
+                    row = json.loads(mm[off:off + length])
+                    if row["sid"] == session_id and (app is None or row["app"] == app):
+                        out.append(row["rec"])
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            segs = _segments(self.root)
+            return {"segments": len(segs), "records": int(self._entries.size),
+                    "sessions": int(np.unique(self._keys).size),
+                    "bytes": sum(_segment_path(self.root, s).stat().st_size for s in segs)}
+
+
+def iter_records(root=None):
+    """Alle Datensätze sequenziell (app, session_id, rec) – für Auswertungen über alle Sessions."""
+    root = Path(root or SEGMENT_DIR)
+    for seg in _segments(root):
+        with _segment_path(root, seg).open("rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # wird gerade geschrieben
+                row = json.loads(line)
+                yield row["app"], row["sid"], row["rec"]
+
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def get_reader() -> SegmentReader:
+    """Ein Reader pro Server-Prozess (Index bleibt zwischen Reruns im Speicher)."""
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = SegmentReader()
+    return _reader
+
+# -------------------------------- [4] AUSWAHL -----------------------------
+def write_session_record(app: str, session_id: str, record, legacy_target, legacy_record=None):
+    """Datensatz einer Session schreiben – ins Segment-Log oder (LOG_FORMAT=files) in legacy_target."""
+    if LOG_FORMAT == "segments":
+        get_writer().write(SegmentTarget(), (app, session_id, record))
+    else:
+        get_writer().write(legacy_target, record if legacy_record is None else legacy_record)
+
+# ------------------------------- [5] WERKZEUG -----------------------------
+class _Tail:
+    """Vollständige Zeilen (bytes) einer Datei ab einem Byte-Offset; offset = Ende der zuletzt gelieferten."""
+
+    def __init__(self, path: Path, offset: int = 0):
+        self.path, self.offset = path, offset
+
+    def __iter__(self):
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return   # halb geschriebene letzte Zeile: beim nächsten Lauf
+                self.offset += len(line)
+                yield line
+
+
+def _csv_rows(path: Path, offset: int):
+    """(datensatz oder None = kaputt, offset danach) ab offset; Kopfzeile immer vom Dateianfang."""
+    head = _Tail(path)
+    fields = next(csv.reader(line.decode("utf-8", "replace") for line in head), None)
+    if fields is None:
+        return
+    tail = _Tail(path, max(offset, head.offset))
+    # Eine Nachricht mit Zeilenumbruch ist EIN Datensatz über mehrere Zeilen – Offset erst danach
+    reader = csv.reader(line.decode("utf-8", "replace") for line in tail)
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield None, tail.offset
+            continue
+        if not values:
+            continue   # Leerzeile
+        ok = len(values) == len(fields) and not any("\ufffd" in v for v in values)   # Spaltenzahl, UTF-8
+        yield (dict(zip(fields, values)) if ok else None), tail.offset
+
+
+def _jsonl_rows(path: Path, offset: int):
+    """(datensatz oder None = kaputt, offset danach) ab offset."""
+    tail = _Tail(path, offset)
+    for line in tail:
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:   # JSONDecodeError, UnicodeDecodeError
+            rec = None
+        yield (rec if isinstance(rec, dict) else None), tail.offset
+
+
+def _legacy_files(log_dir: Path):
+    """(app, session_id, pfad, zeilenleser) je Einzeldatei; zeilenleser(pfad, offset) → (datensatz, offset)."""
+    for path in sorted(log_dir.glob("transcript_*.csv")):
+        yield "app", path.stem[len("transcript_"):], path, _csv_rows
+    for path in sorted(log_dir.glob("*.jsonl")):
+        yield "chat", path.stem, path, _jsonl_rows
+
+
+def migrate(log_dir=LOG_DIR, root=None, delete=False, batch=5000) -> dict:
+    """
+    Einzeldateien in Segmente übernehmen; mit delete=True nach erfolgreicher Prüfung entfernen.
+    migrated.json vermerkt je Datei den Byte-Offset bis zu dem übernommen wurde: ein weiterer Lauf
+    hängt nur neu hinzugekommene Zeilen an (eine gewachsene Datei wird nicht doppelt übernommen).
+    Kaputte Zeilen (kein JSON, falsche Spaltenzahl, kein UTF-8) werden übersprungen und gezählt;
+    solche Dateien bleiben auch mit delete=True liegen.
+    """
+    log_dir, root = Path(log_dir), Path(root or SEGMENT_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    target = SegmentTarget(root)
+    marks_path = root / "migrated.json"
+    marks = json.loads(marks_path.read_text(encoding="utf-8")) if marks_path.exists() else {}
+    counts = {"files": 0, "skipped": 0, "records": 0, "bad": 0, "deleted": 0}
+    pending, done = [], []
+
+    def flush(force=False):
+        nonlocal pending
+        if pending and (force or len(pending) >= batch):
+            append_records(root, pending)
+            pending = []
+
+    for app, sid, path, read_rows in _legacy_files(log_dir):
+        mark = marks.get(str(path), {"offset": 0, "bad": 0})
+        if isinstance(mark, list):
+            mark = {"offset": mark[0], "bad": 0}   # altes Format [Größe, mtime]: bis Größe übernommen
+        if mark["offset"] > path.stat().st_size:
+            mark = {"offset": 0, "bad": 0}         # Datei neu angelegt/gekürzt → von vorn
+        marks[str(path)] = mark
+        if mark["offset"] == path.stat().st_size:
+            counts["skipped"] += 1
+            done.append((app, sid, [], path))
+            continue
+        rows = []
+        for rec, end in read_rows(path, mark["offset"]):
+            mark["offset"] = end
+            if rec is None:
+                mark["bad"] += 1
+                counts["bad"] += 1
+                continue
+            rows.append(rec)
+            pending.append(target.encode((app, sid, rec)))
+            flush()
+        done.append((app, sid, rows, path))
+        counts["files"] += 1
+        counts["records"] += len(rows)
+    flush(force=True)
+    tmp = marks_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(marks), encoding="utf-8")
+    os.replace(tmp, marks_path)
+    if delete:
+        reader = SegmentReader(root)
+        for app, sid, rows, path in done:
+            mark = marks[str(path)]
+            if mark["bad"] or mark["offset"] != path.stat().st_size:
+                continue                           # unvollständig übernommen: liegen lassen
+            if not rows or reader.records(sid, app)[-len(rows):] == rows:
+                path.unlink()
+                marks.pop(str(path), None)
+                counts["deleted"] += 1
+        marks_path.write_text(json.dumps(marks), encoding="utf-8")
+    return counts
+
+
+def reindex(root=None) -> dict:
+    """index.bin aus den Segmenten neu aufbauen (z. B. nach Abbruch zwischen Daten und Index)."""
+    root = Path(root or SEGMENT_DIR)
+    with _DirLock(root):
+        tmp = root / "index.bin.tmp"
+        n = 0
+        with tmp.open("wb") as out:
+            for seg in _segments(root):
+                with _segment_path(root, seg).open("rb") as f:
+                    off, entries = 0, []
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break   # unvollständige letzte Zeile
+                        entries.append((session_key(json.loads(line)["sid"]), seg, off, len(line)))
+                        off += len(line)
+                out.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+                n += len(entries)
+        os.replace(tmp, root / "index.bin")
+    return {"records": n}
+
+
+def bench(n_sessions: int):
+    """Einzeldateien vs. Segment-Log: Dateianzahl, Migration, Abruf einer Session."""
+    import random
+    import tempfile
+    import time
+    from analytics import _fake_logs
+    from storage import _read_app_transcript, _read_chat_log
+
+    base = Path(tempfile.mkdtemp(prefix="bench_segments_"))
+    log_dir, root = base / "logs", base / "segments"
+    log_dir.mkdir()
+    _fake_logs(log_dir, n_sessions)
+    n_files = sum(1 for _ in log_dir.iterdir())
+    t0 = time.perf_counter()
+    counts = migrate(log_dir, root)
+    print(f"Migration: {counts['files']:,} Dateien, {counts['records']:,} Datensätze in {time.perf_counter() - t0:.2f} s "
+          f"→ {len(_segments(root))} Segment(e) + index.bin ({(root / 'index.bin').stat().st_size / 1e6:.1f} MB)")
+
+    sids = [f"{'chat' if i % 2 else 'app'}-{i:06d}" for i in random.Random(1).sample(range(n_sessions), 500)]
+    t0 = time.perf_counter()
+    for sid in sids:   # bisher: Datei im flachen Verzeichnis suchen und parsen
+        path = next(iter(log_dir.glob(f"*{sid}.*")))
+        list(_read_chat_log(path) if path.suffix == ".jsonl" else _read_app_transcript(path))
+    t_files = (time.perf_counter() - t0) / len(sids)
+    reader = SegmentReader(root)
+    t0 = time.perf_counter()
+    reader.records(sids[0])   # Index einmal laden
+    t_load = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for sid in sids:
+        reader.records(sid)
+    t_seg = (time.perf_counter() - t0) / len(sids)
+    print(f"Abruf einer Session: Einzeldateien (glob + lesen) {t_files * 1000:.2f} ms, "
+          f"Segment-Log {t_seg * 1000:.3f} ms (Index laden einmalig {t_load * 1000:.1f} ms)")
+    print(f"Dateien im Log-Verzeichnis: {n_files:,} → {sum(1 for _ in root.iterdir())}")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "migrate":
+        args = [a for a in sys.argv[2:] if not a.startswith("--")]
+        print(json.dumps(migrate(args[0] if args else LOG_DIR, delete="--delete" in sys.argv), indent=2))
+    elif cmd == "reindex":
+        print(json.dumps(reindex(), indent=2))
+    elif cmd == "bench":
+        bench(int(sys.argv[sys.argv.index("--sessions") + 1]) if "--sessions" in sys.argv else 10_000)
+    elif cmd == "show" and len(sys.argv) > 2:
+        for rec in get_reader().records(sys.argv[2]):
+            print(json.dumps(rec, ensure_ascii=False))
+    else:
+        print("Aufruf: python segment_log.py migrate [logs/] [--delete] | reindex | show <session_id> | bench [--sessions N]")
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# SESSION-STORE: Verhandlungszustand außerhalb des Streamlit-Prozesses
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Schnittstelle: load / save / claim / delete je (app, session_id). Ein
+#     Schnappschuss ist ein JSON-fähiges Dict (ChatLog, NegotiationState,
+#     OfferLedger über to_dict/from_dict) mit fortlaufender "version".
+#     save() ist compare-and-set: nur version = gespeicherte + 1 wird
+#     geschrieben, sonst False (ein anderer Worker war schneller).
+#     claim(name) ist atomar über alle Prozesse – True genau einmal
+#     (z. B. "outcome": das Outcome schreibt nur ein Worker).
+# [2] Backends (SESSION_STORE):
+#       sqlite (Standard) – logs/sessions.db (SESSION_DB), WAL; mehrere
+#                           Worker-Prozesse auf einem Host
+#       file              – eine JSON-Datei pro Session unter SESSION_DIR
+#                           (atomar ersetzt; gemeinsames Volume für Replicas)
+#       redis://…         – jeder Redis-kompatible Server (Redis, Valkey,
+#                           KeyDB …), Paket `redis` nötig; Ablauf per TTL
+#       memory            – nur im Prozess (bisheriges Verhalten, ein Replica)
+# [3] SessionHandle: Version pro Session im Prozess. save() nach jedem Turn;
+#     is_stale(): ein anderer Worker hat inzwischen neuer gespeichert (dann
+#     übernimmt dieser Worker z. B. kein Zeitlimit mehr; schlägt save() fehl,
+#     verwirft die App ihren Stand und lädt neu). Pro Prozess gibt es je
+#     Session genau EINEN Handle: ein zweiter Tab/Reload mit derselben ?sid=
+#     bekommt ihn samt der laufenden Objekte (handle.live) statt einer Kopie.
+# [4] Auswahl per Umgebungsvariable (ein Store pro Prozess).
+#
+# Die Session-ID steht in der URL (?sid=…) – nach Neustart oder Wechsel des
+# Workers (Load Balancer) lädt app.py/chat.py den letzten Schnappschuss.
+# ============================================================================
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:   # Windows: nur prozessinterne Sperre
+    fcntl = None
+
+LOG_DIR = Path("logs")
+STORE_KIND = os.environ.get("SESSION_STORE", "sqlite")
+SESSION_DB = Path(os.environ.get("SESSION_DB", str(LOG_DIR / "sessions.db")))
+SESSION_DIR = Path(os.environ.get("SESSION_DIR", str(LOG_DIR / "sessions")))
+SESSION_TTL_S = int(os.environ.get("SESSION_TTL_S", str(7 * 24 * 3600)))   # nur redis (EXPIRE)
+
+# ---------------------------- [1] SCHNITTSTELLE ---------------------------
+class SessionStore(ABC):
+    """Basisklasse: Schnappschüsse (dict) je (app, session_id); alle Methoden synchron."""
+
+    @abstractmethod
+    def load(self, app: str, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def save(self, app: str, session_id: str, snapshot: dict) -> bool:
+        """Compare-and-set: schreibt nur, wenn snapshot["version"] = gespeicherte Version + 1."""
+
+    @abstractmethod
+    def claim(self, app: str, session_id: str, name: str) -> bool:
+        """Atomar: True nur für den ersten Aufrufer über alle Prozesse."""
+
+    @abstractmethod
+    def delete(self, app: str, session_id: str):
+        ...
+
+    def version(self, app: str, session_id: str) -> int:
+        snap = self.load(app, session_id)
+        return snap["version"] if snap else 0
+
+# ------------------------------ [2] BACKENDS ------------------------------
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self._data, self._claims = {}, set()
+        self._lock = threading.Lock()
+
+    def load(self, app, session_id):
+        with self._lock:
+            raw = self._data.get((app, session_id))
+        return json.loads(raw) if raw else None
+
+    def save(self, app, session_id, snapshot):
+        raw = json.dumps(snapshot, ensure_ascii=False)   # wie die externen Backends: keine geteilten Objekte
+        with self._lock:
+            old = self._data.get((app, session_id))
+            if (json.loads(old)["version"] if old else 0) != snapshot["version"] - 1:
+                return False
+            self._data[(app, session_id)] = raw
+        return True
+
+    def claim(self, app, session_id, name):
+        with self._lock:
+            if (app, session_id, name) in self._claims:
+                return False
+            self._claims.add((app, session_id, name))
+            return True
+
+    def delete(self, app, session_id):
+        with self._lock:
+            self._data.pop((app, session_id), None)
+
+
+SESSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app        TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    version    INTEGER NOT NULL,
+    updated    REAL NOT NULL,
+    data       TEXT NOT NULL,
+    PRIMARY KEY (app, session_id)
+);
+CREATE TABLE IF NOT EXISTS claims (
+    app        TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    PRIMARY KEY (app, session_id, name)
+);
+"""
+
+
+class SqliteSessionStore(SessionStore):
+    def __init__(self, path=SESSION_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()   # eine Verbindung pro Thread
+        with self._con() as con:
+            con.executescript(SESSION_SCHEMA)
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def load(self, app, session_id):
+        row = self._con().execute(
+            "SELECT data FROM sessions WHERE app = ? AND session_id = ?", (app, session_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, app, session_id, snapshot):
+        v, data = snapshot["version"], json.dumps(snapshot, ensure_ascii=False)
+        with self._con() as con:
+            if v == 1:   # neue Session: nur, wenn es sie noch nicht gibt
+                cur = con.execute("INSERT OR IGNORE INTO sessions (app, session_id, version, updated, data) "
+                                  "VALUES (?, ?, ?, ?, ?)", (app, session_id, v, time.time(), data))
+            else:
+                cur = con.execute("UPDATE sessions SET version = ?, updated = ?, data = ? "
+                                  "WHERE app = ? AND session_id = ? AND version = ?",
+                                  (v, time.time(), data, app, session_id, v - 1))
+        return cur.rowcount == 1
+
+    def claim(self, app, session_id, name):
+        with self._con() as con:
+            cur = con.execute("INSERT OR IGNORE INTO claims (app, session_id, name) VALUES (?, ?, ?)",
+                              (app, session_id, name))
+        return cur.rowcount == 1
+
+    def delete(self, app, session_id):
+        with self._con() as con:
+            con.execute("DELETE FROM sessions WHERE app = ? AND session_id = ?", (app, session_id))
+
+    def version(self, app, session_id):
+        row = self._con().execute(
+            "SELECT version FROM sessions WHERE app = ? AND session_id = ?", (app, session_id)).fetchone()
+        return row[0] if row else 0
+
+
+class FileSessionStore(SessionStore):
+    def __init__(self, directory=SESSION_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()    # Threads im Prozess; fcntl sperrt zwischen Prozessen
+
+    def _path(self, app, session_id, suffix=".json") -> Path:
+        if not session_id or "/" in session_id or "\\" in session_id or session_id.startswith("."):
+            raise ValueError(f"ungültige Session-ID: {session_id!r}")
+        return self.directory / app / f"{session_id}{suffix}"
+
+    def load(self, app, session_id):
+        try:
+            return json.loads(self._path(app, session_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def save(self, app, session_id, snapshot):
+        path = self._path(app, session_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self._path(app, session_id, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            old = self.load(app, session_id)
+            if (old["version"] if old else 0) != snapshot["version"] - 1:
+                return False
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+        return True
+
+    def claim(self, app, session_id, name):
+        path = self._path(app, session_id, f".{name}.claim")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def delete(self, app, session_id):
+        self._path(app, session_id).unlink(missing_ok=True)
+
+
+class RedisSessionStore(SessionStore):
+    """client: redis.Redis oder ein Objekt mit derselben get/set/delete/eval-API."""
+
+    # Compare-and-set serverseitig (atomar): Version liegt zusätzlich unter eigenem Schlüssel
+    SAVE_SCRIPT = """
+    local v = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if v ~= tonumber(ARGV[1]) - 1 then return 0 end
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[3])
+    return 1
+    """
+
+    def __init__(self, client, ttl_s=SESSION_TTL_S, prefix="negotiation"):
+        self.client, self.ttl_s, self.prefix = client, ttl_s, prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisSessionStore":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_STORE=redis://… braucht das Paket `redis` (pip install redis)") from e
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, app, session_id, part="state") -> str:
+        return f"{self.prefix}:{app}:{session_id}:{part}"
+
+    def load(self, app, session_id):
+        raw = self.client.get(self._key(app, session_id))
+        return json.loads(raw) if raw else None
+
+    def save(self, app, session_id, snapshot):
+        return bool(self.client.eval(self.SAVE_SCRIPT, 2, self._key(app, session_id),
+                                     self._key(app, session_id, "version"), snapshot["version"],
+                                     json.dumps(snapshot, ensure_ascii=False), self.ttl_s))
+
+    def claim(self, app, session_id, name):
+        return bool(self.client.set(self._key(app, session_id, f"claim:{name}"), "1", nx=True, ex=self.ttl_s))
+
+    def delete(self, app, session_id):
+        self.client.delete(self._key(app, session_id), self._key(app, session_id, "version"))
+
+    def version(self, app, session_id):
+        return int(self.client.get(self._key(app, session_id, "version")) or 0)
+
+# ---------------------------- [3] SESSION-HANDLE --------------------------
+class SessionHandle:
+    """Verbindet eine Session im Prozess mit ihrem Schnappschuss (Version zählt pro save)."""
+
+    __slots__ = ("store", "app", "sid", "version", "stale", "live", "lock", "__weakref__")
+
+    def __init__(self, store: SessionStore, app: str, sid: str, version: int = 0):
+        self.store, self.app, self.sid, self.version = store, app, sid, version
+        self.stale = False           # save() abgelehnt: anderer Worker hat weitergeschrieben
+        self.live = {}               # laufende Objekte der Session (geteilt von allen Tabs im Prozess)
+        self.lock = threading.RLock()
+
+    def save(self, state: dict) -> bool:
+        if self.stale:
+            return False
+        if not self.store.save(self.app, self.sid, {"version": self.version + 1, **state}):
+            self.stale = True
+            return False
+        self.version += 1
+        return True
+
+    def is_stale(self) -> bool:
+        """Ein anderer Worker hat nach uns gespeichert (Session dort weitergeführt)."""
+        return self.store.version(self.app, self.sid) > self.version
+
+    def claim(self, name: str) -> bool:
+        return self.store.claim(self.app, self.sid, name)
+
+
+_handles = weakref.WeakValueDictionary()   # (app, sid) → Handle der laufenden Session im Prozess
+_handles_lock = threading.Lock()
+
+
+def open_session(app: str, sid: str, new: bool = False) -> tuple[SessionHandle, dict | None]:
+    """
+    (handle, letzter Schnappschuss oder None) – beim Start einer Streamlit-Session. Läuft die Session
+    schon in diesem Prozess (zweiter Tab, Reload), kommt deren Handle zurück: handle.live ist dann
+    gefüllt und der Schnappschuss None. new=True: frisch erzeugte ID, nichts laden.
+    """
+    with _handles_lock:
+        handle = _handles.get((app, sid))
+        if handle is not None and not handle.stale:
+            return handle, None
+        store = get_session_store()
+        snap = None if new else store.load(app, sid)
+        handle = SessionHandle(store, app, sid, snap["version"] if snap else 0)
+        _handles[(app, sid)] = handle
+    return handle, snap
+
+# ------------------------------ [4] AUSWAHL -------------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Ein Session-Store pro Server-Prozess (Backend per SESSION_STORE)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if STORE_KIND.startswith(("redis://", "rediss://", "unix://")):
+                    _store = RedisSessionStore.from_url(STORE_KIND)
+                elif STORE_KIND == "file":
+                    _store = FileSessionStore()
+                elif STORE_KIND == "memory":
+                    _store = MemorySessionStore()
+                else:
+                    _store = SqliteSessionStore()
+    return _store
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# SPEICHER-BACKEND für Outcomes & Transkripte (austauschbar)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Schnittstelle: save_message / save_outcome + kleine Query-API fürs Admin
+#     (u. a. Fallback-Quote: Herkunft jeder Bot-Antwort in messages.source).
+# [2] SqliteStore (Standard): WAL-Modus, gebündelte Inserts über den Log-Writer,
+#     Indizes auf session_id, Zeitstempel und Outcome; Outcome genau einmal pro Session.
+# [3] CsvStore (Legacy): bisheriges logs/outcomes.csv-Format.
+# [4] Einmal-Import der vorhandenen CSV/JSONL-Dateien in den Store.
+# [5] Auswahl per Umgebungsvariable: NEGOTIATION_STORE=sqlite|csv, NEGOTIATION_DB=<pfad>.
+#
+# Aufruf Import:  python storage.py import logs/
+# ============================================================================
+
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+
+from logwriter import get_writer, CsvTarget
+from segment_log import get_reader, iter_records
+
+LOG_DIR = Path("logs")
+STORE_KIND = os.environ.get("NEGOTIATION_STORE", "sqlite")
+DB_PATH = Path(os.environ.get("NEGOTIATION_DB", str(LOG_DIR / "negotiation.db")))
+
+OUTCOME_FIELDS = [
+    "app", "session_id", "ts", "item", "original_price", "final_price",
+    "outcome", "ended_by", "user_turns", "duration_s",
+]
+
+# ---------------------------- [1] SCHNITTSTELLE ---------------------------
+class NegotiationStore(ABC):
+    """Basisklasse: Schreiben ist asynchron/gebündelt, Lesen synchron."""
+
+    @abstractmethod
+    def save_message(self, app: str, session_id: str, role: str, content: str,
+                     current_offer: int | None = None, ts: str | None = None, source: str | None = None):
+        ...
+
+    @abstractmethod
+    def save_outcome(self, app: str, session_id: str, outcome: str, final_price: int | None = None,
+                     ended_by: str | None = None, user_turns: int | None = None,
+                     duration_s: int | None = None, item: str | None = None,
+                     original_price: int | None = None, ts: str | None = None):
+        ...
+
+    def flush(self):
+        get_writer().flush()
+
+    @abstractmethod
+    def outcomes(self, app=None, outcome=None, since=None, until=None, limit=None) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def transcript(self, session_id: str) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def reply_sources(self, app=None) -> dict:
+        """Fallback-Quote: Bot-Antworten je Herkunft ("llm"/"fallback") + betroffene Sessions."""
+
+    def summary(self, app=None) -> dict:
+        """Kennzahlen fürs Admin: Anzahl Sessions, Deals, Ø/Min/Max-Preis."""
+        rows = self.outcomes(app=app)
+        prices = [r["final_price"] for r in rows if r["outcome"] == "deal" and r["final_price"]]
+        return {
+            "sessions": len(rows),
+            "deals": len(prices),
+            "deal_rate": round(len(prices) / len(rows), 3) if rows else 0.0,
+            "avg_price": round(sum(prices) / len(prices), 1) if prices else None,
+            "min_price": min(prices) if prices else None,
+            "max_price": max(prices) if prices else None,
+        }
+
+# ------------------------------ [2] SQLITE --------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id            INTEGER PRIMARY KEY,
+    app           TEXT NOT NULL,
+    session_id    TEXT NOT NULL,
+    ts            TEXT NOT NULL,
+    role          TEXT NOT NULL,
+    content       TEXT,
+    current_offer INTEGER,
+    source        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(ts);
+
+CREATE TABLE IF NOT EXISTS outcomes (
+    id             INTEGER PRIMARY KEY,
+    app            TEXT NOT NULL,
+    session_id     TEXT NOT NULL,
+    ts             TEXT NOT NULL,
+    item           TEXT,
+    original_price INTEGER,
+    final_price    INTEGER,
+    outcome        TEXT NOT NULL,
+    ended_by       TEXT,
+    user_turns     INTEGER,
+    duration_s     INTEGER,
+    UNIQUE(app, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_outcomes_session ON outcomes(session_id);
+CREATE INDEX IF NOT EXISTS idx_outcomes_ts ON outcomes(ts);
+CREATE INDEX IF NOT EXISTS idx_outcomes_outcome ON outcomes(outcome);
+
+CREATE TABLE IF NOT EXISTS imported_files (
+    path  TEXT PRIMARY KEY,
+    size  INTEGER,
+    mtime REAL
+);
+"""
+
+
+class _SqliteTable:
+    """Log-Writer-Ziel: sammelt Tupel und schreibt sie per executemany in EINER Transaktion."""
+
+    def __init__(self, store, sql):
+        self.store = store
+        self.sql = sql
+
+    def __hash__(self):
+        return hash(("sqlite", str(self.store.path), self.sql))
+
+    def __eq__(self, other):
+        return isinstance(other, _SqliteTable) and other.store is self.store and other.sql == self.sql
+
+    def encode(self, row):
+        return tuple(row)
+
+    def write_batch(self, rows):
+        con = self.store._con()
+        with con:
+            con.executemany(self.sql, rows)
+
+
+class SqliteStore(NegotiationStore):
+    INSERT_MESSAGE = (
+        "INSERT INTO messages (app, session_id, ts, role, content, current_offer, source) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    INSERT_OUTCOME = (
+        "INSERT OR IGNORE INTO outcomes (" + ", ".join(OUTCOME_FIELDS) + ") VALUES ("
+        + ", ".join("?" for _ in OUTCOME_FIELDS) + ")"
+    )
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()   # eine Verbindung pro Thread
+        with self._con() as con:
+            con.executescript(SCHEMA)
+            # Bestehende Datenbanken (vor Einführung der Spalte) nachrüsten
+            if "source" not in {r["name"] for r in con.execute("PRAGMA table_info(messages)")}:
+                con.execute("ALTER TABLE messages ADD COLUMN source TEXT")
+        self._messages = _SqliteTable(self, self.INSERT_MESSAGE)
+        self._outcomes = _SqliteTable(self, self.INSERT_OUTCOME)
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def save_message(self, app, session_id, role, content, current_offer=None, ts=None, source=None):
+        get_writer().write(self._messages, [
+            app, session_id, ts or datetime.utcnow().isoformat(), role, content, current_offer, source
+        ])
+
+    def save_outcome(self, app, session_id, outcome, final_price=None, ended_by=None, user_turns=None,
+                     duration_s=None, item=None, original_price=None, ts=None):
+        get_writer().write(self._outcomes, [
+            app, session_id, ts or datetime.utcnow().isoformat(), item, original_price, final_price,
+            outcome, ended_by, user_turns, duration_s,
+        ])
+
+    def outcomes(self, app=None, outcome=None, since=None, until=None, limit=None):
+        where, args = [], []
+        for col, op, val in (("app", "=", app), ("outcome", "=", outcome), ("ts", ">=", since), ("ts", "<", until)):
+            if val is not None:
+                where.append(f"{col} {op} ?")
+                args.append(val)
+        sql = "SELECT " + ", ".join(OUTCOME_FIELDS) + " FROM outcomes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(r) for r in self._con().execute(sql, args)]
+
+    def transcript(self, session_id):
+        rows = self._con().execute(
+            "SELECT app, ts, role, content, current_offer, source FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,),
+        )
+        return [dict(r) for r in rows]
+
+    def reply_sources(self, app=None):
+        sql = "SELECT source, COUNT(*) AS n, COUNT(DISTINCT session_id) AS sessions FROM messages WHERE source IS NOT NULL"
+        args = []
+        if app is not None:
+            sql += " AND app = ?"
+            args.append(app)
+        rows = self._con().execute(sql + " GROUP BY source", args).fetchall()
+        return _source_summary({r["source"]: (r["n"], r["sessions"]) for r in rows})
+
+    def summary(self, app=None):
+        sql = (
+            "SELECT COUNT(*) AS sessions, SUM(outcome = 'deal') AS deals, "
+            "AVG(CASE WHEN outcome = 'deal' THEN final_price END) AS avg_price, "
+            "MIN(CASE WHEN outcome = 'deal' THEN final_price END) AS min_price, "
+            "MAX(CASE WHEN outcome = 'deal' THEN final_price END) AS max_price FROM outcomes"
+        )
+        args = []
+        if app is not None:
+            sql += " WHERE app = ?"
+            args.append(app)
+        r = dict(self._con().execute(sql, args).fetchone())
+        r["deals"] = r["deals"] or 0
+        r["deal_rate"] = round(r["deals"] / r["sessions"], 3) if r["sessions"] else 0.0
+        r["avg_price"] = round(r["avg_price"], 1) if r["avg_price"] is not None else None
+        return r
+
+# ------------------------------ [3] CSV (LEGACY) --------------------------
+LEGACY_OUTCOME_HEADER = [
+    "timestamp_utc", "session_id", "item", "original_price_eur",
+    "final_price_eur", "ended_by", "user_turns", "duration_seconds"
+]
+
+
+class CsvStore(NegotiationStore):
+    """Bisheriges Verhalten: Outcomes in logs/outcomes.csv; Transkripte bleiben in den Rohdateien."""
+
+    def __init__(self, log_dir=LOG_DIR):
+        self.log_dir = Path(log_dir)
+
+    def save_message(self, app, session_id, role, content, current_offer=None, ts=None, source=None):
+        pass  # Rohdateien (transcript_*.csv / <sid>.jsonl) werden von den Apps selbst geschrieben
+
+    def save_outcome(self, app, session_id, outcome, final_price=None, ended_by=None, user_turns=None,
+                     duration_s=None, item=None, original_price=None, ts=None):
+        get_writer().write(CsvTarget(self.log_dir / "outcomes.csv", header=LEGACY_OUTCOME_HEADER), [
+            ts or datetime.utcnow().isoformat(), session_id, item, original_price,
+            final_price, ended_by or outcome, user_turns, duration_s,
+        ])
+
+    def outcomes(self, app=None, outcome=None, since=None, until=None, limit=None):
+        if app not in (None, "app"):
+            return []   # Legacy-Datei enthält nur app.py-Outcomes
+        rows = [r for r in _read_legacy_outcomes(self.log_dir / "outcomes.csv")
+                if (outcome is None or r["outcome"] == outcome)
+                and (since is None or r["ts"] >= since) and (until is None or r["ts"] < until)]
+        return rows[:limit] if limit else rows
+
+    def transcript(self, session_id):
+        # Segment-Log (Standard): Index-Lookup statt Datei-Suche
+        reader = get_reader()
+        recs = reader.records(session_id, "app")
+        if recs:
+            return list(_app_transcript_rows(recs))
+        recs = reader.records(session_id, "chat")
+        if recs:
+            return [m for m, _ in _chat_event_rows(session_id, recs) if m]
+        path = self.log_dir / f"transcript_{session_id}.csv"
+        if path.exists():
+            return list(_read_app_transcript(path))
+        path = self.log_dir / f"{session_id}.jsonl"
+        if path.exists():
+            return [m for m, _ in _read_chat_log(path) if m]
+        return []
+
+    def reply_sources(self, app=None):
+        if app not in (None, "chat"):
+            return _source_summary({})   # nur chat.py kennt einen Fallback
+        counts, seen = {}, set()
+        per_file = ((path.stem, _read_chat_log(path)) for path in self.log_dir.glob("*.jsonl"))
+        segments = ((sid, _chat_event_rows(sid, [rec])) for app, sid, rec in iter_records() if app == "chat")
+        for sid, rows in itertools.chain(per_file, segments):
+            for m, _ in rows:
+                if m and m["source"]:
+                    n, sessions = counts.get(m["source"], (0, 0))
+                    counts[m["source"]] = (n + 1, sessions + ((sid, m["source"]) not in seen))
+                    seen.add((sid, m["source"]))
+        return _source_summary(counts)
+
+def _source_summary(counts: dict) -> dict:
+    """{herkunft: (antworten, sessions)} → Kennzahlen fürs Admin."""
+    total = sum(n for n, _ in counts.values())
+    fallback, sessions = counts.get("fallback", (0, 0))
+    return {
+        "replies": total,
+        "by_source": {k: n for k, (n, _) in counts.items()},
+        "fallback": fallback,
+        "fallback_rate": round(fallback / total, 3) if total else 0.0,
+        "sessions_with_fallback": sessions,
+    }
+
+# ------------------------------ [4] IMPORT --------------------------------
+def _int_or_none(v):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _legacy_outcome_rows(records):
+    """Zeilen aus outcomes.csv (csv.DictReader-Einträge) → Outcome-Dicts."""
+    for r in records:
+        price = _int_or_none(r.get("final_price_eur"))
+        yield {
+            "app": "app", "session_id": r.get("session_id"), "ts": r.get("timestamp_utc"),
+            "item": r.get("item"), "original_price": _int_or_none(r.get("original_price_eur")),
+            "final_price": price, "outcome": "deal" if price else "no_deal",
+            "ended_by": r.get("ended_by"), "user_turns": _int_or_none(r.get("user_turns")),
+            "duration_s": _int_or_none(r.get("duration_seconds")),
+        }
+
+
+def _read_legacy_outcomes(path: Path):
+    if not path.exists():
+        return
+    with path.open(newline="", encoding="utf-8") as f:
+        yield from _legacy_outcome_rows(csv.DictReader(f))
+
+
+def _app_transcript_rows(records):
+    """Zeilen aus transcript_<sid>.csv (csv.DictReader-Einträge) → Message-Dicts."""
+    for r in records:
+        yield {
+            "app": "app", "session_id": r.get("session_id"), "ts": r.get("timestamp_utc"),
+            "role": r.get("role"), "content": r.get("text"),
+            "current_offer": _int_or_none(r.get("current_offer_eur")), "source": None,
+        }
+
+
+def _read_app_transcript(path: Path):
+    with path.open(newline="", encoding="utf-8") as f:
+        yield from _app_transcript_rows(csv.DictReader(f))
+
+
+def _chat_event_rows(session_id: str, events):
+    """(message, outcome)-Paare aus Log-Events von chat.py (jeweils eines davon None)."""
+    for ev in events:
+        if ev.get("event") == "outcome":
+            yield None, {
+                "app": "chat", "session_id": session_id, "ts": ev.get("t"), "outcome": ev.get("outcome"),
+                "final_price": ev.get("final_price"),
+            }
+        elif "role" in ev:
+            yield {
+                "app": "chat", "session_id": session_id, "ts": ev.get("t"), "role": ev["role"],
+                "content": ev.get("content"), "current_offer": None, "source": ev.get("source"),
+            }, None
+
+
+def _chat_log_rows(session_id: str, lines):
+    """Wie _chat_event_rows, aber aus JSONL-Zeilen (unlesbare Zeilen werden übersprungen)."""
+    def events():
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+    yield from _chat_event_rows(session_id, events())
+
+
+def _read_chat_log(path: Path):
+    """(message, outcome)-Paare aus einer chat.py-JSONL-Datei (jeweils eines davon None)."""
+    with path.open(encoding="utf-8") as f:
+        yield from _chat_log_rows(path.stem, f)
+
+
+def import_legacy(store: SqliteStore, log_dir=LOG_DIR) -> dict:
+    """Vorhandene Rohdateien einmalig indizieren; bereits importierte (gleiche Größe/mtime) werden übersprungen."""
+    log_dir = Path(log_dir)
+    con = store._con()
+    done = {r["path"]: (r["size"], r["mtime"]) for r in con.execute("SELECT * FROM imported_files")}
+    counts = {"files": 0, "skipped": 0, "messages": 0, "outcomes": 0}
+
+    files = sorted(log_dir.glob("transcript_*.csv")) + sorted(log_dir.glob("*.jsonl"))
+    files += [log_dir / "outcomes.csv"] if (log_dir / "outcomes.csv").exists() else []
+    for path in files:
+        st_ = path.stat()
+        if done.get(str(path)) == (st_.st_size, st_.st_mtime):
+            counts["skipped"] += 1
+            continue
+        messages, outcomes = [], []
+        if path.name == "outcomes.csv":
+            outcomes = list(_read_legacy_outcomes(path))
+        elif path.suffix == ".csv":
+            messages = list(_read_app_transcript(path))
+        else:
+            for m, o in _read_chat_log(path):
+                (messages.append(m) if m else outcomes.append(o))
+        with con:
+            # Bei geänderter Datei: alte Zeilen dieser Session ersetzen (Import bleibt idempotent)
+            sids = {m["session_id"] for m in messages}
+            con.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in sids])
+            con.executemany(SqliteStore.INSERT_MESSAGE, [
+                (m["app"], m["session_id"], m["ts"], m["role"], m["content"], m["current_offer"], m["source"])
+                for m in messages
+            ])
+            con.executemany(SqliteStore.INSERT_OUTCOME, [
+                tuple(o.get(k) for k in OUTCOME_FIELDS) for o in outcomes
+            ])
+            con.execute("INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?)",
+                        (str(path), st_.st_size, st_.st_mtime))
+        counts["files"] += 1
+        counts["messages"] += len(messages)
+        counts["outcomes"] += len(outcomes)
+    return counts
+
+# ------------------------------ [5] AUSWAHL -------------------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> NegotiationStore:
+    """Ein Store pro Server-Prozess (Backend per NEGOTIATION_STORE)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CsvStore() if STORE_KIND == "csv" else SqliteStore()
+    return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "import":
+        src = sys.argv[2] if len(sys.argv) > 2 else str(LOG_DIR)
+        print(json.dumps(import_legacy(SqliteStore(), src), indent=2))
+    else:
+        print("Aufruf: python storage.py import [logs/]")
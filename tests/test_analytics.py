@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Dashboard im Standard-Setup (SQLite-Store + Segment-Log): app.py-Outcomes müssen ankommen.
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+SCRIPT = """
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+at.chat_input[0].set_value("Ich biete 950 €").run()
+at.button[0].click().run()          # Deal
+from logwriter import get_writer
+get_writer().flush()
+import analytics, json
+analytics.ingest()
+print(json.dumps(analytics.dashboard(app="app")))
+"""
+
+
+def test_app_deals_reach_dashboard_in_default_setup(tmp_path):
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("NEGOTIATION_STORE", "NEGOTIATION_DB", "LOG_FORMAT", "LOGSEGMENT_DIR", "COLUMNAR_DIR")}
+    env["PYTHONPATH"] = str(ROOT)
+    out = subprocess.run([sys.executable, "-c", SCRIPT.format(app=str(ROOT / "app.py"))], cwd=tmp_path,
+                         env=env, capture_output=True, text=True, timeout=120, check=True)
+    dash = json.loads(out.stdout.strip().splitlines()[-1])
+    assert dash["deals"] > 0
+    assert dash["price"]["min"] > 0
+    assert dash["turns_hist"]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Parallele Kandidaten: übrige Anfragen werden abgebrochen, Usage kommt aus den Antworten.
+import threading
+import time
+
+from candidates import first_compliant
+from llm_client import LLMClient
+from mock_openai import start_server
+from rate_limiter import AsyncLimiter, LimitedClient
+from response_cache import ResponseCache
+
+PARAMS = {"list_price": 1000, "min_price": 750}
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "Ich biete 700 €."}], "max_tokens": 80}
+
+
+class _OneFast:
+    """Erste Anfrage an den schnellen Server, alle weiteren an den langsamen; merkt sich die Timeouts."""
+
+    recent = None
+
+    def __init__(self, fast, slow):
+        self.fast, self.slow, self.timeouts = fast, slow, []
+        self._lock = threading.Lock()
+
+    def chat(self, payload, timeout=None, cancel=None):
+        with self._lock:
+            self.timeouts.append(timeout)
+            client = self.fast if len(self.timeouts) == 1 else self.slow
+        return client.chat(payload, timeout=timeout, cancel=cancel)
+
+
+def _in_flight(limiter, settle_s):
+    end = time.monotonic() + settle_s
+    while limiter.stats()["in_flight"] and time.monotonic() < end:
+        time.sleep(0.01)
+    return limiter.stats()["in_flight"]
+
+
+def test_parallel_cancels_losers_and_reports_usage():
+    _, fast_url = start_server()
+    _, slow_url = start_server(latency_s=5.0)
+    slow = LLMClient(slow_url, "x")
+    client = _OneFast(LLMClient(fast_url, "x"), slow)
+    limited = LimitedClient(client, AsyncLimiter(max_concurrency=4))
+    reply, info = first_compliant(limited, PAYLOAD, PARAMS, 3, mode="parallel", timeout=10.0)
+    assert reply and info["compliant"]
+    assert info["usage"]["calls"] == info["generated"] == 1 and info["usage"]["prompt_tokens"] > 0
+    assert all(t is not None and t <= 10.0 for t in client.timeouts)   # Restbudget je Anfrage
+    # Die beiden langsamen Anfragen halten ihre Slots nicht bis zur Antwort (5 s) fest
+    assert _in_flight(limited.limiter, settle_s=1.0) == 0
+    assert slow.stats()["errors"] == 0                                    # Abbruch ist kein API-Fehler
+
+
+class _BelowFloor:
+    """Liefert nur Kandidaten unter dem Mindestpreis; zählt die Aufrufe."""
+
+    recent = None
+    calls = 0
+
+    def chat(self, payload, timeout=None, cancel=None):
+        self.calls += 1
+        return {"choices": [{"message": {"content": "Für 600 € gehört es Ihnen."}}] * payload.get("n", 1)}
+
+
+def test_cached_non_compliant_reply_keeps_reason(tmp_path):
+    cache, client = ResponseCache("record", directory=tmp_path / "responses"), _BelowFloor()
+    reply, first = first_compliant(client, PAYLOAD, PARAMS, 2, cache=cache)
+    again, info = first_compliant(client, PAYLOAD, PARAMS, 2, cache=cache)
+    assert client.calls == 1 and again == reply and info["cached"]
+    assert not info["compliant"] and info["needed"] is None
+    assert info["rejected"] == first["rejected"][:1] and info["rejected"][0]   # chat.py repariert mit rejected[0]
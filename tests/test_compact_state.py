@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# ChatLog: Auslagern/Nachladen, auch bei zwei Objekten mit derselben Session-ID (zwei Tabs).
+import gc
+
+import pytest
+
+import compact_state
+from compact_state import ChatLog
+
+
+def _log(sid, texts):
+    log = ChatLog(sid)
+    for i, text in enumerate(texts):
+        log.append("user" if i % 2 else "bot", text, 900 + i)
+    return log
+
+
+def test_spill_and_rehydrate(tmp_path, monkeypatch):
+    monkeypatch.setattr(compact_state, "SESSION_SPILL_DIR", tmp_path)
+    log = _log("s1", ["Hallo 😊", "Ich biete 850 €", "Gegenangebot 950 €"])
+    before = list(log)
+    assert log.spill() > 0 and log.spilled
+    assert list(log) == before and log.offer(2) == 902
+    assert not log.spilled and not list(tmp_path.iterdir())
+
+
+def test_same_sid_does_not_share_spill_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(compact_state, "SESSION_SPILL_DIR", tmp_path)
+    a, b = _log("dup", ["A1", "A2"]), _log("dup", ["B1", "B2", "B3"])
+    a.spill(), b.spill()
+    assert len(list(tmp_path.iterdir())) == 2
+    del a
+    gc.collect()                                   # Finalizer von a darf b's Datei nicht löschen
+    assert [t for _, t in b] == ["B1", "B2", "B3"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_offer_out_of_int32_range_keeps_log_consistent():
+    log = _log("big", ["Hallo"])
+    log.append("user", "Ich biete 99999999999 €", 99999999999)
+    log.append("bot", "Das ist zu viel.", 950)
+    assert len(log) == 3 and log.offer(1) is None and log.offer(2) == 950
+    assert [m[2] for m in log.to_dict()["messages"]] == [900, None, 950]
+    with pytest.raises(ValueError):
+        log.append("unbekannt", "x", 900)                      # ungültige Rolle: nichts angehängt
+    assert len(log) == 3 and ChatLog.from_dict("big", log.to_dict())[:] == log[:]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# StreamGuard gegen einen echten Token-Stream vom Mock-Server (mock_openai.py); Regelgründe.
+import time
+
+from compliance import StreamGuard, rule_key, violates_rules
+from llm_client import LLMClient
+from mock_openai import make_reply, start_server
+
+PARAMS = {"list_price": 1000, "min_price": 750}
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "Ich biete 700 €."}], "max_tokens": 80}
+
+
+def _guarded(client, guard):
+    """Wie chat.py: Deltas durchreichen, bis der Guard anschlägt – dann den Stream schließen."""
+    deltas = client.stream(PAYLOAD)
+    try:
+        for d in deltas:
+            if guard.feed(d):
+                return True
+        return False
+    finally:
+        deltas.close()
+
+
+def test_stream_guard_stops_mid_stream_on_violation():
+    srv, url = start_server(violation_rate=1.0, token_delay_s=0.05)
+    guard, t0 = StreamGuard(PARAMS), time.perf_counter()
+    assert _guarded(LLMClient(url, "x"), guard)
+    elapsed = time.perf_counter() - t0
+    full = make_reply(PAYLOAD["messages"], violation_rate=1.0)
+    srv.shutdown()
+    assert "Neupreis" in guard.buffer and guard.buffer != full and full.startswith(guard.buffer)
+    assert guard.reason
+    assert elapsed < 0.05 * len(full.split()) * 0.8      # nicht bis zum Ende gelesen
+
+
+def test_stream_guard_passes_compliant_stream():
+    srv, url = start_server(violation_rate=0.0)
+    guard = StreamGuard(PARAMS)
+    assert not _guarded(LLMClient(url, "x"), guard)
+    srv.shutdown()
+    assert guard.buffer == make_reply(PAYLOAD["messages"]) and guard.finish() is None
+
+
+def test_disclosure_has_its_own_reason():
+    assert rule_key(violates_rules("Unter 800 € ist meine Schmerzgrenze.", PARAMS)) == "disclosure"
+    assert rule_key(violates_rules("Das ist der Neupreis, 900 €.", PARAMS)) == "power_frame"
+    assert rule_key(violates_rules("Für 700 € gehört es Ihnen.", PARAMS)) == "below_floor"
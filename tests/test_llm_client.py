@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# LLMClient gegen den lokalen Mock-Server (mock_openai.py).
+import pytest
+import requests
+
+from llm_client import LLMClient, LLMTimeout, iter_sse_deltas
+from mock_openai import make_reply, start_server
+
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "Ich biete 700 €."}], "max_tokens": 80}
+
+
+def test_stream_read_timeout_is_llm_timeout():
+    # Kopfzeilen kommen sofort, das erste Token erst nach 1 s → Lese-Timeout in iter_lines
+    srv, url = start_server(latency_s=1.0)
+    client = LLMClient(url, "x", read_timeout=0.2)
+    with pytest.raises(LLMTimeout):
+        list(client.stream(PAYLOAD))
+    srv.shutdown()
+
+
+def test_iter_sse_deltas_against_mock_stream():
+    srv, url = start_server()
+    body = dict(PAYLOAD, stream=True, stream_options={"include_usage": True})
+    r = requests.post(f"{url}/chat/completions", json=body, stream=True, timeout=5)
+    usage = {}
+    deltas = list(iter_sse_deltas(r.iter_lines(), usage))
+    r.close()
+    srv.shutdown()
+    assert len(deltas) > 1 and "".join(deltas) == make_reply(PAYLOAD["messages"])
+    assert usage["completion_tokens"] == len(deltas) and usage["prompt_tokens"] > 0
+
+
+def test_iter_sse_deltas_skips_noise_and_stops_at_done():
+    lines = [b"", b": keep-alive", b"event: ping", b"data: {kaputt",
+             b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+             'data: {"choices": [{"delta": {"content": "Hallo"}}]}',
+             b'data: {"choices": [{"delta": {"content": " Welt"}}]}',
+             b"data: [DONE]",
+             b'data: {"choices": [{"delta": {"content": "danach"}}]}']
+    assert list(iter_sse_deltas(lines)) == ["Hallo", " Welt"]
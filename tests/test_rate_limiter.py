@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# LimitedClient.stream: ein Zeitbudget über alle Versuche (wie chat), Slot wird immer freigegeben – auch beim Timeout in acquire.
+import concurrent.futures
+import time
+
+import pytest
+
+import rate_limiter
+
+from llm_client import LLMError, LLMTimeout
+from rate_limiter import AsyncLimiter, LimitedClient
+
+
+class _RateLimitedOnce:
+    """Erster Stream: 429 nach kurzer Wartezeit; danach zwei Deltas. Merkt sich die Timeouts."""
+
+    recent = None
+
+    def __init__(self, delay_s=0.2):
+        self.delay_s, self.timeouts = delay_s, []
+
+    def stream(self, payload, timeout=None):
+        self.timeouts.append(timeout)
+        return self._deltas(len(self.timeouts))
+
+    def _deltas(self, n):
+        time.sleep(self.delay_s)
+        if n == 1:
+            raise LLMError("rate limited", status=429, retry_after=0.01)
+        yield "Hallo "
+        yield "Welt"
+
+
+def _in_flight(limiter, settle_s=1.0):
+    """release() läuft im Loop-Thread des Limiters – kurz warten, bis er fertig ist."""
+    end = time.monotonic() + settle_s
+    while limiter.stats()["in_flight"] and time.monotonic() < end:
+        time.sleep(0.01)
+    return limiter.stats()["in_flight"]
+
+
+def _payload():
+    return {"model": "m", "messages": [{"role": "user", "content": "Ich biete 700 €."}], "max_tokens": 50}
+
+
+def test_stream_retry_uses_remaining_budget():
+    client = _RateLimitedOnce()
+    limited = LimitedClient(client, AsyncLimiter(max_concurrency=1))
+    assert "".join(limited.stream(_payload(), timeout=5.0)) == "Hallo Welt"
+    first, second = client.timeouts
+    assert first <= 5.0 and second <= first - 0.2          # Restbudget, nicht erneut die vollen 5 s
+    assert _in_flight(limited.limiter) == 0
+
+
+def test_stream_budget_spent_raises_timeout_and_frees_slot():
+    limited = LimitedClient(_RateLimitedOnce(delay_s=0.3), AsyncLimiter(max_concurrency=1))
+    with pytest.raises(LLMTimeout):
+        list(limited.stream(_payload(), timeout=0.2))
+    assert _in_flight(limited.limiter) == 0
+
+
+def test_acquire_timeout_racing_grant_frees_slot(monkeypatch):
+    # Zulassung und Timeout gleichzeitig: result() läuft ab, obwohl der Slot schon vergeben ist
+    limiter = AsyncLimiter(max_concurrency=1)
+    submit = rate_limiter.asyncio.run_coroutine_threadsafe
+
+    def expired(timeout=None):
+        raise concurrent.futures.TimeoutError
+
+    def granted_late(coro, loop):
+        fut = submit(coro, loop)
+        fut.result(5.0)
+        monkeypatch.setattr(fut, "result", expired)
+        return fut
+
+    monkeypatch.setattr(rate_limiter.asyncio, "run_coroutine_threadsafe", granted_late)
+    with pytest.raises(LLMTimeout):
+        limiter.acquire(10, timeout=0.1)
+    assert _in_flight(limiter) == 0
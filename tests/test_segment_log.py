@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# segment_log.migrate: kaputte Zeilen überspringen, gewachsene Dateien nur ab dem vermerkten Offset übernehmen.
+import csv
+import json
+
+import pytest
+
+from segment_log import SegmentReader, append_records, migrate
+
+HEADER = ["timestamp_utc", "session_id", "role", "text", "current_offer_eur"]
+
+
+def _jsonl(path, recs):
+    with path.open("a", encoding="utf-8") as f:
+        for rec in recs:
+            f.write((rec if isinstance(rec, str) else json.dumps(rec)) + "\n")
+
+
+def _raw(path, data: bytes):
+    with path.open("ab") as f:
+        f.write(data)
+
+
+def _csv(path, rows):
+    new = not path.exists()
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(HEADER)
+        w.writerows(rows)
+
+
+def test_bad_lines_are_skipped_and_counted(tmp_path):
+    logs, root = tmp_path / "logs", tmp_path / "segments"
+    logs.mkdir()
+    _jsonl(logs / "c1.jsonl", [{"role": "user", "content": "700"}, '{"role": "assi', "42",
+                               {"role": "assistant", "content": "880"}])
+    _raw(logs / "c1.jsonl", b'{"role": "user", "content": "\xff"}\n')
+    _csv(logs / "transcript_a1.csv", [["t1", "a1", "user", "Ich biete\n800 €", 1000], ["t2", "a1", "bot"]])
+    counts = migrate(logs, root)
+    assert (counts["records"], counts["bad"]) == (3, 4)
+    reader = SegmentReader(root)
+    assert [r["content"] for r in reader.records("c1", "chat")] == ["700", "880"]
+    assert reader.records("a1", "app")[0]["text"] == "Ich biete\n800 €"
+    assert migrate(logs, root, delete=True)["deleted"] == 0      # Dateien mit kaputten Zeilen bleiben liegen
+
+
+def test_grown_file_is_resumed_not_duplicated(tmp_path):
+    logs, root = tmp_path / "logs", tmp_path / "segments"
+    logs.mkdir()
+    _jsonl(logs / "c1.jsonl", [{"n": 1}, {"n": 2}])
+    _raw(logs / "c1.jsonl", b'{"n": 3')               # halb geschrieben
+    _csv(logs / "transcript_a1.csv", [["t1", "a1", "user", "Zeile\nzwei", 900]])
+    assert migrate(logs, root)["records"] == 3
+    _raw(logs / "c1.jsonl", b'}\n{"n": 4}\n')
+    _csv(logs / "transcript_a1.csv", [["t2", "a1", "bot", "Gegenangebot", 950]])
+    counts = migrate(logs, root)
+    assert (counts["records"], counts["bad"]) == (3, 0)
+    assert migrate(logs, root)["skipped"] == 2
+    reader = SegmentReader(root)
+    assert [r["n"] for r in reader.records("c1", "chat")] == [1, 2, 3, 4]
+    assert [r["text"] for r in reader.records("a1", "app")] == ["Zeile\nzwei", "Gegenangebot"]
+    assert migrate(logs, root, delete=True)["deleted"] == 2 and not list(logs.iterdir())
+
+
+def test_failed_lock_file_releases_thread_lock(tmp_path):
+    blocked = tmp_path / "file"
+    blocked.write_text("kein Verzeichnis")
+    for _ in range(2):                                 # zweiter Versuch darf nicht hängen bleiben
+        with pytest.raises(OSError):
+            append_records(blocked / "segments", [("s1", b'{"n": 1}')])
+    assert append_records(tmp_path / "segments", [("s1", b'{"n": 1}')]) == 1
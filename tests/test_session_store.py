@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Session-Store: compare-and-set auf "version" und genau ein Handle je Session im Prozess.
+import pytest
+
+import session_store
+from session_store import FileSessionStore, MemorySessionStore, SessionHandle, SqliteSessionStore, open_session
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    if request.param == "sqlite":
+        return SqliteSessionStore(tmp_path / "sessions.db")
+    return FileSessionStore(tmp_path / "sessions")
+
+
+def test_save_is_compare_and_set(store):
+    assert store.save("app", "s1", {"version": 1, "n": 1})
+    assert not store.save("app", "s1", {"version": 1, "n": 99})    # zweiter Erstbesitzer
+    assert store.save("app", "s1", {"version": 2, "n": 2})
+    assert not store.save("app", "s1", {"version": 2, "n": 99})    # veralteter Stand
+    assert not store.save("app", "s1", {"version": 4, "n": 99})    # Lücke
+    assert store.load("app", "s1") == {"version": 2, "n": 2}
+
+
+def test_stale_handle_stops_writing(store):
+    a, b = SessionHandle(store, "app", "s1"), SessionHandle(store, "app", "s1")
+    assert a.save({"n": 1}) and not b.save({"n": 2})
+    assert b.stale and not b.save({"n": 3})
+    other = SessionHandle(store, "app", "s1", version=1)           # anderer Worker übernimmt
+    assert other.save({"n": 4}) and a.is_stale() and not a.save({"n": 5})
+    assert store.load("app", "s1") == {"version": 2, "n": 4}
+
+
+def test_open_session_reuses_live_handle(monkeypatch):
+    monkeypatch.setattr(session_store, "_store", MemorySessionStore())
+    first, _ = open_session("app", "s1", new=True)
+    first.live["chat"] = chat = []
+    again, snap = open_session("app", "s1")                        # zweiter Tab / Reload
+    assert again is first and snap is None and again.live["chat"] is chat
+    first.stale = True
+    fresh, _ = open_session("app", "s1")                           # verworfen → neu laden
+    assert fresh is not first and not fresh.live
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Preiserkennung (text_analysis.analyze) gegen ein Korpus mit erwarteten Werten.
+import pytest
+
+from bench_price_extraction import corpus_check
+from text_analysis import analyze
+
+# (Nachricht, erkannte Preise) – Nutzer- und Verkäufer-Nachrichten, wie sie in beiden Apps vorkommen
+CORPUS = [
+    # Angebote
+    ("Ich biete 850 €", (850,)),
+    ("850€?", (850,)),
+    ("Wie wäre es mit 900 Euro", (900,)),
+    ("EUR 875 und wir sind im Geschäft", (875,)),
+    ("1.000 € ist mir zu viel, 800 ginge", (1000, 800)),
+    ("Für 950,- nehme ich es", (950,)),
+    ("Ich zahle 899,99", (900,)),
+    ("Von 900 gehe ich auf 870", (900, 870)),
+    ("12\u00a0500 ist natürlich Quatsch, ich meinte 925", (12500, 925)),
+    ("Ich biete 1\u202f000 €", (1000,)),
+    ("Runde 3 800 €", (800,)),              # normales Leerzeichen ist kein Tausendertrenner
+    # Jahreszahl-artige Angebote (1990–2039) mit Preiskontext
+    ("Für 2000 nehme ich es", (2000,)),
+    ("2000 nehme ich", (2000,)),
+    ("Ich biete 1995", (1995,)),
+    ("Wie wäre es mit 2000?", (2000,)),
+    ("Mehr als 2030 zahle ich nicht", (2030,)),
+    # Mengen, Modelle, Daten – keine Preise
+    ("Das iPad hat 256 GB und 11 Zoll", ()),
+    ("Es gibt noch 12 Monate Garantie", ()),
+    ("Das iPad 10 ist neu", ()),
+    ("Sie bekommen die 10. Generation", ()),
+    ("Abholung heute bis 18:30 Uhr", ()),
+    ("Gekauft am 12.03.2024", ()),
+    ("iPadOS 17.2 ist installiert", ()),
+    ("Das sind rund 10 % weniger", ()),
+    ("Für 2 Stück hätte ich keinen Rabatt", ()),
+    # Jahreszahlen ohne Preiskontext
+    ("Das Gerät ist von 2024 und neu", ()),
+    ("Garantie bis 2025", ()),
+    ("Im März 2023 gekauft", ()),
+    ("Seit 2021 studiere ich", ()),
+    ("Baujahr 2023", ()),
+    ("2024 und neu", ()),
+    ("Mein altes iPad von 2019 ist kaputt, ich biete 800", (800,)),
+]
+
+
+@pytest.mark.parametrize("text, prices", CORPUS, ids=[t for t, _ in CORPUS])
+def test_corpus_prices(text, prices):
+    a = analyze(text)
+    assert a.prices == prices
+    assert a.first_price == (prices[0] if prices else None)
+
+
+def test_floor_corpus_without_false_alarms():
+    # Korpus aus bench_price_extraction.py: Floor-Regel (compliance) mit der neuen Erkennung
+    c = corpus_check()
+    assert c["new"]["false_positive"] == 0 and c["new"]["missed"] == 0
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# LEXIKALISCHE ANALYSE in EINEM Durchlauf (gemeinsam für app.py und chat.py)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Vokabular: Argument-Schlagworte, Deal-Schlagworte, Machtprimes, Preise.
+# [2] Ein Aho–Corasick-Automat (vorab als vollständige Übergangstabelle gebaut)
+#     läuft EINMAL Zeichen für Zeichen über die Nachricht und meldet jedes
+#     Schlagwort und jeden Machtprime-Anfang – auch überlappende Treffer
+#     (z. B. "knapp" als Budget-Argument UND "knappheit" als Machtprime).
+#     Nur an diesen (seltenen) Stellen wird das Prime-Muster exakt geprüft.
+# [3] Beträge mit Einheiten-/Kontextprüfung: "256 GB", "2 Jahre", "10 %",
+#     "iPad 10", "3. Semester", Jahreszahlen ("von 2024"), Datum/Uhrzeit sind
+#     KEINE Preise; "1.000 €", "950,-", "1 000", "für 2000" schon. Jeder
+#     Betrag mit Konfidenz (€/Euro direkt daneben = sicher, Preiswort davor =
+#     wahrscheinlich, nackte Zahl = plausibel); als Preis zählt ab
+#     MIN_PRICE_CONFIDENCE – für beide Apps.
+# [4] analyze(text): Beträge, Preise, erster Preis, Argument-Flags,
+#     Deal-Absicht und Machtprime-Treffer – pro Nachricht gecacht.
+#
+# Benchmark gegen die bisherigen Einzelfunktionen:  python bench_text_analysis.py
+# Korpus-Prüfung der Preiserkennung:               python bench_price_extraction.py
+# ============================================================================
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple
+
+# ------------------------------ [1] VOKABULAR -----------------------------
+# Argument-Kategorien (Teilstring-Suche, wie bisher in app.py _classify_args)
+ARG_KEYWORDS = {
+    "student": ["student", "studium", "uni"],
+    "budget": ["budget", "teuer", "kann mir nicht leisten", "knapp", "pleite"],
+    "cheaper": ["günstiger", "billiger", "angebot", "preisvergleich", "idealo", "woanders"],
+    "condition": ["gebraucht", "kratzer", "zustand"],
+    "immediacy": ["dringend", "eilig", "heute", "sofort", "morgen"],
+    "cash": ["bar", "cash"],
+    "pickup": ["abholen", "abholung"],
+    "shipping": ["versand", "schicken"],
+    "warranty": ["garantie", "gewährleistung", "rechnung", "applecare"],
+}
+ARG_KEYS = tuple(ARG_KEYWORDS)
+
+# Expliziter Abschluss (wie bisher in app.py _detect_deal)
+DEAL_KEYWORDS = ["deal", "einverstanden", "akzeptiere", "passt", "nehme ich", "agree", "accepted"]
+
+# Machtprimes (Kontrollbedingung chat.py) – Suche auf kleingeschriebenem Text
+BAD_PATTERNS = [
+    r"\balternative(n)?\b", r"\bweitere(n)?\s+interessent(en|in)\b", r"\bknapp(e|heit)\b",
+    r"\bdeadline\b", r"\bletzte chance\b", r"\bbranchen(üblich|standard)\b",
+    r"\bmarktpreis\b", r"\bneupreis\b", r"\bschmerzgrenze\b", r"\buntergrenze\b", r"darunter\s+gehe\s+ich\s+nicht", r"nicht\s+unter\s*\d+", r"mindestens\s*\d+", r"\bsonst geht es\b"
+]
+
+# Beträge: Zahl mit Tausenderpunkt (1.000) bzw. geschütztem/schmalem Leerzeichen (1\u00a0000, 12\u202f500) oder
+# Ziffernfolge, optional ,00 / ,- – nicht innerhalb von Wörtern (M2, A17), Datums- oder Versionsangaben
+# (12.03.2024, 17.2.1). Ein normales Leerzeichen trennt Zahlen: "Runde 3 800 €" = 3 und 800, nicht 3800.
+AMOUNT_RE = re.compile(r"(?<![\w.,:])((?:\d{1,3}(?:\.\d{3})+|\d{1,3}(?:[\u00a0\u202f]\d{3})+)(?!\d)|\d+)(?:[.,](\d{1,2}(?!\d)|-{1,2}))?")
+CURRENCY_BEFORE_RE = re.compile(r"(?:€|\beur|\beuro)\s*$")
+CURRENCY_AFTER_RE = re.compile(r"\s*(?:€|eur\b|euro\b)")
+# Mengen/Einheiten direkt hinter der Zahl → kein Preis
+UNIT_RE = re.compile(
+    r"\s*(?:%|prozent\b|[gtmk]b\b|gigabyte\b|terabyte\b|zoll\b|\"|inch\b|mah\b|hz\b|mp\b|mm\b|cm\b|kg\b|g\b|"
+    r"w\b|watt\b|jahre?n?\b|monate?n?\b|wochen?\b|tagen?\b|tage\b|stunden?\b|std\b|min\b|minuten\b|"
+    r"sekunden\b|sek\b|uhr\b|stück\b|stk\b|mal\b|x\b|runden?\b|[.:]\d)"
+)
+# Ordinalzahl ("10. Generation", "3. Semester") → kein Preis
+ORDINAL_RE = re.compile(r"\.\s*(?:generation|gen|runde|semester|stock|platz|klasse|auflage|jahrhundert)\b")
+# Wörter direkt vor der Zahl: Modell/Version/Jahr → kein Preis; Preiswort → wahrscheinlich Preis
+MODEL_WORDS = frozenset([
+    "ipad", "iphone", "pro", "air", "mini", "ios", "ipados", "gen", "generation", "modell", "version",
+    "nr", "nummer", "baujahr", "jahrgang", "seit", "jahr", "speicher", "kapazität", "m", "a", "chip",
+])
+PRICE_WORDS = frozenset([
+    "biete", "bieten", "anbieten", "zahle", "zahlen", "preis", "für", "bei", "auf", "angebot", "kostet",
+    "gebe", "geben", "einigen", "verständigen", "komme", "gehe", "um", "mit", "von", "bis", "nur", "maximal",
+    "höchstens", "mindestens", "unter", "über", "statt", "nehme", "budget",
+])
+_WORD_RE = re.compile(r"[a-zäöüß]+")
+_NEXT_WORD_RE = re.compile(r"\s*([a-zäöüß]+)")
+# Jahreszahl-artige Beträge (1990–2039): nur mit Preiskontext ein Preis ("für 2000", "2000 nehme ich"),
+# nicht nach Zeitangaben ("von 2024", "seit 2021", "bis 2025", "im März 2023")
+YEARS = range(1990, 2040)
+YEAR_WORDS = frozenset([
+    "von", "vom", "aus", "seit", "im", "in", "ab", "bis", "anno", "anfang", "mitte", "ende", "jahr", "jahres",
+    "frühjahr", "frühling", "sommer", "herbst", "winter", "januar", "jänner", "februar", "märz", "april", "mai",
+    "juni", "juli", "august", "september", "oktober", "november", "dezember",
+])
+OFFER_AFTER_WORDS = frozenset(["nehme", "nehmen", "zahle", "zahlen", "gebe", "geben", "biete", "bieten"])
+MIN_PRICE_CONFIDENCE = 0.5   # ab hier zählt ein Betrag als Preis (Ledger, Floor-Prüfung, app.py)
+
+# --------------------- [2] AUTOMAT (AHO–CORASICK) -------------------------
+_META = set("\\()[]?*+{}|.^$")
+
+
+def _trigger(pattern: str) -> str:
+    """Literaler Anfang eines Machtprime-Musters (führendes \\b übersprungen) – daran setzt der Automat an."""
+    p = pattern[2:] if pattern.startswith(r"\b") else pattern
+    n = 0
+    while n < len(p) and p[n] not in _META:
+        n += 1
+    if n == 0:
+        raise ValueError(f"Muster braucht einen literalen Anfang: {pattern!r}")
+    return p[:n]
+
+
+def _build_automaton(entries):
+    """
+    entries: [(wort, treffer)] → (delta, outs). delta[zustand] ist ein vollständiges
+    Übergangs-Dict über das Alphabet aller Wörter (fremde Zeichen → Zustand 0),
+    outs[zustand] die Treffer, die an dieser Stelle enden (inkl. Suffix-Treffer).
+    """
+    goto, fail, out = [{}], [0], [[]]
+    for word, hit in entries:
+        s = 0
+        for ch in word:
+            if ch not in goto[s]:
+                goto.append({})
+                fail.append(0)
+                out.append([])
+                goto[s][ch] = len(goto) - 1
+            s = goto[s][ch]
+        out[s].append(hit)
+    queue = deque(goto[0].values())
+    while queue:
+        r = queue.popleft()
+        for ch, s in goto[r].items():
+            queue.append(s)
+            f = fail[r]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[s] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != s else 0
+            out[s] = out[s] + out[fail[s]]
+    alphabet = {ch for word, _ in entries for ch in word}
+    delta = []
+    for s in range(len(goto)):
+        row = {}
+        for ch in alphabet:
+            t = s
+            while t and ch not in goto[t]:
+                t = fail[t]
+            row[ch] = goto[t].get(ch, 0)
+        delta.append(row)
+    return delta, [tuple(o) for o in out]
+
+
+# Treffer: (art, name, länge, matcher) – art ∈ {"arg", "deal", "prime"}
+_ENTRIES = [(w, ("arg", cat, len(w), None)) for cat, words in ARG_KEYWORDS.items() for w in words]
+_ENTRIES += [(w, ("deal", "deal", len(w), None)) for w in DEAL_KEYWORDS]
+_ENTRIES += [(_trigger(p), ("prime", p, len(_trigger(p)), re.compile(p))) for p in BAD_PATTERNS]
+_DELTA, _OUTS = _build_automaton(_ENTRIES)
+
+# ------------------------------- [3] BETRÄGE ------------------------------
+class Amount(NamedTuple):
+    value: int                 # Euro (gerundet)
+    confidence: float          # 1.0 Währung daneben · 0.8 Preiswort davor · 0.5 nackte Zahl · 0.2 unplausibel
+    start: int                 # Position im Text
+
+
+def _year_is_offer(t: str, end: int, before: list) -> bool:
+    """Zahl wie 2000: Preiswort direkt davor (keine Zeitangabe) oder Angebotsverb direkt dahinter."""
+    if before and before[-1] in PRICE_WORDS and before[-1] not in YEAR_WORDS:
+        return True
+    after = _NEXT_WORD_RE.match(t, end)
+    return bool(after) and after.group(1) in OFFER_AFTER_WORDS
+
+
+def _amount(t: str, m: re.Match) -> Amount | None:
+    """Kontext einer Zahl prüfen (t kleingeschrieben); None = sicher kein Betrag."""
+    end = m.end()
+    if m.group(2) is None and ORDINAL_RE.match(t, end):
+        return None
+    currency = bool(CURRENCY_AFTER_RE.match(t, end) or CURRENCY_BEFORE_RE.search(t, max(0, m.start() - 6), m.start()))
+    if not currency and UNIT_RE.match(t, end):
+        return None
+    before = _WORD_RE.findall(t, max(0, m.start() - 30), m.start())
+    if not currency and before and before[-1] in MODEL_WORDS:
+        return None
+    raw = re.sub(r"[.\u00a0\u202f]", "", m.group(1))
+    cents = m.group(2) if m.group(2) and m.group(2)[0] != "-" else "0"
+    value = int(round(float(f"{raw}.{cents}")))
+    if currency:
+        confidence = 1.0
+    elif value < 10 or value > 100_000:
+        confidence = 0.2
+    elif value in YEARS and not _year_is_offer(t, end, before):
+        confidence = 0.2
+    elif PRICE_WORDS.intersection(before[-3:]):
+        confidence = 0.8
+    else:
+        confidence = 0.5
+    return Amount(value, confidence, m.start())
+
+
+def extract_amounts(text: str) -> tuple:
+    """Alle Geldbeträge eines Textes mit Konfidenz (Mengen, Modelle, Jahreszahlen usw. ausgelassen)."""
+    return analyze(text).amounts
+
+# ------------------------------- [4] ANALYSE ------------------------------
+class Analysis(NamedTuple):
+    amounts: tuple             # Beträge mit Konfidenz (Amount)
+    prices: tuple              # Preise = Beträge ab MIN_PRICE_CONFIDENCE (chat.py: extract_prices)
+    first_price: int | None    # erster Preis (app.py: _parse_price)
+    args: frozenset            # erkannte Argument-Kategorien
+    deal: bool                 # Abschluss-Schlagwort vorhanden
+    primes: tuple              # getroffene Machtprime-Muster
+
+
+@lru_cache(maxsize=8192)
+def analyze(text: str) -> Analysis:
+    """Eine Nachricht in einem Durchlauf analysieren (Ergebnis ist unveränderlich und gecacht)."""
+    if not text:
+        return Analysis((), (), None, frozenset(), False, ())
+    t = text.lower()
+    args = set()
+    deal = False
+    primes = []
+    # Zahlen (C-Regex) – Kontext nur an den Fundstellen prüfen
+    amounts = tuple(a for a in (_amount(t, m) for m in AMOUNT_RE.finditer(t)) if a is not None)
+    prices = tuple(a.value for a in amounts if a.confidence >= MIN_PRICE_CONFIDENCE)
+    # Schlagworte + Machtprime-Anfänge: ein Zeichen-für-Zeichen-Lauf durch den Automaten
+    delta, outs = _DELTA, _OUTS
+    s = 0
+    for i, ch in enumerate(t):
+        s = delta[s].get(ch, 0)
+        if outs[s]:
+            for kind, name, n, matcher in outs[s]:
+                if kind == "arg":
+                    args.add(name)
+                elif kind == "deal":
+                    deal = True
+                elif name not in primes and matcher.match(t, i - n + 1):
+                    primes.append(name)
+    return Analysis(amounts, prices, prices[0] if prices else None, frozenset(args), deal, tuple(primes))
+
+
+def arg_flags(text: str) -> dict:
+    """Argument-Flags als (neues) Dict – Format wie bisher _classify_args."""
+    found = analyze(text).args
+    return {k: k in found for k in ARG_KEYS}
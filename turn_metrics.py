@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+# ============================================================================
+# TURN-METRIKEN: Zeit-Spans pro Turn + Export (Prometheus-Text, JSONL)
+# ----------------------------------------------------------------------------
+# WAS MACHT DIESER CODE?
+# [1] Turn-Recorder (thread-lokal): measure_turn() umschließt einen Turn,
+#     span("api") misst Abschnitte darin (mehrfache Spans gleichen Namens
+#     werden summiert, verschachtelte zählen jeweils inklusive). count_retry()
+#     zählt Korrektur-Runden nach Verstoßgrund. Ohne laufenden Turn sind alle
+#     Aufrufe No-ops – der Hot Path kostet dann nur einen Attribut-Lookup.
+# [2] Prozessweite Aggregation: Histogramme je (App, Span) plus Zähler für
+#     Turns, Korrektur-Runden, lokale Reparaturen und Fallbacks (je nach Grund);
+#     Ausgabe im Prometheus-Textformat.
+# [3] Export: jede Turn-Zeile über den Log-Writer in eine rotierende JSONL-Datei
+#     (METRICS_DIR/turns.jsonl, .1, .2 …); der Prometheus-Snapshot liegt als
+#     METRICS_DIR/turns.prom (node_exporter-Textfile-Collector) und wird
+#     höchstens alle METRICS_PROM_INTERVAL_S Sekunden atomar ersetzt.
+# [4] Nachträgliche Auswertung aus den JSONL-Dateien: langsamste Turns mit
+#     dominierendem Span, Retry-Stürme, Perzentile je Span; "prom" baut den
+#     Snapshot aus den Dateien neu (auch über mehrere Server-Prozesse).
+#
+# Aufruf:  python turn_metrics.py report [--dir logs/metrics] [--slow 10]
+#          python turn_metrics.py prom [--dir logs/metrics]
+# ============================================================================
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+
+from logwriter import RollingJsonlTarget, get_writer
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "logs/metrics")
+METRICS_MAX_MB = float(os.environ.get("METRICS_MAX_MB", "20"))
+METRICS_KEEP = int(os.environ.get("METRICS_KEEP", "5"))
+METRICS_PROM_INTERVAL_S = float(os.environ.get("METRICS_PROM_INTERVAL_S", "15"))
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+RESERVED = ("t", "app", "sid", "ms", "spans", "retries")   # Felder, die note() nicht überschreibt
+
+# ---------------------------- [1] TURN-RECORDER ---------------------------
+_tls = threading.local()
+
+
+class Turn:
+    __slots__ = ("app", "sid", "t0", "spans", "retries", "fields")
+
+    def __init__(self, app: str, sid: str):
+        self.app = app
+        self.sid = sid
+        self.t0 = time.perf_counter()
+        self.spans = {}        # name -> Sekunden (summiert)
+        self.retries = Counter()
+        self.fields = {}
+
+    def note(self, **fields):
+        """Zusatzfelder für die Turn-Zeile (z. B. source, fallback_reason, Tokens)."""
+        self.fields.update(fields)
+
+    def record(self) -> dict:
+        rec = {k: v for k, v in self.fields.items() if k not in RESERVED}
+        rec.update(
+            t=datetime.utcnow().isoformat(), app=self.app, sid=self.sid,
+            ms=round((time.perf_counter() - self.t0) * 1000, 2),
+            spans={k: round(v * 1000, 2) for k, v in self.spans.items()},
+            retries=dict(self.retries),
+        )
+        return rec
+
+
+class _Span:
+    __slots__ = ("turn", "name", "t0")
+
+    def __init__(self, turn: Turn, name: str):
+        self.turn = turn
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        spans = self.turn.spans
+        spans[self.name] = spans.get(self.name, 0.0) + time.perf_counter() - self.t0
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_turn() -> Turn | None:
+    return getattr(_tls, "turn", None)
+
+
+def span(name: str):
+    """Kontextmanager: Dauer von name im laufenden Turn aufaddieren (sonst No-op)."""
+    turn = getattr(_tls, "turn", None)
+    return _NO_SPAN if turn is None else _Span(turn, name)
+
+
+def count_retry(reason_key: str):
+    """Eine Korrektur-Runde wegen reason_key (compliance.rule_key) im laufenden Turn zählen."""
+    turn = getattr(_tls, "turn", None)
+    if turn is not None:
+        turn.retries[reason_key] += 1
+
+
+class measure_turn:
+    """
+    Kontextmanager um einen Turn: with measure_turn("chat", sid) as t: …
+    Beim Verlassen (auch per Exception, z. B. st.rerun) wird der Turn aggregiert und exportiert.
+    """
+
+    def __init__(self, app: str, sid: str):
+        self.turn = Turn(app, sid)
+        self._prev = None
+
+    def __enter__(self) -> Turn:
+        self._prev = getattr(_tls, "turn", None)
+        _tls.turn = self.turn
+        return self.turn
+
+    def __exit__(self, *exc):
+        _tls.turn = self._prev
+        get_registry().finish(self.turn.record())
+        return False
+
+# ----------------------------- [2] AGGREGATION ----------------------------
+def _label(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class Registry:
+    """Histogramme und Zähler über alle Turns des Prozesses (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hist = {}                   # (app, span) -> [bucket_counts..., +Inf], sum_ms
+        self.turns = Counter()           # app
+        self.retries = Counter()         # (app, reason)
+        self.fallbacks = Counter()       # (app, reason)
+        self.repairs = Counter()         # (app, reason) – lokal reparierte LLM-Antworten
+        self.recent = deque(maxlen=200)  # letzte Turn-Zeilen (fürs Admin)
+        self._prom_at = 0.0
+
+    def observe(self, rec: dict):
+        app = rec.get("app", "?")
+        with self._lock:
+            self.turns[app] += 1
+            for name, ms in [("turn", rec.get("ms", 0.0))] + list((rec.get("spans") or {}).items()):
+                counts, total = self.hist.get((app, name)) or ([0] * (len(BUCKETS_MS) + 1), 0.0)
+                i = next((k for k, b in enumerate(BUCKETS_MS) if ms <= b), len(BUCKETS_MS))
+                counts[i] += 1
+                self.hist[(app, name)] = (counts, total + ms)
+            for reason, n in (rec.get("retries") or {}).items():
+                self.retries[(app, reason)] += n
+            if rec.get("fallback_reason"):
+                self.fallbacks[(app, rec["fallback_reason"])] += 1
+            if rec.get("repaired"):
+                self.repairs[(app, rec["repaired"])] += 1
+            self.recent.append(rec)
+
+    def finish(self, rec: dict):
+        """Turn aggregieren, als JSONL-Zeile einreihen, ggf. Prometheus-Snapshot erneuern."""
+        self.observe(rec)
+        base = Path(METRICS_DIR)
+        get_writer().write(RollingJsonlTarget(base / "turns.jsonl", int(METRICS_MAX_MB * 1024 * 1024),
+                                              METRICS_KEEP), rec)
+        now = time.monotonic()
+        if now - self._prom_at >= METRICS_PROM_INTERVAL_S:
+            self._prom_at = now
+            self.write_prometheus(base / "turns.prom")
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            hist = {k: (list(c), s) for k, (c, s) in self.hist.items()}
+            turns, retries, fallbacks = dict(self.turns), dict(self.retries), dict(self.fallbacks)
+            repairs = dict(self.repairs)
+        out = [
+            "# HELP negotiation_turn_span_seconds Dauer je Turn-Abschnitt (span=turn: ganzer Turn)",
+            "# TYPE negotiation_turn_span_seconds histogram",
+        ]
+        for (app, name), (counts, total_ms) in sorted(hist.items()):
+            labels = f'app="{_label(app)}",span="{_label(name)}"'
+            cum = 0
+            for b, c in zip(BUCKETS_MS, counts):
+                cum += c
+                out.append(f'negotiation_turn_span_seconds_bucket{{{labels},le="{b / 1000:g}"}} {cum}')
+            cum += counts[-1]
+            out.append(f'negotiation_turn_span_seconds_bucket{{{labels},le="+Inf"}} {cum}')
+            out.append(f"negotiation_turn_span_seconds_sum{{{labels}}} {total_ms / 1000:.6f}")
+            out.append(f"negotiation_turn_span_seconds_count{{{labels}}} {cum}")
+        out += ["# HELP negotiation_turns_total Abgeschlossene Turns",
+                "# TYPE negotiation_turns_total counter"]
+        out += [f'negotiation_turns_total{{app="{_label(a)}"}} {n}' for a, n in sorted(turns.items())]
+        out += ["# HELP negotiation_retries_total Korrektur-Runden nach Verstoßgrund",
+                "# TYPE negotiation_retries_total counter"]
+        out += [f'negotiation_retries_total{{app="{_label(a)}",reason="{_label(r)}"}} {n}'
+                for (a, r), n in sorted(retries.items())]
+        out += ["# HELP negotiation_fallbacks_total Regelbasierte statt LLM-Antworten nach Grund",
+                "# TYPE negotiation_fallbacks_total counter"]
+        out += [f'negotiation_fallbacks_total{{app="{_label(a)}",reason="{_label(r)}"}} {n}'
+                for (a, r), n in sorted(fallbacks.items())]
+        out += ["# HELP negotiation_repairs_total Lokal reparierte LLM-Antworten nach Verstoßgrund",
+                "# TYPE negotiation_repairs_total counter"]
+        out += [f'negotiation_repairs_total{{app="{_label(a)}",reason="{_label(r)}"}} {n}'
+                for (a, r), n in sorted(repairs.items())]
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        """Snapshot atomar schreiben (Leser sehen nie eine halbe Datei)."""
+        path = Path(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(self.prometheus_text(), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass   # Metriken dürfen den Turn nie stören
+
+# ---------------------------- [3] PROZESSWEIT -----------------------------
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> Registry:
+    """Eine Registry pro Server-Prozess (überlebt Streamlit-Reruns, da Modul gecacht)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = Registry()
+    return _registry
+
+# ----------------------------- [4] AUSWERTUNG -----------------------------
+def iter_turns(directory=METRICS_DIR):
+    """Turn-Zeilen aller (auch rotierten) JSONL-Dateien, älteste Datei zuerst."""
+    paths = sorted(glob.glob(os.path.join(directory, "turns.jsonl*")), key=os.path.getmtime)
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue   # halb geschriebene letzte Zeile
+
+
+def _pct(values, p):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * p / 100))] if s else float("nan")
+
+
+def report(directory=METRICS_DIR, slow=10, storm=2):
+    recs = list(iter_turns(directory))
+    if not recs:
+        print(f"Keine Turn-Metriken unter {directory}")
+        return
+    by_app = defaultdict(list)
+    for r in recs:
+        by_app[r.get("app", "?")].append(r)
+    for app, rows in sorted(by_app.items()):
+        print(f"== {app}: {len(rows)} Turns ==")
+        spans = defaultdict(list)
+        for r in rows:
+            spans["turn"].append(r["ms"])
+            for k, v in (r.get("spans") or {}).items():
+                spans[k].append(v)
+        print(f"{'Span':<12} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, vals in sorted(spans.items(), key=lambda kv: -sum(kv[1])):
+            print(f"{name:<12} {len(vals):>6} {_pct(vals, 50):>9.1f} {_pct(vals, 95):>9.1f} "
+                  f"{_pct(vals, 99):>9.1f} {max(vals):>9.1f}")
+        retries = Counter()
+        for r in rows:
+            retries.update(r.get("retries") or {})
+        if retries:
+            print("Korrektur-Runden nach Grund: " + ", ".join(f"{k}={n}" for k, n in retries.most_common()))
+        fallbacks = Counter(r["fallback_reason"] for r in rows if r.get("fallback_reason"))
+        if fallbacks:
+            print("Fallbacks nach Grund: " + ", ".join(f"{k}={n}" for k, n in fallbacks.most_common()))
+        repairs = Counter(r["repaired"] for r in rows if r.get("repaired"))
+        if repairs:
+            print("Lokale Reparaturen nach Grund: " + ", ".join(f"{k}={n}" for k, n in repairs.most_common()))
+        print(f"-- {slow} langsamste Turns --")
+        for r in sorted(rows, key=lambda r: -r["ms"])[:slow]:
+            top = max((r.get("spans") or {"–": 0}).items(), key=lambda kv: kv[1])
+            print(f"{r['t']}  {r['sid'][:12]:<12} {r['ms']:>9.1f} ms  größter Span: {top[0]} ({top[1]:.1f} ms)"
+                  + (f"  retries={r['retries']}" if r.get("retries") else ""))
+        storms = [r for r in rows if sum((r.get("retries") or {}).values()) >= storm]
+        if storms:
+            per_sid = Counter(r["sid"] for r in storms)
+            print(f"-- Retry-Stürme (≥{storm} Korrektur-Runden pro Turn): {len(storms)} Turns, "
+                  f"{len(per_sid)} Sessions; häufigste: "
+                  + ", ".join(f"{sid[:12]}×{n}" for sid, n in per_sid.most_common(5)))
+        print()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Turn-Metriken auswerten")
+    ap.add_argument("cmd", choices=["report", "prom"])
+    ap.add_argument("--dir", default=METRICS_DIR)
+    ap.add_argument("--slow", type=int, default=10, help="Anzahl langsamster Turns")
+    ap.add_argument("--storm", type=int, default=2, help="ab so vielen Korrektur-Runden pro Turn")
+    a = ap.parse_args(argv)
+    if a.cmd == "report":
+        report(a.dir, a.slow, a.storm)
+    else:
+        reg = Registry()
+        for rec in iter_turns(a.dir):
+            reg.observe(rec)
+        print(reg.prometheus_text(), end="")
+
+
+if __name__ == "__main__":
+    main()